@@ -1,10 +1,15 @@
 import streamlit as st
 import os
+import time
 
-# Disable artifact registry before importing agent
-os.environ['DISABLE_ARTIFACT_REGISTRY'] = '1'
+from artifact import set_registry_enabled
+from job_queue import get_job_queue
 
-from langgraph_agent import graph
+# Seconds between UI polls while a job is running
+JOB_POLL_S = 1.0
+
+# The UI does not track artifacts; the registries are then never opened
+set_registry_enabled(False)
 
 st.set_page_config(
     page_title="Geospatial Analysis Agent",
@@ -18,6 +23,11 @@ st.markdown("Query geospatial data using natural language")
 # Initialize session state
 if 'history' not in st.session_state:
     st.session_state.history = []
+if 'active_jobs' not in st.session_state:
+    st.session_state.active_jobs = []
+
+# Queries run as background jobs shared by all sessions (see job_queue.py)
+jobs = get_job_queue()
 
 # Query input
 query = st.text_area(
@@ -63,28 +73,38 @@ if clear:
     st.session_state.history = []
     st.rerun()
 
-# Process query
+# Process query: a background job survives reruns; the same query from
+# another session joins the job already running for it
 if submit and query:
-    with st.spinner("Processing your query..."):
-        try:
-            # Run the agent
-            state = {"user_query": query}
-            app = graph.compile()
-            result_state = app.invoke(state)
-            
-            # Get response
-            response = result_state.get("response", "No response generated")
-            error = result_state.get("error")
-            
-            # Add to history
-            st.session_state.history.append({
-                "query": query,
-                "response": response,
-                "error": error
-            })
-            
-        except Exception as e:
-            st.error(f"Error processing query: {str(e)}")
+    job_id = jobs.submit(query)
+    if job_id not in st.session_state.active_jobs:
+        st.session_state.active_jobs.append(job_id)
+
+# Poll active jobs: progress lines and partial answer, history once finished
+still_active = []
+for job_id in st.session_state.active_jobs:
+    job = jobs.get(job_id)
+    if job is None:
+        continue
+    if job["status"] in ("done", "failed"):
+        st.session_state.history.append({
+            "query": job["query"],
+            "response": job["response"] or "No response generated",
+            "error": job["error"]
+        })
+        continue
+    
+    still_active.append(job_id)
+    if job["status"] == "queued":
+        label = f"Queued ({jobs.position(job_id)} ahead): {job['query']}"
+    else:
+        label = f"Processing ({time.time() - job['started']:.0f}s): {job['query']}"
+    with st.status(label, expanded=True, state="running"):
+        for event in jobs.events(job_id):
+            st.write(event["line"])
+        if job["partial"]:
+            st.markdown(job["partial"] + "▌")
+st.session_state.active_jobs = still_active
 
 # Display results
 if st.session_state.history:
@@ -169,4 +189,10 @@ else:
 
 # Footer
 st.markdown("---")
-st.caption("Powered by LangGraph, Gemini, and CoreStack API")
\ No newline at end of file
+st.caption("Powered by LangGraph, Gemini, and CoreStack API")
+
+# Keep polling while jobs are in flight; a widget interaction simply reruns
+# the script and polling resumes, the jobs themselves are unaffected
+if st.session_state.active_jobs:
+    time.sleep(JOB_POLL_S)
+    st.rerun()
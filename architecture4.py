@@ -4,32 +4,41 @@ Hybrid Architecture: CodeAct + LangGraph Tool
 """
 
 import os
+import re
+import sys
 import json
+import time
+import uuid
+import threading
+import contextlib
+import contextvars
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
-# Import CodeAct from smolagents (structure from agent.py)
-from smolagents import CodeAgent, tool, LiteLLMModel, DuckDuckGoSearchTool
+# smolagents and the LangGraph workflow are imported on first use
+from lazy_imports import lazy_module
+from tracing import span, record_cache_hit
+from prompt_builder import PromptBuilder, detect_intents
+
+smolagents = lazy_module("smolagents")
 
 # No need to import executor - it's specified via executor_type parameter
 DOCKER_AVAILABLE = True  # Assume Docker is available like in agent.py
 
-# Import Earth Engine 
-import ee
-
 load_dotenv()
 
 # Get API keys
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 CORE_STACK_API_KEY = os.getenv("CORE_STACK_API_KEY")
 
-# Initialize Earth Engine
+# Earth Engine is initialized on first use by the LangGraph workflow (lazy_imports.ensure_ee)
 GEE_PROJECT = os.getenv("GEE_PROJECT", "apt-achievment-453417-h6")
-try:
-    ee.Initialize(project=GEE_PROJECT)
-    print(f"✅ Earth Engine initialized with project: {GEE_PROJECT}")
-except Exception as e:
-    print(f"⚠️  Earth Engine initialization failed: {e}")
+
+# LangGraph workflow (imported on the first tool call, then reused)
+workspace_path = '/app/workspace'
+if os.path.isdir(workspace_path) and workspace_path not in sys.path:
+    sys.path.insert(0, workspace_path)
+new_architecture = lazy_module("new_architecture")
 
 # ======================================================
 # DATA PRODUCT NAME CACHE (from layer_descriptions.csv)
@@ -71,11 +80,98 @@ CORESTACK_DATA_PRODUCTS = {
     ]
 }
 
+# ============================================================================
+# TOOL RESULT CACHE (per agent run + short TTL)
+# ============================================================================
+
+# How long results stay reusable after the agent run that produced them ends
+TOOL_CACHE_TTL_S = float(os.getenv("TOOL_CACHE_TTL_S", 300))
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar("agent_run", default=None)
+
+
+class ToolResultCache:
+    """
+    Memoizes fetch_corestack_data results. Entries are valid for the whole
+    agent run that stored them (however long its retries take), then for
+    ttl_s after the run ends.
+    """
+
+    def __init__(self, ttl_s: float = TOOL_CACHE_TTL_S):
+        self.ttl_s = ttl_s
+        self._entries: Dict[str, Any] = {}  # key → (value, fresh_at, run_id)
+        self._active_runs = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, fresh_at, run_id = entry
+        if run_id in self._active_runs or time.time() - fresh_at < self.ttl_s:
+            return value
+        return None
+
+    def put(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (value, now, _current_run.get())
+            # Drop entries of finished runs that have expired
+            expired = [k for k, (_, fresh_at, run_id) in self._entries.items()
+                       if run_id not in self._active_runs and now - fresh_at >= self.ttl_s]
+            for k in expired:
+                del self._entries[k]
+
+    def begin_run(self) -> str:
+        run_id = uuid.uuid4().hex
+        with self._lock:
+            self._active_runs.add(run_id)
+        return run_id
+
+    def end_run(self, run_id: str):
+        """The run's entries now expire ttl_s from here."""
+        now = time.time()
+        with self._lock:
+            self._active_runs.discard(run_id)
+            for key, (value, fresh_at, entry_run) in list(self._entries.items()):
+                if entry_run == run_id:
+                    self._entries[key] = (value, now, None)
+
+
+tool_cache = ToolResultCache()
+
+
+@contextlib.contextmanager
+def agent_run_scope():
+    """Marks one agent run; tool results cached inside it stay valid until it ends."""
+    run_id = tool_cache.begin_run()
+    token = _current_run.set(run_id)
+    try:
+        yield run_id
+    finally:
+        _current_run.reset(token)
+        tool_cache.end_run(run_id)
+
+
+def _query_cache_key(query: str) -> str:
+    return "query:" + re.sub(r"\s+", " ", query.strip().lower())
+
+
+def _location_cache_key(parsed: Dict[str, Any]) -> Optional[str]:
+    """Resolved location: same place → same layers, whatever the wording of the question."""
+    lat, lon = parsed.get('latitude'), parsed.get('longitude')
+    name = (parsed.get('location_name') or '').strip().lower()
+    if not name and (lat is None or lon is None):
+        return None
+    coords = f"{round(lat, 5)},{round(lon, 5)}" if lat is not None and lon is not None else ""
+    return f"location:{parsed.get('location_type') or ''}|{name}|{(parsed.get('district') or '').lower()}|{coords}"
+
+
 # ============================================================================
 # LANGGRAPH AS A TOOL FOR CODEACT  
 # ============================================================================
 
-@tool
 def fetch_corestack_data(query: str) -> str:
     """
     Fetches available CoreStack layers for a location from LangGraph workflow.
@@ -88,33 +184,45 @@ def fetch_corestack_data(query: str) -> str:
         JSON string with:
         - success: bool
         - spatial_data: dict with vector_layers[] and raster_layers[]
-        - Each layer has: layer_name, layer_type, urls[] (multi-region support)
+        - Each layer has: layer_name, layer_type, handle, urls[] (multi-region support)
         - location_info: administrative details
+        Load a layer's data with load_corestack_layer(layer['handle']).
     """
-    import json
-    import sys
-    import os
-    
-    # Add parent directory to path
-    workspace_path = '/app/workspace'
-    if workspace_path not in sys.path:
-        sys.path.insert(0, workspace_path)
-    
-    from new_architecture import build_graph
-    
     print("\n" + "="*70)
     print("📊 CORESTACK LAYER FETCHER (via LangGraph)")
     print(f"   Query: {query}")
     print("="*70)
     
     try:
-        # Build and compile graph
-        graph = build_graph()
-        app = graph.compile()
+        # Same question earlier in this run (CodeAct retries / refinements)
+        query_key = _query_cache_key(query)
+        cached = tool_cache.get(query_key)
+        if cached is not None:
+            record_cache_hit("tool.fetch_corestack_data")
+            print("♻️  Returning cached result (same query in this run)")
+            return cached
         
-        # Run workflow
-        state = {"user_query": query}
-        result_state = app.invoke(state)
+        with span("tool.fetch_corestack_data", pipeline="new_architecture"):
+            # Parse once up front so a rephrased query about the same place can
+            # reuse the resolved layers; the graph skips its own parse when
+            # "parsed" is already in the state
+            state = new_architecture.llm_intent_parser({"user_query": query})
+            if "error" in state:
+                return json.dumps({"success": False, "error": state["error"]}, indent=2)
+            
+            location_key = _location_cache_key(state["parsed"])
+            located = tool_cache.get(location_key) if location_key else None
+            if located is not None:
+                record_cache_hit("tool.fetch_corestack_data")
+                print("♻️  Reusing layers resolved earlier in this run for the same location")
+                result_state = dict(located, parsed=state["parsed"])
+            else:
+                # Build and compile graph
+                graph = new_architecture.build_graph()
+                app = graph.compile()
+                
+                # Run workflow
+                result_state = app.invoke(state)
         
         # Check for errors
         if "error" in result_state:
@@ -150,7 +258,12 @@ def fetch_corestack_data(query: str) -> str:
         print(f"\n✅ FETCH COMPLETE:")
         print(f"   Vector layers: {len(available_layers.get('vector', []))}")
         print(f"   Raster layers: {len(available_layers.get('raster', []))}")
-        return json.dumps(response, default=str)
+        result = json.dumps(response, default=str)
+        
+        tool_cache.put(query_key, result)
+        if location_key and located is None:
+            tool_cache.put(location_key, {"available_layers": available_layers, "location_info": location_info})
+        return result
         
     except Exception as e:
         print(f"\n❌ ERROR: {str(e)}")
@@ -160,302 +273,258 @@ def fetch_corestack_data(query: str) -> str:
             "success": False,
             "error": str(e)
         }, indent=2)
+
+
+def load_corestack_layer(handle: str, clip: bool = True) -> Any:
+    """
+    Loads a CoreStack layer returned by fetch_corestack_data, already merged
+    across regions and clipped to the query area. Data is cached, so calling
+    this again (or for another analysis step) does not download anything.
+    
+    Args:
+        handle: The layer's 'handle' value from fetch_corestack_data
+        clip: True to clip to the queried location's boundary, False for the full tehsil data
+    
+    Returns:
+        Vector layers: a GeoDataFrame.
+        Raster layers: a dict with 'data' (2D numpy array), 'transform', 'crs', 'nodata', 'bounds'.
+    """
+    from data_handles import load_layer
     
+    with span("tool.load_corestack_layer", handle=handle, clip=clip):
+        return load_layer(handle, clip=clip)
+
+
+_corestack_tools = None
+
+
+def get_corestack_tools():
+    """smolagents Tools wrapping fetch_corestack_data and load_corestack_layer (built once, on first use)."""
+    global _corestack_tools
+    if _corestack_tools is None:
+        _corestack_tools = [smolagents.tool(fetch_corestack_data), smolagents.tool(load_corestack_layer)]
+    return _corestack_tools
+
 
 
 # ============================================================================
 # CODEACT PROMPT (ADAPTED FROM agent.py)
 # ============================================================================
+# Static sections come first and never change between calls, so the provider
+# serves them from its prefix cache; decision-framework sections are included
+# only for the intents the task mentions; the task itself goes last.
 
-def create_corestack_prompt(task: str) -> str:
-    """
-    Creates the CodeAct prompt, with CoreStack as primary data source.
-    
-    Key features:
-    - Emphasizes CoreStack as primary data source for India-specific queries
-    - Includes Earth Engine as supplementary tool for global/non-India data
-    - Lists all correct libraries and proper export formats
-    - Specifies expected output types
-    """
-    return f"""
+PROMPT_ROLE = """
 You are a geospatial analysis agent, expert at writing python code to perform geospatial analysis. You will use the following python libraries:
 osmnx, geopandas, shapely, matplotlib, numpy, pandas, rasterio, ee, geemap, geedim, geopy, requests, json
 
 You will be given a task, you will write python code to perform the task and export outputs to local machine.
-
 If your code has errors, you will search for tutorials and documentations of earlier mentioned libraries to fix the errors.
 
 ═══════════════════════════════════════════════════════════════════════════════
 CRITICAL UNDERSTANDING: SPATIAL vs TIMESERIES DATA (CoreStack Architecture)
 ═══════════════════════════════════════════════════════════════════════════════
 
-CoreStack has TWO FUNDAMENTALLY DIFFERENT data structures you MUST understand:
-
 **1️⃣ SPATIAL DATA (Vectors/Rasters)** - For location-specific analysis:
-   - Geographic features with SPATIAL VARIATION across a region
-   - Data varies BY LOCATION (different patches/polygons have different values)
+   - Geographic features whose values vary BY LOCATION (patches/polygons differ)
    - Temporal data stored as YEARLY ATTRIBUTE COLUMNS, NOT timeseries arrays
-   - Example: cropping_intensity_vector has columns: cropping_intensity_2017, cropping_intensity_2018, ..., cropping_intensity_2023
+     (e.g. cropping_intensity_vector: cropping_intensity_2017, ..., cropping_intensity_2023)
    - Use for: Village/tehsil-level analysis where spatial variation matters
 
 **2️⃣ TIMESERIES DATA (Watershed MWS)** - For temporal water budget analysis:
-   - Single aggregated value per watershed per time period
-   - NO spatial variation (entire watershed = 1 value)
-   - Fortnightly measurements (water balance components)
-   - Example: water_balance timeseries has arrays: year[], fortnight[], runoff[], precipitation[]
+   - Single aggregated value per watershed per fortnight, NO spatial variation
+   - e.g. water_balance timeseries: year[], fortnight[], runoff[], precipitation[]
    - Use for: Watershed water budget analysis ONLY
+"""
 
-═══════════════════════════════════════════════════════════════════════════════
-LAYER SELECTION DECISION FRAMEWORK (WITH EXPLANATIONS)
-═══════════════════════════════════════════════════════════════════════════════
-
-**Query Type 1: "Cropping Intensity in [Village] Over Years"**
-✅ CORRECT CHOICE: cropping_intensity_vector (spatial vector)
-❌ WRONG CHOICE: watershed timeseries
-
-WHY SPATIAL?
-- Cropping intensity is SPATIALLY VARIABLE (different fields = different intensity)
-- You want: total area under crops in village, which varies by location
-- Data structure: GeoDataFrame with polygon features
-- Temporal aspect: Stored as yearly columns (cropping_intensity_2017, 2018, ..., 2023)
-- Analysis approach: Sum/average these columns across village polygons, plot trend
-
-WHY NOT TIMESERIES?
-- Watershed timeseries measures aggregate WATER BALANCE (runoff, precip, ET)
-- It's NOT about cropping patterns or land use
-- Timeseries is fortnightly, not yearly
-- Timeseries has NO spatial variation (1 value per watershed)
-
-**Query Type 2: "Surface Water Availability Over Years in [Village]"**
-✅ PRIMARY: surface_water_bodies_vector (spatial vector)
-⚠️  OPTIONAL CONTEXT: water_balance (timeseries) for watershed-level trends
-
-WHY SPATIAL?
-- Surface water bodies are PHYSICAL FEATURES with geometry (lakes, ponds, reservoirs)
-- You want: total area of water bodies within village boundaries
-- Data structure: Polygon features with seasonal attributes (Kharif/Rabi/Zaid flags)
-- Analysis: Clip polygons to village, sum area per season
-
-CAVEAT: surface_water_bodies_vector may be a SINGLE SNAPSHOT per year
-- For multi-year TRENDS, derive from land_use_land_cover_raster
-- Workaround: Count water pixels (classes 2-4) in LULC for years 2017-2024
-
-**Query Type 3: "Tree Cover Loss in [Village] Since [Year]"**
-✅ CORRECT: change_tree_cover_loss_raster (change raster)
-
-WHY CHANGE RASTER?
-- Pre-computed transition matrix: trees (class 6) → other classes
-- Period: 2017-2022 composite (mode of 2017-2019 vs 2020-2022)
-- Classes: Trees→Built-up, Trees→Barren, Trees→Crops, Trees→Shrubs
-- Analysis: Mask to loss classes, count pixels, convert to hectares
-- SAVES COMPUTATION vs manually comparing 2017 vs 2022 LULC
-
-FALLBACK: If custom time period (e.g., "2018-2024"):
-- Use land_use_land_cover_raster for specific years
-- Compare class 6 (trees) presence across years manually
-
-**Query Type 4: "Cropland to Built-up Conversion in [Village]"**
-✅ CORRECT: change_urbanization_raster (change raster)
-
-WHY?
-- Pre-computed transition: Crops/Trees → Built-up
-- Class 3 specifically = "Crops → Built-up" (THIS IS WHAT YOU WANT!)
-- Period: 2017-2022 composite
-- Analysis: Filter to class 3, count pixels, convert to hectares
-
-═══════════════════════════════════════════════════════════════════════════════
-
+PROMPT_CORESTACK = f"""
 Instructions:
 1. **CORESTACK PRIORITY (PRIMARY)**: For ANY query about India or Indian locations, you MUST call fetch_corestack_data FIRST to access CoreStack database. Available CoreStack layers:
    - Raster: {', '.join(CORESTACK_DATA_PRODUCTS['raster_layers'])}
    - Vector: {', '.join(CORESTACK_DATA_PRODUCTS['vector_layers'])}
    - Timeseries: {', '.join(CORESTACK_DATA_PRODUCTS['timeseries_metrics'])}
 
-**IMPORTANT: PRE-COMPUTED CHANGE DETECTION LAYERS (2017-2022)**
-
-CoreStack provides pre-computed change detection layers covering 2017-2022. Use these for change queries instead of computing from raw LULC:
-
-a) **change_tree_cover_loss_raster**: Tree cover loss 2017-2022
-   - Class values: 0 = No change, 1 = Tree loss
-   - Use for: "tree cover loss since 2018", "deforestation"
-   - MASK to class 1 to get loss areas
-
-b) **change_tree_cover_gain_raster**: Tree cover gain 2017-2022  
-   - Class values: 0 = No change, 1 = Tree gain
-   - Use for: "tree cover gain", "reforestation"
-   - MASK to class 1 to get gain areas
-
-c) **change_urbanization_raster**: Built-up expansion 2017-2022
-   - Class 1: BuiltUp → BuiltUp (stable)
-   - Class 2: NonBuiltUp → BuiltUp (new urbanization)
-   - Class 3: Crops → BuiltUp (CROPLAND TO BUILT-UP CONVERSION)
-   - Class 4: Forest → BuiltUp (forest lost to urban)
-   - Use for: "cropland to built-up", "urban expansion", "loss of agricultural land"
-   - MASK to class 3 for cropland-to-urban conversion
-
-d) **change_cropping_reduction_raster**: Cropland degradation 2017-2022
-   - Shows areas where cropping intensity decreased
-   
-e) **change_cropping_intensity_raster**: Cropping intensity transitions 2017-2022
-   - Shows how cropping patterns changed (single→double, double→triple, etc.)
-
-f) **cropping_intensity_vector**: Vector layer with yearly attributes
-   - Contains cropping intensity values for EACH YEAR (2017-2022+)
-   - Use for: "cropping intensity over years", "temporal trends in cropping"
-   - IMPORTANT: Year data in columns like cropping_intensity_2017, cropping_intensity_2018, etc.
-   - ALWAYS extract year using regex from column names (search for 4-digit numbers)
-
-g) **surface_water_bodies_vector**: Water bodies with temporal attributes
-   - Has seasonal availability and area over years
-   - Use for: "surface water over years", "water availability trends"
-   
-h) **drought_frequency_vector**: Drought severity mapping
-   - Use for: "drought affected areas", "drought frequency"
-
-**IMPORTANT: MICROWATERSHED-LEVEL DATA**:
-CoreStack data is provided at **microwatershed (MWS) level**, NOT village level. Each polygon represents a small watershed area within the tehsil. When analyzing a village:
-1. The data contains ALL microwatersheds in the tehsil covering the village area
-2. NO village name column exists - data is at finer granularity
-3. For village-level analysis: Aggregate statistics across all microwatersheds (use mean, sum, etc.)
-4. Use `uid` column for microwatershed identification
-
-**MULTI-REGION DATA SUPPORT**:
-When village spans multiple tehsils, layers will have MULTIPLE URLs in the 'urls' array.
-Each layer has structure: {{'layer_name': str, 'layer_type': str, 'urls': [{{url, tehsil, district, state}}, ...]}}
-For multi-region layers: Read ALL URLs, concat GeoDataFrames, then analyze.
+   Pre-computed change detection layers (2017-2022) exist for tree cover loss/gain, urbanization,
+   cropping reduction and cropping intensity transitions: use them for change queries instead of
+   computing from raw LULC.
+
+**MICROWATERSHED-LEVEL DATA**: CoreStack data is at microwatershed (MWS) level, NOT village level.
+- The data contains ALL microwatersheds covering the location; NO village name column exists
+- For village-level analysis aggregate across microwatersheds (mean, sum, ...); `uid` identifies a microwatershed
+
+**LOADING LAYER DATA (USE HANDLES, NOT URLS)**:
+Each layer has structure: {{'layer_name': str, 'layer_type': str, 'handle': str, 'urls': [{{url, tehsil, district, state}}, ...]}}
+ALWAYS load data with `load_corestack_layer(layer['handle'])`:
+- Already merged across regions (villages spanning several tehsils), clipped to the queried location and cached:
+  never call gpd.read_file() or rasterio.open() on CoreStack URLs yourself
+- Vector layers → GeoDataFrame; raster layers → dict with 'data' (2D numpy array), 'transform', 'crs', 'nodata', 'bounds'
+- Pass clip=False to get the full tehsil data instead of the clipped area
 
 2. **CORESTACK USAGE** (for India queries):
     ```python
     import json
     import os
-    import geopandas as gpd
-    import pandas as pd
-    
-    # ALWAYS create exports directory first
-    os.makedirs('./exports', exist_ok=True)
-    
+    os.makedirs('./exports', exist_ok=True)  # ALWAYS first
+
     result = fetch_corestack_data("your query about India")
     data = json.loads(result)
-    
+
     if data['success'] and data['data_type'] == 'spatial':
-        # Access layer data from result
         vector_layers = data['spatial_data']['vector_layers']
         raster_layers = data['spatial_data']['raster_layers']
-        
-        # EXAMPLE 1: TEMPORAL VECTOR (Cropping Intensity Over Years)
         for layer in vector_layers:
             if 'Cropping Intensity' in layer['layer_name']:
-                # Handle multi-region: Read all URLs and concat
-                all_gdfs = []
-                for url_info in layer['urls']:
-                    gdf = gpd.read_file(url_info['url'])
-                    all_gdfs.append(gdf)
-                
-                # Merge all regions
-                merged_gdf = pd.concat(all_gdfs, ignore_index=True)
-                
-                # CRITICAL: Extract years from column names (e.g., 'cropping_intensity_2017')
-                import re
-                year_cols = [col for col in merged_gdf.columns if 'cropping_intensity_' in col and re.search(r'\\d{{4}}', col)]
-                
-                # Parse year from column name: 'cropping_intensity_2017' -> 2017
-                years_data = []
-                for col in sorted(year_cols):
-                    year_match = re.search(r'(\\d{{4}})', col)
-                    if year_match:
-                        year = int(year_match.group(1))
-                        avg_value = merged_gdf[col].mean()
-                        years_data.append((year, avg_value))
-                
-                # Sort by year and plot
-                years_data.sort()
-                years_list = [y[0] for y in years_data]
-                values_list = [y[1] for y in years_data]
-                
-                import matplotlib.pyplot as plt
-                plt.figure(figsize=(10, 6))
-                plt.plot(years_list, values_list, marker='o')
-                plt.xlabel('Year')
-                plt.ylabel('Average Cropping Intensity')
-                plt.title('Cropping Intensity Over Years')
-                plt.savefig('./exports/cropping_intensity_over_years.png')
-                print(f"Years: {{years_list}}")
-                print(f"Values: {{values_list}}")
-        
-        # EXAMPLE 2: CHANGE DETECTION RASTER (Tree Cover Loss)
-        for layer in raster_layers:
-            if 'Change Tree Cover Loss' in layer['layer_name']:
-                import rasterio
-                # For rasters, typically use first URL (single region or mosaic)
-                url = layer['urls'][0]['url']
-                with rasterio.open(url) as src:
-                    loss_data = src.read(1)
-                    # Mask to class 1 (loss areas)
-                    loss_mask = (loss_data == 1)
-                    loss_area_pixels = loss_mask.sum()
-                    # Convert to hectares using pixel size
-                    pixel_area = src.transform[0] * abs(src.transform[4])
-                    loss_area_ha = loss_area_pixels * pixel_area / 10000
-                    print(f"Tree cover loss: {{loss_area_ha:.2f}} hectares")
-                
+                gdf = load_corestack_layer(layer['handle'])
     elif data['success'] and data['data_type'] == 'timeseries':
-        # Access timeseries data
         timeseries = data['timeseries_data']
-        # Process timeseries for temporal analysis
     ```
-3. **EARTH ENGINE (SUPPLEMENTARY)**: ONLY use Earth Engine if CoreStack doesn't have the required data or for non-India queries. When using Earth Engine:
+"""
+
+PROMPT_RULES = """
+3. **EARTH ENGINE (SUPPLEMENTARY)**: ONLY use Earth Engine if CoreStack doesn't have the required data or for non-India queries:
    - Initialize with: `ee.Initialize(project='apt-achievment-453417-h6')`
    - Use harmonized Sentinel-2 (COPERNICUS/S2_SR_HARMONIZED) and harmonized Landsat (LANDSAT/LC08/C02/T1_L2)
-   - Export to local machine using geedim:
-    ```python
-    import geedim as gd
-    gd_image = gd.MaskedImage(ee_image)
-    gd_image.download(filename=output_filename, scale=scale, region=ee_geom, crs='EPSG:4326')
-    ```
+   - Export with geedim: `gd.MaskedImage(ee_image).download(filename=output_filename, scale=scale, region=ee_geom, crs='EPSG:4326')`
 4. You can also use OpenStreetMap (osmnx) for additional context like roads, buildings, etc.
-5. Then, you should write python code to perform the task.
-6. When reading up vector data, always use to_crs method to convert to EPSG:4326.
-7. **CRS HANDLING (CRITICAL)**:
-   - CoreStack data: EPSG:4326 (WGS84 lat/lon)
-   - India UTM Zone: EPSG:32643 (for area calculations)
-   - For area: ALWAYS reproject to EPSG:32643 BEFORE calculating
+5. When reading vector data, always use to_crs to convert to EPSG:4326.
+6. **CRS HANDLING (CRITICAL)**:
+   - CoreStack data: EPSG:4326 (WGS84 lat/lon); verify the CRS of every data product before analysis
+   - India spans UTM zones 43N-46N (EPSG:32643-32646); pick the zone from the data's longitude
+   - For area: ALWAYS reproject BEFORE calculating, e.g. `from area_service import area_service; area_service.area_ha(gdf)` (picks the zone automatically)
    - For distance: Use geodesic calculations (geopy or shapely ops)
-8. Pay extra attention to CRS of the data products, verify them manually before using them in analysis.
-9. Always use actual data sources to perform analysis, do not use dummy/sample data.
-10. **EXPORT FORMATS**:
-    - All vector data should be exported in GeoJSON
-    - All raster data should be exported in GeoTIFF
-    - All visualizations should be exported in PNG
-    - **CRITICAL**: All exports must be saved to `./exports/` directory (use relative path)
-    - **FIRST STEP**: Always create exports directory: `import os; os.makedirs('./exports', exist_ok=True)`
-    - Use paths like: `'./exports/output.png'`, `'./exports/data.geojson'`, etc.
+7. Always use actual data: NEVER create dummy or sample data; parse the tool's real output.
+8. **EXPORT FORMATS**: vectors → GeoJSON, rasters → GeoTIFF, visualizations → PNG.
+   All exports go to the `./exports/` directory (relative path, create it first); NEVER use `/app/exports/`.
 
 **EXPECTED OUTPUT TYPES** (based on query type):
-- Time series plots: Line charts showing temporal trends (e.g., cropping intensity over years, surface water over years)
-- Change rasters: GeoTIFF files with change detection (e.g., tree cover change, cropland to built-up conversion) + total area statistics in hectares
-- Filtered vectors: GeoJSON files with spatial filtering (e.g., villages with drought, high sensitivity microwatersheds)
-- Rankings: CSV or tables showing ranked microwatersheds/villages by various dimensions
+- Time series plots: Line charts showing temporal trends (e.g. cropping intensity over years)
+- Change rasters: GeoTIFF files with change detection + total area statistics in hectares
+- Filtered vectors: GeoJSON files with spatial filtering (e.g. villages with drought)
+- Rankings: CSV or tables of microwatersheds/villages ranked by various dimensions
 - Similarity analysis: Top-K similar microwatersheds based on multiple attributes
-- Scatterplots: 2D plots showing relationships between variables, with quadrant analysis where applicable
+- Scatterplots: 2D plots of relationships between variables, with quadrant analysis where applicable
 
-**IMPORTANT NOTES**:
-- Access layer data directly from the tool's JSON response: `data['spatial_data']['vector_layers']`
-- Get layer by name by iterating through the layers list and matching the name
-- ALWAYS reproject to UTM (EPSG:32643) before area calculations
-- **CRITICAL**: Save all exports to `./exports/` directory (relative path). Create directory first with `os.makedirs('./exports', exist_ok=True)`
-- NEVER use `/app/exports/` path - that's for Docker only
-- NEVER create dummy or fake data - ALWAYS use the actual data from fetch_corestack_data
-- The tool returns real data in 'Execution logs' - parse and use that data directly
+Wrap your final answer with the expected outputs in final_answer, as a single-line string with \\n delimiters, e.g.:
 
-Make sure to wrap your final answer along with expected outputs as code block with a single-line string with \\n delimiters inside final_answer function. For example, your final response should look like:
+```py
+final_answer("The final answer is .... .\\n Exports:  \\n- export1: ./exports/export1.some_ext  \\n- export2: ./exports/export2.some_ext")
+```
 
-```py  
-final_answer("The final answer is .... .\\n Exports:  \\n- export1: ./exports/export1.some_ext  \\n- export2: ./exports/export2.some_ext")  
+═══════════════════════════════════════════════════════════════════════════════
+LAYER SELECTION DECISION FRAMEWORK
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+PROMPT_FRAMEWORK_CROPPING = """
+**"Cropping Intensity in [Village] Over Years"**
+✅ cropping_intensity_vector (spatial vector)   ❌ NOT watershed timeseries
+- Cropping intensity varies by field; the question is about crops in the village area
+- Yearly values are columns (cropping_intensity_2017, ..., 2023): ALWAYS extract the year from
+  the column name with a regex for 4 digits, aggregate across polygons, plot the trend
+- Watershed timeseries is fortnightly water balance (runoff, precip, ET) with no spatial variation,
+  unrelated to cropping patterns
+- Related change layers: change_cropping_intensity_raster (single→double→triple transitions),
+  change_cropping_reduction_raster (areas where cropping intensity decreased)
+
+```python
+import re
+import matplotlib.pyplot as plt
+gdf = load_corestack_layer(layer['handle'])
+years_data = sorted(
+    (int(re.search(r'(\\d{4})', col).group(1)), gdf[col].mean())
+    for col in gdf.columns if 'cropping_intensity_' in col and re.search(r'\\d{4}', col)
+)
+years_list = [y for y, _ in years_data]
+values_list = [v for _, v in years_data]
+plt.figure(figsize=(10, 6))
+plt.plot(years_list, values_list, marker='o')
+plt.xlabel('Year'); plt.ylabel('Average Cropping Intensity'); plt.title('Cropping Intensity Over Years')
+plt.savefig('./exports/cropping_intensity_over_years.png')
+print(f"Years: {years_list}")
+print(f"Values: {values_list}")
 ```
+"""
+
+PROMPT_FRAMEWORK_SURFACE_WATER = """
+**"Surface Water Availability Over Years in [Village]"**
+✅ PRIMARY: surface_water_bodies_vector   ⚠️ OPTIONAL CONTEXT: water_balance timeseries (watershed trend)
+- Water bodies are physical features (lakes, ponds, reservoirs) with seasonal attributes (Kharif/Rabi/Zaid flags)
+- Clip polygons to the village and sum area per season
+- CAVEAT: it may be a SINGLE SNAPSHOT per year; for multi-year trends count water pixels
+  (classes 2-4) in land_use_land_cover_raster for 2017-2024
+"""
+
+PROMPT_FRAMEWORK_TREE_CHANGE = """
+**"Tree Cover Loss/Gain in [Village] Since [Year]"**
+✅ change_tree_cover_loss_raster / change_tree_cover_gain_raster (0 = no change, 1 = loss/gain)
+- Pre-computed 2017-2022 composite (mode of 2017-2019 vs 2020-2022): mask to class 1, count pixels,
+  convert to hectares; cheaper than comparing LULC years yourself
+- FALLBACK for custom periods (e.g. 2018-2024): compare class 6 (trees) in land_use_land_cover_raster across years
+
+```python
+raster = load_corestack_layer(layer['handle'])  # window mosaicked across regions, clipped
+loss_pixels = (raster['data'] == 1).sum()
+pixel_area = raster['transform'][0] * abs(raster['transform'][4])
+print(f"Tree cover loss: {loss_pixels * pixel_area / 10000:.2f} hectares")
+```
+"""
 
-Task: {task}
+PROMPT_FRAMEWORK_URBANIZATION = """
+**"Cropland to Built-up Conversion / Urban Expansion in [Village]"**
+✅ change_urbanization_raster (2017-2022 composite)
+- Class 1: BuiltUp → BuiltUp (stable); 2: NonBuiltUp → BuiltUp (new urbanization);
+  3: Crops → BuiltUp (CROPLAND TO BUILT-UP); 4: Forest → BuiltUp
+- Mask to class 3 for cropland-to-urban conversion, count pixels, convert to hectares
 """
 
+PROMPT_FRAMEWORK_DROUGHT = """
+**"Drought Affected Areas / Drought Frequency"**
+✅ drought_frequency_vector: filter microwatersheds by drought severity/frequency attributes
+"""
+
+PROMPT_FRAMEWORK_TIMESERIES = """
+**"Water Balance / Runoff / Precipitation Over Time for a Watershed"**
+✅ Watershed timeseries (fetch_corestack_data returns data_type 'timeseries')
+- Arrays per fortnight: year[], fortnight[], runoff[], precipitation[], ...; one value per watershed
+- Aggregate fortnights to years for yearly trends; do not expect spatial variation
+"""
+
+CORESTACK_PROMPT = PromptBuilder(
+    "codeact.corestack",
+    static=[
+        ("role", PROMPT_ROLE),
+        ("corestack", PROMPT_CORESTACK),
+        ("rules", PROMPT_RULES),
+    ],
+    optional=[
+        ("framework.cropping", ("cropping",), PROMPT_FRAMEWORK_CROPPING),
+        ("framework.surface_water", ("surface_water",), PROMPT_FRAMEWORK_SURFACE_WATER),
+        ("framework.tree_change", ("tree_change",), PROMPT_FRAMEWORK_TREE_CHANGE),
+        ("framework.urbanization", ("urbanization",), PROMPT_FRAMEWORK_URBANIZATION),
+        ("framework.drought", ("drought",), PROMPT_FRAMEWORK_DROUGHT),
+        ("framework.timeseries", ("timeseries",), PROMPT_FRAMEWORK_TIMESERIES),
+    ]
+)
+
+
+def create_corestack_prompt(task: str) -> str:
+    """
+    Creates the CodeAct prompt, with CoreStack as primary data source.
+    
+    Key features:
+    - Emphasizes CoreStack as primary data source for India-specific queries
+    - Includes Earth Engine as supplementary tool for global/non-India data
+    - Lists all correct libraries and proper export formats
+    - Specifies expected output types
+    - Includes only the decision-framework sections relevant to the task
+      (all of them when none is recognized)
+    """
+    prompt = CORESTACK_PROMPT.build(
+        dynamic=[("task", f"\nTask: {task}\n")],
+        intents=detect_intents(task)
+    )
+    return prompt.text
+
 
 # ============================================================================
 # HYBRID AGENT (CodeAct + LangGraph Tool)
@@ -482,17 +551,17 @@ def run_hybrid_agent(user_query: str, exports_dir: str = None):
     print("="*70)
     
     # Use LiteLLM for Gemini (smolagents compatible)
-    model = LiteLLMModel(
+    model = smolagents.LiteLLMModel(
         model_id="gemini/gemini-2.5-flash-lite",
         api_key=os.getenv("GEMINI_API_KEY")
     )
     
-    # Create tools list - NOTE: Only CoreStack tool, NO web_search to force using it
-    tools = [fetch_corestack_data]
+    # Create tools list - NOTE: Only CoreStack tools, NO web_search to force using them
+    tools = get_corestack_tools()
     
     # Use local Python executor
     print("✅ Using local Python executor")
-    agent = CodeAgent(
+    agent = smolagents.CodeAgent(
         model=model,
         tools=tools,
         additional_authorized_imports=["*"]
@@ -502,8 +571,9 @@ def run_hybrid_agent(user_query: str, exports_dir: str = None):
         # Generate prompt and run agent
         prompt = create_corestack_prompt(user_query)
         
-        # Run agent
-        result = agent.run(prompt)
+        # Run agent; repeated tool calls within the run are served from tool_cache
+        with agent_run_scope():
+            result = agent.run(prompt)
         
         print("\n" + "="*70)
         print("✅ AGENT COMPLETED")
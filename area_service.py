@@ -0,0 +1,174 @@
+"""
+Area Computation Service for CoreStack Agent System
+- Picks a metric CRS per layer from its bbox (UTM zone or local equal-area)
+- Caches projected geometries per layer version and geometry fingerprint
+- Batches area computation across many layers in one call
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Iterable
+
+from lazy_imports import lazy_module
+from tracing import record_cache_hit
+
+gpd = lazy_module("geopandas")
+
+# A bbox wider than this (degrees of longitude) cannot be served by one UTM
+# zone without noticeable scale error, so an equal-area projection is used.
+MAX_UTM_SPAN_DEG = 6.0
+
+SQ_M_PER_HA = 10000.0
+
+
+def utm_epsg_for_lonlat(lon: float, lat: float) -> int:
+    """Return the WGS84 UTM EPSG code for a lon/lat (326xx north, 327xx south)."""
+    zone = int(math.floor((lon + 180.0) / 6.0)) + 1
+    zone = min(max(zone, 1), 60)
+    return (32600 if lat >= 0 else 32700) + zone
+
+
+def select_area_crs(bounds: Tuple[float, float, float, float]) -> str:
+    """
+    Choose a metric CRS for area calculation from a EPSG:4326 bbox.
+
+    Args:
+        bounds: (minx, miny, maxx, maxy) in degrees
+
+    Returns:
+        "EPSG:326xx" when the bbox fits inside a single UTM zone (e.g. zones
+        43-46 across India), otherwise a Lambert azimuthal equal-area
+        projection centred on the bbox.
+    """
+    minx, miny, maxx, maxy = bounds
+    center_lon = (minx + maxx) / 2.0
+    center_lat = (miny + maxy) / 2.0
+
+    if (maxx - minx) <= MAX_UTM_SPAN_DEG and \
+            utm_epsg_for_lonlat(minx, center_lat) == utm_epsg_for_lonlat(maxx, center_lat):
+        return f"EPSG:{utm_epsg_for_lonlat(center_lon, center_lat)}"
+
+    return (f"+proj=laea +lat_0={center_lat:.6f} +lon_0={center_lon:.6f} "
+            f"+x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs")
+
+
+def geometry_fingerprint(series) -> Tuple[int, Tuple[float, ...]]:
+    """Row count and bounds of a GeoSeries; part of the cache key so a hit always matches the input."""
+    if len(series) == 0:
+        return (0, ())
+    return (len(series), tuple(round(float(b), 9) for b in series.total_bounds))
+
+
+class AreaService:
+    """
+    Computes geometry areas in hectares with the correct projection.
+
+    Projected geometries are cached under (layer_key, version, fingerprint) so
+    a layer that is queried repeatedly is only reprojected once. Callers pass a
+    version (ETag, content hash) whenever the underlying data can change; the
+    fingerprint (row count and bounds of the geometries passed in) keeps a hit
+    from returning another layer's projection when the version is unknown.
+    """
+
+    def __init__(self, max_layers: int = 64):
+        self.max_layers = max_layers
+        self._cache: "OrderedDict[Tuple[str, Any], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def project(self, geoms, layer_key: Optional[str] = None, version: Any = None) -> "gpd.GeoSeries":
+        """
+        Return geometries projected to the layer's metric CRS.
+
+        Args:
+            geoms: GeoDataFrame or GeoSeries (CRS assumed EPSG:4326 if unset)
+            layer_key: Cache key for the layer (e.g. its URL); None disables caching
+            version: Layer version; a new version invalidates the cached projection
+
+        Returns:
+            GeoSeries in a metric CRS, indexed like the input
+        """
+        series = geoms.geometry if isinstance(geoms, gpd.GeoDataFrame) else geoms
+        cache_key = (layer_key, version, geometry_fingerprint(series)) if layer_key is not None else None
+        if cache_key is not None:
+            with self._lock:
+                cached = self._cache.get(cache_key)
+                if cached is not None:
+                    self._cache.move_to_end(cache_key)
+                    record_cache_hit("area_projection")
+                    return cached
+
+        if series.crs is None:
+            series = series.set_crs("EPSG:4326")
+
+        if len(series) == 0:
+            projected = series
+        else:
+            bounds = series.to_crs("EPSG:4326").total_bounds
+            projected = series.to_crs(select_area_crs(tuple(bounds)))
+
+        if cache_key is not None:
+            with self._lock:
+                # Drop older versions of the same layer before caching the new one
+                for key in [k for k in self._cache if k[0] == layer_key and k != cache_key]:
+                    del self._cache[key]
+                self._cache[cache_key] = projected
+                while len(self._cache) > self.max_layers:
+                    self._cache.popitem(last=False)
+
+        return projected
+
+    def area_ha(self, geoms, layer_key: Optional[str] = None, version: Any = None,
+                index: Optional[Iterable] = None) -> float:
+        """
+        Total area in hectares.
+
+        Args:
+            geoms: GeoDataFrame or GeoSeries
+            layer_key: Cache key for the layer
+            version: Layer version
+            index: Optional subset of row labels (e.g. after filtering) to sum over
+        """
+        projected = self.project(geoms, layer_key=layer_key, version=version)
+        if index is not None:
+            projected = projected.loc[list(index)]
+        return float(projected.area.sum()) / SQ_M_PER_HA
+
+    def compute_areas(self, layers: Dict[str, Any], versions: Optional[Dict[str, Any]] = None,
+                      per_geometry: bool = False) -> Dict[str, Any]:
+        """
+        Batch area computation for many layers in one call.
+
+        Args:
+            layers: {layer_key: GeoDataFrame | GeoSeries}
+            versions: Optional {layer_key: version}
+            per_geometry: Also return per-feature areas (ha) for each layer
+
+        Returns:
+            {layer_key: {'total_area_ha': float, 'crs': str, 'areas_ha': [...]}}
+            or {layer_key: {'error': str}} for layers that could not be projected
+        """
+        versions = versions or {}
+        results = {}
+        for layer_key, geoms in layers.items():
+            try:
+                projected = self.project(geoms, layer_key=layer_key, version=versions.get(layer_key))
+                areas = projected.area / SQ_M_PER_HA
+                entry = {
+                    'total_area_ha': float(areas.sum()),
+                    'crs': projected.crs.to_string() if projected.crs is not None else None
+                }
+                if per_geometry:
+                    entry['areas_ha'] = [float(a) for a in areas]
+                results[layer_key] = entry
+            except Exception as e:
+                results[layer_key] = {'error': f"{type(e).__name__}: {e}"}
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Shared per-process instance
+area_service = AreaService()
@@ -4,59 +4,584 @@ Artifact Registry for CoreStack Agent System
 - Provides caching, versioning, and lineage tracking
 """
 
+import os
+import abc
 import json
+import atexit
 import hashlib
 import sqlite3
+import threading
 import time
+import io
+import random
+import weakref
+import contextlib
+
+from blob_store import BlobStore, BLOB_THRESHOLD_BYTES, blob_dir_for
+
+# Registrations are written in one transaction per batch, when this many
+# are pending or FLUSH_INTERVAL_S after the first one, whichever comes first
+WRITE_BATCH_SIZE = 64
+FLUSH_INTERVAL_S = 0.5
+# A failed batch stays pending and is retried after this delay, doubling up to WRITE_RETRY_MAX_S
+WRITE_RETRY_S = 1.0
+WRITE_RETRY_MAX_S = 30.0
+# The writer thread exits after this long without registrations (restarted on demand)
+WRITER_IDLE_S = 30.0
+
+# ------------------------------------------------------
+# Retention (applied by ArtifactRegistry.gc / `python artifact.py gc`)
+# ------------------------------------------------------
+DAY_S = 24 * 3600
+
+# Age limits are opt-in. Default maximum age for any artifact (from
+# ARTIFACT_MAX_AGE_DAYS); None keeps artifacts forever
+DEFAULT_MAX_AGE_S = float(os.getenv("ARTIFACT_MAX_AGE_DAYS", 0)) * DAY_S or None
+
+# Suggested per-type maximum ages (pass as retention_by_type, or --type-retention
+# on the CLI). Raw API payloads are the largest and the cheapest to re-fetch;
+# final responses are kept longest.
+RETENTION_BY_TYPE = {
+    "fetch_mws_data": 7 * DAY_S,
+    "fetch_spatial_layers": 7 * DAY_S,
+    "format_response": 90 * DAY_S,
+}
+
+# Upper bound on stored content (SQLite + blobs); oldest artifacts go first
+MAX_TOTAL_BYTES = int(float(os.getenv("ARTIFACT_MAX_SIZE_MB", 1024)) * 1024 * 1024)
+
+# Connections wait this long for a competing writer (other thread or process)
+BUSY_TIMEOUT_S = float(os.getenv("ARTIFACT_BUSY_TIMEOUT_S", 30))
+# Extra attempts when SQLite reports busy/locked despite the timeout
+BUSY_RETRIES = 5
+
+GC_DELETE_BATCH = 500
+VACUUM_PAGES_PER_BATCH = 256
+
+
+# ======================================================
+# STORAGE BACKENDS
+# ======================================================
+
+class RegistryBackend(abc.ABC):
+    """
+    Where ArtifactRegistry keeps its tables.
+
+    A backend hands out DB-API 2.0 connections that accept SQLite's SQL
+    dialect (PRAGMA table_info, triggers, temp tables, recursive CTEs) with
+    qmark parameters. The registry opens one connection per thread and never
+    shares a connection between threads. Everything beyond plain DB-API
+    (transaction mode, page reclamation) goes through the hooks below.
+    """
+
+    name = "backend"
+
+    @abc.abstractmethod
+    def connect(self):
+        """Open a new connection."""
+
+    def configure(self, conn):
+        """Per-connection setup, run once after connect()."""
+
+    def begin(self, cursor):
+        """Start a write transaction. DB-API drivers open one implicitly, so by default nothing runs."""
+
+    def reclaim_pages(self, cursor, pages: int):
+        """Return free pages to the filesystem after deletes (pages=0: all). No-op by default."""
+
+    def compact(self, cursor, pages=None):
+        """Full compaction (see ArtifactRegistry.compact); unsupported by default."""
+        return {"mode": "none"}
+
+    def is_busy_error(self, exc) -> bool:
+        """Whether exc is a transient lock conflict worth retrying."""
+        return False
+
+    def describe(self) -> str:
+        return self.name
+
+
+class SQLiteBackend(RegistryBackend):
+    """Local SQLite file in WAL mode; safe for many threads and processes on one host."""
+
+    name = "sqlite"
+
+    def __init__(self, path="artifacts.db", busy_timeout_s=BUSY_TIMEOUT_S):
+        self.path = path
+        self.busy_timeout_s = busy_timeout_s
+
+    def connect(self):
+        # Only closed from another thread (in close()); never used concurrently
+        return sqlite3.connect(self.path, timeout=self.busy_timeout_s, check_same_thread=False)
+
+    def configure(self, conn):
+        # auto_vacuum must be set before the first table exists; it is a
+        # no-op on existing databases (compact() migrates those)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_s * 1000)}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+    def begin(self, cursor):
+        # Take the write lock up front, so a competing writer makes this one
+        # wait on the busy timeout instead of failing mid-transaction
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def reclaim_pages(self, cursor, pages: int):
+        cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+        cursor.fetchall()
+
+    def compact(self, cursor, pages=None):
+        cursor.execute("PRAGMA auto_vacuum")
+        if cursor.fetchone()[0] != 2:
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            cursor.execute("VACUUM")
+            return {"mode": "full"}
+        cursor.execute("PRAGMA freelist_count")
+        free_before = cursor.fetchone()[0]
+        self.reclaim_pages(cursor, pages or 0)
+        cursor.execute("PRAGMA freelist_count")
+        free_after = cursor.fetchone()[0]
+        return {"mode": "incremental", "pages_freed": free_before - free_after}
+
+    def is_busy_error(self, exc) -> bool:
+        message = str(exc).lower()
+        return isinstance(exc, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+    def describe(self) -> str:
+        return f"sqlite:{self.path}"
+
+
+class DBAPIBackend(RegistryBackend):
+    """
+    Any DB-API 2.0 driver for a server speaking SQLite's dialect (e.g. a
+    shared libSQL/sqld instance), for deployments where several hosts
+    write to one registry. Only DB-API calls are made on its connections:
+    transactions are the driver's implicit ones and no pages are reclaimed
+    after gc() (run the server's own compaction instead).
+
+    Args:
+        connect_fn: Zero-argument callable returning a new connection
+        name: Label used in logs
+        init_statements: SQL run on every new connection
+        busy_errors: Exception types treated as retryable lock conflicts
+    """
+
+    def __init__(self, connect_fn, name="dbapi", init_statements=(), busy_errors=()):
+        self.connect_fn = connect_fn
+        self.name = name
+        self.init_statements = tuple(init_statements)
+        self.busy_errors = tuple(busy_errors)
+
+    def connect(self):
+        return self.connect_fn()
+
+    def configure(self, conn):
+        c = conn.cursor()
+        try:
+            for statement in self.init_statements:
+                c.execute(statement)
+        finally:
+            c.close()
+
+    def is_busy_error(self, exc) -> bool:
+        return bool(self.busy_errors) and isinstance(exc, self.busy_errors)
+
+
+class _ConnectionHolder:
+    """Thread-local slot for one connection; freed with its thread."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+def _release_connection(connections, lock, conn):
+    with lock:
+        if connections.pop(id(conn), None) is None:
+            return
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _close_at_exit(registry_ref):
+    registry = registry_ref()
+    if registry is not None:
+        registry.close()
+
 
 class ArtifactRegistry:
-    def __init__(self, db_path="artifacts.db"):
-        self.conn = sqlite3.connect(db_path)
+    def __init__(self, db_path="artifacts.db", batch_size=WRITE_BATCH_SIZE, flush_interval=FLUSH_INTERVAL_S,
+                 blob_store=None, blob_threshold=BLOB_THRESHOLD_BYTES, backend=None):
+        self.db_path = db_path
+        self.backend = backend or SQLiteBackend(db_path)
+        # Payloads of blob_threshold bytes or more are kept out of SQLite, in
+        # artifact_blobs/ next to the database unless a store is given
+        self.blob_store = blob_store or BlobStore(blob_dir_for(db_path))
+        self.blob_threshold = blob_threshold
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # One connection per thread, closed when its thread exits; all live
+        # ones are tracked (id -> connection) so close() can release them
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+
+        # Registered but not yet committed: id -> row. `get` reads from here
+        # first, so a run always sees its own registrations.
+        self._pending = {}
+        self._pending_since = None
+        self._pending_cond = threading.Condition()
+        self._writer = None
+        self._closed = False
+
         self._init_db()
+        # Weak, so the exit hook does not keep every registry alive
+        atexit.register(_close_at_exit, weakref.ref(self))
+
+    # ------------------------------------------------------
+    # Connections
+    # ------------------------------------------------------
+
+    @property
+    def conn(self):
+        """This thread's connection, opened on first use."""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = self.backend.connect()
+            self.backend.configure(conn)
+            holder = _ConnectionHolder(conn)
+            with self._connections_lock:
+                self._connections[id(conn)] = conn
+            # The thread-local holder is dropped when the thread exits
+            weakref.finalize(holder, _release_connection, self._connections, self._connections_lock, conn)
+            self._local.holder = holder
+        return holder.conn
+
+    @contextlib.contextmanager
+    def _cursor(self, write=False):
+        """
+        Cursor on this thread's connection.
+
+        With write=True the block runs in a transaction started by the
+        backend (BEGIN IMMEDIATE on SQLite); it commits on exit and rolls
+        back on error.
+        """
+        conn = self.conn
+        c = conn.cursor()
+        if write:
+            self._begin(c)
+        try:
+            yield c
+            if write:
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            c.close()
+
+    def _begin(self, c):
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                self.backend.begin(c)
+                return
+            except Exception as e:
+                if attempt == BUSY_RETRIES or not self.backend.is_busy_error(e):
+                    raise
+                time.sleep(min(2.0, 0.05 * (2 ** attempt)) * (0.5 + random.random()))
+
+    def _close_connections(self):
+        with self._connections_lock:
+            connections = list(self._connections.values())
+        for conn in connections:
+            _release_connection(self._connections, self._connections_lock, conn)
+        self._local = threading.local()
 
     def _init_db(self):
-        c = self.conn.cursor()
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS artifacts (
-            id TEXT PRIMARY KEY,
-            type TEXT,
-            content TEXT,
-            parent_id TEXT,
-            timestamp REAL
-        )
-        """)
-        self.conn.commit()
+        # One transaction, so processes opening a fresh database concurrently
+        # do not race on the migrations below
+        with self._cursor(write=True) as c:
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                id TEXT PRIMARY KEY,
+                type TEXT,
+                content TEXT,
+                parent_id TEXT,
+                timestamp REAL
+            )
+            """)
+            # Migrate databases created before the blob store existed
+            c.execute("PRAGMA table_info(artifacts)")
+            columns = {row[1] for row in c.fetchall()}
+            if "blob_ref" not in columns:
+                c.execute("ALTER TABLE artifacts ADD COLUMN blob_ref TEXT")
+            if "content_size" not in columns:
+                c.execute("ALTER TABLE artifacts ADD COLUMN content_size INTEGER")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_type ON artifacts(type)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_parent ON artifacts(parent_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_timestamp ON artifacts(timestamp)")
+
+            # Per-type counters kept current by triggers, so get_stats never scans
+            c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='artifact_counts'")
+            backfill = c.fetchone() is None
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS artifact_counts (
+                type TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL DEFAULT 0
+            )
+            """)
+            c.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_artifacts_count_insert AFTER INSERT ON artifacts
+            BEGIN
+                INSERT OR IGNORE INTO artifact_counts (type, count, bytes) VALUES (IFNULL(NEW.type, ''), 0, 0);
+                UPDATE artifact_counts
+                SET count = count + 1,
+                    bytes = bytes + COALESCE(NEW.content_size, length(NEW.content), 0)
+                WHERE type = IFNULL(NEW.type, '');
+            END
+            """)
+            c.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_artifacts_count_delete AFTER DELETE ON artifacts
+            BEGIN
+                UPDATE artifact_counts
+                SET count = count - 1,
+                    bytes = bytes - COALESCE(OLD.content_size, length(OLD.content), 0)
+                WHERE type = IFNULL(OLD.type, '');
+                DELETE FROM artifact_counts WHERE type = IFNULL(OLD.type, '') AND count <= 0;
+            END
+            """)
+            # Node result cache (see node_cache.py): cache key -> node_output artifact
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS node_cache (
+                cache_key TEXT PRIMARY KEY,
+                node TEXT,
+                artifact_id TEXT,
+                created REAL
+            )
+            """)
+            if backfill:
+                c.execute("""
+                INSERT OR REPLACE INTO artifact_counts (type, count, bytes)
+                SELECT IFNULL(type, ''), COUNT(*), SUM(COALESCE(content_size, length(content), 0))
+                FROM artifacts GROUP BY IFNULL(type, '')
+                """)
+
+    # ------------------------------------------------------
+    # Write path
+    # ------------------------------------------------------
 
     def register(self, artifact_type, content, parent_id=None):
         artifact_json = json.dumps(content, sort_keys=True)
         artifact_id = hashlib.sha256(artifact_json.encode()).hexdigest()
         timestamp = time.time()
-        c = self.conn.cursor()
-        c.execute("""
-        INSERT OR IGNORE INTO artifacts (id, type, content, parent_id, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-        """, (artifact_id, artifact_type, artifact_json, parent_id, timestamp))
-        self.conn.commit()
+
+        with self._pending_cond:
+            if self._closed:
+                # Late registrations (e.g. during interpreter shutdown) are written directly
+                self._write_rows([(artifact_id, artifact_type, artifact_json, parent_id, timestamp)])
+                return artifact_id
+            # INSERT OR IGNORE semantics: the first registration of an id wins
+            if artifact_id not in self._pending:
+                self._pending[artifact_id] = (artifact_id, artifact_type, artifact_json, parent_id, timestamp)
+                if self._pending_since is None:
+                    self._pending_since = time.monotonic()
+            self._ensure_writer()
+            if len(self._pending) >= self.batch_size:
+                self._pending_cond.notify()
         return artifact_id
 
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._writer_loop, name="artifact-writer", daemon=True)
+            self._writer.start()
+
+    def _writer_loop(self):
+        failures = 0
+        retry_at = 0.0
+        while True:
+            with self._pending_cond:
+                while not self._closed:
+                    if failures:
+                        remaining = retry_at - time.monotonic()
+                    elif len(self._pending) >= self.batch_size:
+                        break
+                    elif self._pending_since is not None:
+                        remaining = self._pending_since + self.flush_interval - time.monotonic()
+                    else:
+                        # Exit when idle, so the thread does not pin the registry
+                        if not self._pending_cond.wait(WRITER_IDLE_S) and not self._pending:
+                            self._writer = None
+                            return
+                        continue
+                    if remaining <= 0:
+                        break
+                    self._pending_cond.wait(remaining)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+                failures = 0
+            except Exception as e:
+                # The rows stay pending; back off and retry rather than let the thread die
+                failures += 1
+                delay = min(WRITE_RETRY_MAX_S, WRITE_RETRY_S * 2 ** (failures - 1))
+                retry_at = time.monotonic() + delay
+                print(f"⚠️  Artifact write failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+
+    def _write_rows(self, rows):
+        records = []
+        for artifact_id, artifact_type, artifact_json, parent_id, timestamp in rows:
+            data = artifact_json.encode()
+            if len(data) >= self.blob_threshold:
+                # The artifact id is the sha256 of these bytes, so it doubles as the blob address
+                blob_ref = self.blob_store.put(data, digest=artifact_id)
+                records.append((artifact_id, artifact_type, None, parent_id, timestamp, blob_ref, len(data)))
+            else:
+                records.append((artifact_id, artifact_type, artifact_json, parent_id, timestamp, None, len(data)))
+
+        with self._cursor(write=True) as c:
+            c.executemany("""
+            INSERT OR IGNORE INTO artifacts (id, type, content, parent_id, timestamp, blob_ref, content_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, records)
+
+    def flush(self):
+        """Commit all pending registrations in a single transaction."""
+        with self._pending_cond:
+            rows = list(self._pending.values())
+            self._pending_since = None
+        if not rows:
+            return 0
+        try:
+            self._write_rows(rows)
+        except Exception:
+            with self._pending_cond:
+                if self._pending and self._pending_since is None:
+                    self._pending_since = time.monotonic()
+            raise
+        with self._pending_cond:
+            # Drop only what was written; newer registrations stay pending
+            for row in rows:
+                if self._pending.get(row[0]) is row:
+                    del self._pending[row[0]]
+            if self._pending and self._pending_since is None:
+                self._pending_since = time.monotonic()
+        return len(rows)
+
+    def close(self):
+        """Flush pending registrations and stop the writer thread (also run at exit)."""
+        with self._pending_cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending_cond.notify_all()
+            writer = self._writer
+        if writer is not None and writer is not threading.current_thread():
+            writer.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"❌ {len(self._pending)} artifact registrations could not be written: {type(e).__name__}: {e}")
+        self._close_connections()
+
+    # ------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------
+
+    def _load_content(self, content, blob_ref):
+        if blob_ref is not None:
+            with self.blob_store.open(blob_ref) as stream:
+                return json.load(stream)
+        return json.loads(content)
+
     def get(self, artifact_id):
-        c = self.conn.cursor()
-        c.execute("SELECT type, content, parent_id, timestamp FROM artifacts WHERE id=?", (artifact_id,))
-        row = c.fetchone()
+        with self._pending_cond:
+            pending = self._pending.get(artifact_id)
+        if pending:
+            row = pending[1:] + (None,)
+        else:
+            with self._cursor() as c:
+                c.execute("SELECT type, content, parent_id, timestamp, blob_ref FROM artifacts WHERE id=?",
+                          (artifact_id,))
+                row = c.fetchone()
         if row:
             return {
                 "id": artifact_id,
                 "type": row[0],
-                "content": json.loads(row[1]),
+                "content": self._load_content(row[1], row[4]),
                 "parent_id": row[2],
                 "timestamp": row[3]
             }
         return None
 
+    def _content_row(self, artifact_id):
+        with self._pending_cond:
+            pending = self._pending.get(artifact_id)
+        if pending:
+            return pending[2], None
+        with self._cursor() as c:
+            c.execute("SELECT content, blob_ref FROM artifacts WHERE id=?", (artifact_id,))
+            return c.fetchone()
+
+    def get_content(self, artifact_id):
+        """Load and decode only the content of an artifact (None if unknown)."""
+        row = self._content_row(artifact_id)
+        return self._load_content(*row) if row else None
+
+    def open_content(self, artifact_id):
+        """
+        Binary stream over an artifact's JSON content, for large payloads
+        that should not be loaded in one piece (None if unknown).
+        """
+        row = self._content_row(artifact_id)
+        if not row:
+            return None
+        content, blob_ref = row
+        if blob_ref is not None:
+            return self.blob_store.open(blob_ref)
+        return io.BytesIO(content.encode())
+
+    def get_lineage(self, artifact_id, max_depth=256):
+        """
+        Ancestry of an artifact in one recursive query, metadata only.
+
+        Args:
+            artifact_id: Artifact to start from
+            max_depth: Stop after this many hops (guards against cycles)
+
+        Returns:
+            List of {id, type, parent_id, timestamp, content_size}, oldest
+            ancestor first and artifact_id last. Use get_content(id) to load
+            an entry's content.
+        """
+        self.flush()
+        with self._cursor() as c:
+            c.execute("""
+            WITH RECURSIVE lineage(id, type, parent_id, timestamp, content_size, depth) AS (
+                SELECT id, type, parent_id, timestamp, COALESCE(content_size, length(content)), 0
+                FROM artifacts WHERE id=?
+                UNION ALL
+                SELECT a.id, a.type, a.parent_id, a.timestamp, COALESCE(a.content_size, length(a.content)), l.depth + 1
+                FROM artifacts a JOIN lineage l ON a.id = l.parent_id
+                WHERE l.depth < ?
+            )
+            SELECT id, type, parent_id, timestamp, content_size FROM lineage ORDER BY depth DESC
+            """, (artifact_id, max_depth))
+            rows = c.fetchall()
+        return [
+            {"id": r[0], "type": r[1], "parent_id": r[2], "timestamp": r[3], "content_size": r[4]}
+            for r in rows
+        ]
+
     def find_by_type(self, artifact_type):
-        c = self.conn.cursor()
-        c.execute("SELECT id, content FROM artifacts WHERE type=?", (artifact_type,))
-        return [(row[0], json.loads(row[1])) for row in c.fetchall()]
+        self.flush()
+        with self._cursor() as c:
+            c.execute("SELECT id, content, blob_ref FROM artifacts WHERE type=?", (artifact_type,))
+            rows = c.fetchall()
+        return [(row[0], self._load_content(row[1], row[2])) for row in rows]
 
     def get_stats(self):
         """
@@ -65,14 +590,424 @@ class ArtifactRegistry:
         Returns:
             Dictionary with counts by artifact type and total count
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT type, COUNT(*) FROM artifacts GROUP BY type")
-        type_counts = dict(cursor.fetchall())
-        
-        cursor.execute("SELECT COUNT(*) FROM artifacts")
-        total_count = cursor.fetchone()[0]
-        
+        self.flush()
+        with self._cursor() as cursor:
+            cursor.execute("SELECT type, count FROM artifact_counts")
+            type_counts = dict(cursor.fetchall())
+
         return {
-            "total_artifacts": total_count,
+            "total_artifacts": sum(type_counts.values()),
             "by_type": type_counts
-        }
\ No newline at end of file
+        }
+
+    # ------------------------------------------------------
+    # Node result cache
+    # ------------------------------------------------------
+
+    def cache_put(self, cache_key, node, artifact_id):
+        """Point a node cache key at the artifact holding that node's output."""
+        # The mapping is visible to other registries and processes as soon as it
+        # commits, so the artifact it points at must be committed first
+        with self._pending_cond:
+            pending = artifact_id in self._pending
+        if pending:
+            self.flush()
+        with self._cursor(write=True) as c:
+            c.execute("INSERT OR REPLACE INTO node_cache (cache_key, node, artifact_id, created) VALUES (?, ?, ?, ?)",
+                      (cache_key, node, artifact_id, time.time()))
+
+    def cache_get(self, cache_key, max_age_s=None):
+        """
+        Look up a cached node output.
+
+        Returns:
+            (artifact_id, content) or None when missing, older than max_age_s,
+            or when the artifact is not readable (gc() removes mappings to
+            deleted artifacts)
+        """
+        with self._cursor() as c:
+            c.execute("SELECT artifact_id, created FROM node_cache WHERE cache_key=?", (cache_key,))
+            row = c.fetchone()
+        if not row:
+            return None
+        artifact_id, created = row
+        if max_age_s is not None and time.time() - created > max_age_s:
+            return None
+        content = self.get_content(artifact_id)
+        if content is None:
+            return None
+        return artifact_id, content
+
+    def total_bytes(self):
+        """Stored content size in bytes (uncompressed), from the counter table."""
+        self.flush()
+        with self._cursor() as c:
+            c.execute("SELECT IFNULL(SUM(bytes), 0) FROM artifact_counts")
+            return c.fetchone()[0]
+
+    # ------------------------------------------------------
+    # Retention and compaction
+    # ------------------------------------------------------
+
+    def gc(self, max_age_s=DEFAULT_MAX_AGE_S, retention_by_type=None, max_total_bytes=MAX_TOTAL_BYTES,
+           batch_size=GC_DELETE_BATCH, dry_run=False):
+        """
+        Delete expired artifacts without breaking the lineage of retained ones.
+
+        An artifact expires when it is older than its type's maximum age, or,
+        while the store is above max_total_bytes, when it is among the oldest.
+        Age limits apply only when given (by default only the size budget
+        does). Expired artifacts that are ancestors of a retained artifact are
+        kept; this is re-checked in every delete transaction, so artifacts
+        registered during gc keep their lineage. Deletion runs in small
+        transactions followed by an incremental vacuum, so concurrent readers
+        and writers are only blocked briefly.
+
+        Args:
+            max_age_s: Default maximum age in seconds (None = no age limit)
+            retention_by_type: {type: max_age_s or None}, e.g. RETENTION_BY_TYPE; none by default
+            max_total_bytes: Size budget for stored content (None = no limit)
+            batch_size: Artifacts deleted per transaction
+            dry_run: Only report what would be deleted
+
+        Returns:
+            Dictionary with expired / protected / deleted counts, freed bytes and deleted blobs
+        """
+        retention = dict(retention_by_type or {})
+        now = time.time()
+        self.flush()
+
+        with self._cursor() as c:
+            c.execute("DROP TABLE IF EXISTS temp.gc_expired")
+            c.execute("CREATE TEMP TABLE gc_expired (id TEXT PRIMARY KEY)")
+
+            # 1. Age limits, per type first, then the default for all other types
+            for artifact_type, max_age in retention.items():
+                if max_age is not None:
+                    c.execute("INSERT OR IGNORE INTO gc_expired SELECT id FROM artifacts WHERE type=? AND timestamp<?",
+                              (artifact_type, now - max_age))
+            if max_age_s is not None:
+                placeholders = ",".join("?" * len(retention))
+                type_clause = f"AND IFNULL(type, '') NOT IN ({placeholders})" if retention else ""
+                c.execute(f"INSERT OR IGNORE INTO gc_expired SELECT id FROM artifacts WHERE timestamp<? {type_clause}",
+                          (now - max_age_s, *retention.keys()))
+
+            # 2. Size budget: oldest surviving artifacts until under budget
+            if max_total_bytes is not None:
+                c.execute("SELECT IFNULL(SUM(bytes), 0) FROM artifact_counts")
+                excess = c.fetchone()[0] - max_total_bytes
+                if excess > 0:
+                    c.execute("""
+                    SELECT IFNULL(SUM(COALESCE(content_size, length(content), 0)), 0) FROM artifacts
+                    WHERE id IN (SELECT id FROM gc_expired)
+                    """)
+                    excess -= c.fetchone()[0]
+                if excess > 0:
+                    c.execute("""
+                    SELECT id, COALESCE(content_size, length(content), 0) FROM artifacts
+                    WHERE id NOT IN (SELECT id FROM gc_expired) ORDER BY timestamp
+                    """)
+                    extra = []
+                    for artifact_id, size in c.fetchall():
+                        if excess <= 0:
+                            break
+                        extra.append((artifact_id,))
+                        excess -= size
+                    c.executemany("INSERT OR IGNORE INTO gc_expired VALUES (?)", extra)
+
+            c.execute("SELECT COUNT(*) FROM gc_expired")
+            expired = c.fetchone()[0]
+
+            # 3. Lineage protection: keep every expired ancestor of a retained artifact
+            protected = self._protect_ancestors(c)
+            self.conn.commit()
+
+        stats = {"expired": expired, "protected": protected, "deleted": 0, "freed_bytes": 0, "deleted_blobs": 0}
+        if dry_run:
+            with self._cursor() as c:
+                c.execute("""
+                SELECT COUNT(*), IFNULL(SUM(COALESCE(content_size, length(content), 0)), 0) FROM artifacts
+                WHERE id IN (SELECT id FROM gc_expired)
+                """)
+                stats["deleted"], stats["freed_bytes"] = c.fetchone()
+                c.execute("DROP TABLE IF EXISTS temp.gc_expired")
+            return stats
+
+        # 4. Delete in small transactions, reclaiming pages as we go. Each
+        # re-checks lineage and drops the deleted artifacts' cache entries
+        # under the same write lock, so concurrent registrations are safe
+        while True:
+            with self._cursor(write=True) as c:
+                stats["protected"] += self._protect_ancestors(c)
+                c.execute("SELECT id FROM gc_expired LIMIT ?", (batch_size,))
+                ids = [row[0] for row in c.fetchall()]
+                if not ids:
+                    c.execute("DROP TABLE IF EXISTS temp.gc_expired")
+                    break
+                placeholders = ",".join("?" * len(ids))
+                c.execute(f"""
+                SELECT blob_ref, COALESCE(content_size, length(content), 0) FROM artifacts
+                WHERE id IN ({placeholders})
+                """, ids)
+                rows = c.fetchall()
+                c.execute(f"DELETE FROM node_cache WHERE artifact_id IN ({placeholders})", ids)
+                c.execute(f"DELETE FROM artifacts WHERE id IN ({placeholders})", ids)
+                c.execute(f"DELETE FROM gc_expired WHERE id IN ({placeholders})", ids)
+                self.conn.commit()
+                self.backend.reclaim_pages(c, VACUUM_PAGES_PER_BATCH)
+
+            stats["deleted"] += len(rows)
+            stats["freed_bytes"] += sum(size for _, size in rows)
+            for blob_ref, _ in rows:
+                if blob_ref is not None and not self._blob_referenced(blob_ref):
+                    stats["deleted_blobs"] += int(self.blob_store.delete(blob_ref))
+
+        return stats
+
+    @staticmethod
+    def _protect_ancestors(c):
+        """Remove expired ancestors of retained artifacts from gc_expired; returns how many."""
+        c.execute("SELECT COUNT(*) FROM gc_expired")
+        before = c.fetchone()[0]
+        c.execute("""
+        WITH RECURSIVE protected(id) AS (
+            SELECT a.parent_id FROM artifacts a
+            WHERE a.parent_id IN (SELECT id FROM gc_expired)
+              AND a.id NOT IN (SELECT id FROM gc_expired)
+            UNION
+            SELECT a.parent_id FROM artifacts a JOIN protected p ON a.id = p.id
+            WHERE a.parent_id IS NOT NULL
+        )
+        DELETE FROM gc_expired WHERE id IN (SELECT id FROM protected)
+        """)
+        c.execute("SELECT COUNT(*) FROM gc_expired")
+        return before - c.fetchone()[0]
+
+    def _blob_referenced(self, blob_ref):
+        with self._cursor() as c:
+            c.execute("SELECT 1 FROM artifacts WHERE blob_ref=? LIMIT 1", (blob_ref,))
+            return c.fetchone() is not None
+
+    def gc_blobs(self, min_age_s=3600):
+        """
+        Delete blob files no artifact references (e.g. left by a crash between
+        writing a blob and committing its row). Files younger than min_age_s
+        are skipped, as their rows may still be in flight in another process.
+        """
+        self.flush()
+        deleted = 0
+        now = time.time()
+        for digest in list(self.blob_store.iter_digests()):
+            if self._blob_referenced(digest):
+                continue
+            path = self.blob_store._find(digest)
+            if path and now - os.path.getmtime(path) >= min_age_s:
+                deleted += int(self.blob_store.delete(digest))
+        return deleted
+
+    def compact(self, pages=None):
+        """
+        Return free pages to the filesystem.
+
+        Databases created before incremental auto-vacuum was enabled get a
+        one-time full VACUUM to switch modes; after that only an incremental
+        vacuum of `pages` pages (all free pages if None) is run.
+        """
+        self.flush()
+        with self._cursor() as c:
+            return self.backend.compact(c, pages)
+
+
+# ======================================================
+# NO-OP BACKEND + LAZY PROCESS-WIDE REGISTRIES
+# ======================================================
+
+class NullArtifactRegistry:
+    """
+    Registry backend that records nothing.
+
+    Implements the interface of both ArtifactRegistry and
+    GeospatialArtifactRegistry, so callers never need to branch on whether
+    tracking is enabled. No database is opened.
+    """
+
+    NULL_ID = "null_artifact"
+
+    def register(self, artifact_type, content, parent_id=None):
+        return self.NULL_ID
+
+    def register_geospatial_artifact(self, *args, **kwargs):
+        return self.NULL_ID
+
+    def get(self, artifact_id):
+        return None
+
+    def find_by_type(self, artifact_type):
+        return []
+
+    def get_content(self, artifact_id):
+        return None
+
+    def open_content(self, artifact_id):
+        return None
+
+    def get_lineage(self, artifact_id, max_depth=256):
+        return []
+
+    def get_processing_lineage(self, artifact_id):
+        return []
+
+    def cache_put(self, cache_key, node, artifact_id):
+        pass
+
+    def cache_get(self, cache_key, max_age_s=None):
+        return None
+
+    def total_bytes(self):
+        return 0
+
+    def gc(self, *args, **kwargs):
+        return {"expired": 0, "protected": 0, "deleted": 0, "freed_bytes": 0, "deleted_blobs": 0}
+
+    def gc_blobs(self, *args, **kwargs):
+        return 0
+
+    def compact(self, *args, **kwargs):
+        return {"mode": "none"}
+
+    def flush(self):
+        return 0
+
+    def close(self):
+        pass
+
+    def get_stats(self):
+        return {
+            "total_artifacts": 0,
+            "by_type": {},
+            "by_processing_type": {},
+            "by_data_type": {},
+            "spatial_statistics": {}
+        }
+
+
+NULL_REGISTRY = NullArtifactRegistry()
+
+_registry_enabled = os.getenv("DISABLE_ARTIFACT_REGISTRY") != "1"
+
+
+def set_registry_enabled(enabled: bool):
+    """
+    Turn artifact tracking on or off for this process.
+
+    Takes effect for every LazyRegistry; a registry that has not been used
+    yet is then never constructed, so disabling costs nothing.
+    """
+    global _registry_enabled
+    _registry_enabled = bool(enabled)
+
+
+def registry_enabled() -> bool:
+    return _registry_enabled
+
+
+class LazyRegistry:
+    """
+    Process-wide registry built by `factory` on first use.
+
+    Attribute access is forwarded to the real registry, or to NULL_REGISTRY
+    while tracking is disabled.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if not _registry_enabled:
+            return NULL_REGISTRY
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        state = "built" if self._instance is not None else "not built"
+        return f"<LazyRegistry {getattr(self._factory, '__name__', self._factory)} ({state})>"
+
+
+# ======================================================
+# MAINTENANCE CLI
+# ======================================================
+
+def _parse_type_ages(values):
+    """['fetch_mws_data=3', 'format_response=none'] -> {type: seconds or None} (days on the CLI)."""
+    ages = {}
+    for item in values or []:
+        artifact_type, _, days = item.partition("=")
+        ages[artifact_type] = None if days.lower() in ("none", "") else float(days) * DAY_S
+    return ages
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="artifacts.db maintenance")
+    parser.add_argument("--db", default="artifacts.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("stats", help="Artifact counts and stored size")
+
+    gc_parser = sub.add_parser("gc", help="Apply retention policies (lineage-aware)")
+    gc_parser.add_argument("--max-age-days", type=float, default=(DEFAULT_MAX_AGE_S or 0) / DAY_S,
+                           help="Default maximum age (default: ARTIFACT_MAX_AGE_DAYS); 0 disables the age limit")
+    gc_parser.add_argument("--type-retention", action="store_true",
+                           help="Apply the built-in per-type maximum ages (RETENTION_BY_TYPE)")
+    gc_parser.add_argument("--type-max-age", nargs="*", metavar="TYPE=DAYS",
+                           help="Per-type maximum age in days ('none' keeps forever); overrides the built-in table")
+    gc_parser.add_argument("--max-size-mb", type=float, default=MAX_TOTAL_BYTES / (1024 * 1024),
+                           help="Size budget for stored content; 0 disables it")
+    gc_parser.add_argument("--dry-run", action="store_true")
+    gc_parser.add_argument("--blobs", action="store_true", help="Also delete unreferenced blob files")
+
+    vacuum_parser = sub.add_parser("vacuum", help="Incremental vacuum (full VACUUM once on older databases)")
+    vacuum_parser.add_argument("--pages", type=int, default=None)
+
+    args = parser.parse_args(argv)
+    registry = ArtifactRegistry(args.db)
+
+    if args.command == "stats":
+        stats = registry.get_stats()
+        print(f"📊 {stats['total_artifacts']} artifacts, {registry.total_bytes() / 1e6:.1f} MB of content")
+        for artifact_type, count in sorted(stats["by_type"].items(), key=lambda kv: -kv[1]):
+            print(f"   {count:8d}  {artifact_type}")
+
+    elif args.command == "gc":
+        result = registry.gc(
+            max_age_s=args.max_age_days * DAY_S if args.max_age_days > 0 else None,
+            retention_by_type={**(RETENTION_BY_TYPE if args.type_retention else {}),
+                               **_parse_type_ages(args.type_max_age)},
+            max_total_bytes=int(args.max_size_mb * 1024 * 1024) if args.max_size_mb > 0 else None,
+            dry_run=args.dry_run
+        )
+        label = "Would delete" if args.dry_run else "Deleted"
+        print(f"🧹 {label} {result['deleted']} artifacts ({result['freed_bytes'] / 1e6:.1f} MB); "
+              f"{result['protected']} kept as ancestors of retained artifacts")
+        if args.blobs and not args.dry_run:
+            result["deleted_blobs"] += registry.gc_blobs()
+        if result["deleted_blobs"]:
+            print(f"🗑️  Deleted {result['deleted_blobs']} blob files")
+
+    elif args.command == "vacuum":
+        print(f"✅ Compaction: {registry.compact(pages=args.pages)}")
+
+    registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,544 @@
+"""
+Batch Query Runner for CoreStack Agent System
+- Answers one timeseries question (e.g. cropping intensity trend 2017-2023)
+  for every location in a CSV/Parquet file of coordinates and/or MWS UIDs
+- The intent is parsed once (or given with --metric/--start-year/--end-year);
+  each distinct point is resolved to its watershed once, each watershed is
+  fetched once (groups ordered by state/district/tehsil), and the LLM
+  metric → field mapping is made once for the whole batch
+- Locations are processed in chunks of --chunk-rows (resolve → fetch →
+  write), so a crash loses at most the chunk in flight; watersheds run
+  concurrently (--workers) and results stream to a Parquet dataset directory
+  (one part file per flush) or a CSV
+- Re-running with the same output resumes: rows already written are skipped
+  (--retry-errors also re-runs rows that failed) and the intent saved next to
+  the output (<output>.intent.json) is reused instead of re-parsing --query
+- Parquet output needs pyarrow; without it, write to a .csv path
+
+Usage:
+    python batch_runner.py locations.csv --output results.parquet \\
+        --query "How did cropping intensity change from 2017 to 2023?"
+    python batch_runner.py locations.parquet --output results.csv \\
+        --metric "cropping intensity" --start-year 2017 --end-year 2023 --workers 16
+
+Input columns: latitude/longitude (or lat/lon/lng) and/or uid; UID-only rows
+also need state/district/tehsil. Row ids come from --id-column (default "id"),
+else the row number.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, Tuple
+
+from lazy_imports import lazy_module
+from tracing import span, record
+
+pd = lazy_module("pandas")
+# The LangGraph pipeline module (LLM client, geospatial stack) loads on first use
+langgraph_agent = lazy_module("langgraph_agent")
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 8))
+BATCH_FLUSH_ROWS = int(os.getenv("BATCH_FLUSH_ROWS", 500))
+# Rows resolved and written per chunk; bounds the work lost (and re-requested) on a crash
+BATCH_CHUNK_ROWS = int(os.getenv("BATCH_CHUNK_ROWS", 2000))
+# Watersheds tried for the LLM metric → field mapping before giving up
+MAPPING_ATTEMPTS = 3
+
+COLUMN_ALIASES = {
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lon", "lng", "long"),
+    "uid": ("uid", "mws_id", "mws_uid"),
+    "state": ("state",),
+    "district": ("district",),
+    "tehsil": ("tehsil", "block"),
+}
+
+RESULT_COLUMNS = [
+    "row_id", "latitude", "longitude", "uid", "state", "district", "tehsil",
+    "metric", "requested_start_year", "requested_end_year", "actual_start_year", "actual_end_year",
+    "start_val", "end_val", "percent_change", "peak_year", "peak_value", "slope", "n_years",
+    "timeseries", "status", "error"
+]
+
+
+# ======================================================
+# INPUT
+# ======================================================
+
+def read_table(path: str):
+    if path.endswith(".parquet") or os.path.isdir(path):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def load_locations(path: str, id_column: str = "id"):
+    """
+    Read the locations file into normalized columns.
+
+    Returns:
+        DataFrame with row_id (str), latitude, longitude, uid, state, district, tehsil
+    """
+    raw = read_table(path)
+    lower = {c.lower(): c for c in raw.columns}
+    locations = pd.DataFrame(index=raw.index)
+    for name, aliases in COLUMN_ALIASES.items():
+        source = next((lower[a] for a in aliases if a in lower), None)
+        locations[name] = raw[source] if source else None
+    locations = locations.astype(object).where(locations.notna(), None)
+
+    if id_column in raw.columns:
+        locations.insert(0, "row_id", raw[id_column].astype(str))
+    else:
+        locations.insert(0, "row_id", [str(i) for i in range(len(raw))])
+
+    missing = locations[locations["uid"].isna() & (locations["latitude"].isna() | locations["longitude"].isna())]
+    if len(missing):
+        print(f"⚠️  {len(missing)} rows have neither coordinates nor a UID")
+    return locations
+
+
+# ======================================================
+# INTENT (parsed once per batch)
+# ======================================================
+
+def parse_batch_intent(query: Optional[str], metric: Optional[str], start_year: Optional[int],
+                       end_year: Optional[int], sample: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parse the batch question once and validate it.
+
+    Args:
+        query: Natural-language question without a location (optional)
+        metric, start_year, end_year: Explicit values; override the parsed ones
+        sample: One input location, only used to pass validation
+
+    Returns:
+        Parsed intent with canonical years and no location fields
+    """
+    parsed = {}
+    if query:
+        state = langgraph_agent.llm_intent_parser({"user_query": query})
+        if "error" in state:
+            raise ValueError(state["error"])
+        parsed = dict(state["parsed"])
+    if metric:
+        parsed["metric_text"] = metric
+    if start_year:
+        parsed["start_year"] = start_year
+    if end_year:
+        parsed["end_year"] = end_year
+    # The batch path is the timeseries pipeline: fetch → normalize → compute
+    parsed["data_type_needed"] = "timeseries"
+    parsed["clarification_needed"] = False
+
+    location = {k: sample.get(k) for k in ("uid", "latitude", "longitude")}
+    state = langgraph_agent.validate({"parsed": dict(parsed, **location)})
+    if "error" in state:
+        raise ValueError(state["error"])
+    parsed = {k: v for k, v in state["parsed"].items() if k not in location}
+    print(f"🧠 Batch intent: {parsed['metric_text']} {parsed['start_year']} → {parsed['end_year']}")
+    return parsed
+
+
+# ======================================================
+# OUTPUT (streamed, resumable)
+# ======================================================
+
+class ResultWriter:
+    """
+    Buffers result rows and writes them in chunks.
+
+    A path ending in .csv is appended to; any other path is a Parquet dataset
+    directory with one part file per chunk (written to a temp name, then
+    renamed, so an interrupted run never leaves a partial part).
+    """
+
+    def __init__(self, path: str, flush_rows: int = BATCH_FLUSH_ROWS):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.csv = path.endswith(".csv")
+        # Fail before any work is done, not in the first flush
+        if not self.csv and importlib.util.find_spec("pyarrow") is None:
+            raise ImportError(f"Parquet output needs pyarrow (pip install pyarrow); "
+                              f"or write CSV with --output {os.path.splitext(path.rstrip('/'))[0]}.csv")
+        self.intent_path = f"{path.rstrip('/')}.intent.json"
+        self._buffer: List[Dict[str, Any]] = []
+        self.written = 0
+        self.errors = 0
+
+    def load_intent(self) -> Optional[Dict[str, Any]]:
+        """Intent a previous run wrote this output with, if any."""
+        if not os.path.exists(self.intent_path):
+            return None
+        with open(self.intent_path) as f:
+            return json.load(f)
+
+    def save_intent(self, parsed: Dict[str, Any]):
+        tmp = f"{self.intent_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(parsed, f, indent=2, default=str)
+        os.replace(tmp, self.intent_path)
+
+    def completed(self, retry_errors: bool = False) -> set:
+        """Row ids already in the output (only successful ones when retry_errors)."""
+        if not os.path.exists(self.path):
+            return set()
+        if self.csv:
+            done = pd.read_csv(self.path, usecols=["row_id", "status"], dtype=str)
+        else:
+            if not any(f.endswith(".parquet") for f in os.listdir(self.path)):
+                return set()
+            done = pd.read_parquet(self.path, columns=["row_id", "status"])
+        if retry_errors:
+            # Later parts supersede earlier ones for re-run rows
+            done = done.drop_duplicates("row_id", keep="last")
+            done = done[done["status"] == "ok"]
+        return set(done["row_id"].astype(str))
+
+    def add(self, rows: List[Dict[str, Any]]):
+        self._buffer.extend(rows)
+        self.errors += sum(1 for r in rows if r["status"] != "ok")
+        if len(self._buffer) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        frame = pd.DataFrame(self._buffer, columns=RESULT_COLUMNS)
+        # Fixed dtypes so every chunk has the same schema
+        for col in ("row_id", "uid", "state", "district", "tehsil", "metric", "requested_start_year",
+                    "requested_end_year", "actual_start_year", "actual_end_year", "peak_year",
+                    "timeseries", "status", "error"):
+            frame[col] = frame[col].astype("string")
+        for col in ("latitude", "longitude", "start_val", "end_val", "percent_change", "peak_value", "slope"):
+            frame[col] = pd.to_numeric(frame[col], errors="coerce").astype("float64")
+        frame["n_years"] = frame["n_years"].fillna(0).astype("int64")
+
+        if self.csv:
+            header = not os.path.exists(self.path)
+            with open(self.path, "a", newline="") as f:
+                frame.to_csv(f, header=header, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            name = f"part-{time.time_ns()}.parquet"
+            tmp = os.path.join(self.path, f".{name}.tmp")
+            frame.to_parquet(tmp, index=False)
+            os.replace(tmp, os.path.join(self.path, name))
+
+        self.written += len(self._buffer)
+        self._buffer = []
+        print(f"💾 {self.written} rows written ({self.errors} errors) → {self.path}")
+
+    def close(self):
+        self.flush()
+
+
+# ======================================================
+# BATCH PIPELINE
+# ======================================================
+
+def _resolve_point(latitude: float, longitude: float) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Watershed info (uid, State, District, Tehsil) of a point, or an error."""
+    try:
+        response = langgraph_agent.request_mws_info(latitude, longitude)
+    except Exception as e:
+        return None, f"Could not get UID from coordinates: {type(e).__name__}: {e}"
+    if response.status_code != 200:
+        return None, f"Could not get UID from coordinates: {response.text}"
+    info = response.json()
+    if not info.get("uid"):
+        return None, f"No watershed found at ({latitude}, {longitude})"
+    return info, None
+
+
+def _fetch_mws_json(mws_info: Dict[str, Any]) -> Dict[str, Any]:
+    response = langgraph_agent.request_mws_data(mws_info)
+    if response.status_code != 200:
+        raise RuntimeError(f"get_mws_data failed with status {response.status_code}: {response.text}")
+    return response.json()
+
+
+def _result_row(location: Dict[str, Any], parsed: Dict[str, Any], mws_info: Optional[Dict[str, Any]],
+                status: str = "ok", error: Optional[str] = None) -> Dict[str, Any]:
+    mws_info = mws_info or {}
+    return {
+        "row_id": location["row_id"],
+        "latitude": location.get("latitude"),
+        "longitude": location.get("longitude"),
+        "uid": mws_info.get("uid") or location.get("uid"),
+        "state": mws_info.get("State") or location.get("state"),
+        "district": mws_info.get("District") or location.get("district"),
+        "tehsil": mws_info.get("Tehsil") or location.get("tehsil"),
+        "metric": parsed.get("metric_text"),
+        "requested_start_year": parsed.get("start_year"),
+        "requested_end_year": parsed.get("end_year"),
+        "status": status,
+        "error": error,
+    }
+
+
+class BatchRunner:
+    """
+    Runs one parsed timeseries intent over many locations.
+
+    Args:
+        parsed: Intent from parse_batch_intent
+        workers: Concurrent watershed fetches
+        chunk_rows: Locations resolved and written per chunk
+    """
+
+    def __init__(self, parsed: Dict[str, Any], workers: int = BATCH_WORKERS, chunk_rows: int = BATCH_CHUNK_ROWS):
+        self.parsed = parsed
+        self.workers = max(1, workers)
+        self.chunk_rows = max(1, chunk_rows)
+        self.mapping: Optional[Tuple[str, str]] = None  # (metric_block, key_prefix)
+        self._mws_json: Dict[str, Dict[str, Any]] = {}  # uid → response, only for mapping candidates
+        # Kept across chunks, so a point or watershed is requested once per run
+        self._points: Dict[Tuple[float, float], Tuple[Optional[Dict[str, Any]], Optional[str]]] = {}
+        self._infos: Dict[str, Dict[str, Any]] = {}
+        self._values: Dict[str, Dict[str, Any]] = {}  # uid → computed stats columns
+
+    def resolve(self, locations) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """
+        Map every location to its watershed. Points resolved by an earlier
+        call (chunk) are not requested again.
+
+        Returns:
+            (uid → mws_info, uid → locations, error rows)
+        """
+        rows = locations.to_dict("records")
+        points = self._points
+        new_points = set()
+        for row in rows:
+            if row["latitude"] is not None and row["longitude"] is not None:
+                point = (round(float(row["latitude"]), 6), round(float(row["longitude"]), 6))
+                if point not in points:
+                    new_points.add(point)
+        print(f"📍 Resolving {len(new_points)} new distinct points ({len(rows)} rows)")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="resolve") as pool:
+            futures = {pool.submit(_resolve_point, lat, lon): (lat, lon) for lat, lon in new_points}
+            for future in as_completed(futures):
+                info, _ = points[futures[future]] = future.result()
+                if info:
+                    self._infos.setdefault(info["uid"], info)
+        infos = self._infos
+
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        errors = []
+        pending_uid_rows = []
+        for row in rows:
+            if row["latitude"] is not None and row["longitude"] is not None:
+                info, error = points[(round(float(row["latitude"]), 6), round(float(row["longitude"]), 6))]
+                if error:
+                    errors.append(_result_row(row, self.parsed, None, "error", error))
+                    continue
+                groups.setdefault(info["uid"], []).append(row)
+            elif row["uid"] is not None:
+                pending_uid_rows.append(row)
+            else:
+                errors.append(_result_row(row, self.parsed, None, "error",
+                                          "Either UID or latitude/longitude coordinates must be provided"))
+
+        # UID-only rows: admin names from the row, else from a point that resolved to the same UID
+        for row in pending_uid_rows:
+            uid = str(row["uid"])
+            if uid not in infos and row["tehsil"] and row["district"] and row["state"]:
+                infos[uid] = {"uid": uid, "State": row["state"], "District": row["district"], "Tehsil": row["tehsil"]}
+            if uid in infos:
+                groups.setdefault(uid, []).append(row)
+            else:
+                errors.append(_result_row(row, self.parsed, None, "error",
+                                          f"UID '{uid}' needs state/district/tehsil columns or coordinates"))
+        return infos, groups, errors
+
+    def resolve_mapping(self, infos: Dict[str, Dict[str, Any]], uids: List[str]) -> Dict[str, str]:
+        """
+        Ask the LLM once which block/field holds the metric (normalize_data on a
+        sample watershed). Watersheds that cannot be fetched are skipped; only
+        MAPPING_ATTEMPTS failed mappings abort the batch.
+
+        Returns:
+            uid → fetch error for the watersheds skipped on the way
+        """
+        fetch_errors = {}
+        mapping_error = None
+        attempts = 0
+        for uid in uids:
+            try:
+                mws_json = _fetch_mws_json(infos[uid])
+            except Exception as e:
+                fetch_errors[uid] = f"{type(e).__name__}: {e}"
+                continue
+            self._mws_json[uid] = mws_json
+            state = langgraph_agent.normalize_data({"mws_json": mws_json, "parsed": dict(self.parsed)})
+            if "error" not in state:
+                self.mapping = (state["metric_block"], state["metric_key_prefix"])
+                print(f"🗺️  Metric mapping: {self.mapping[0]}.{self.mapping[1]}*")
+                return fetch_errors
+            mapping_error = state["error"]
+            attempts += 1
+            if attempts >= MAPPING_ATTEMPTS:
+                break
+        if mapping_error:
+            raise RuntimeError(f"Could not map metric '{self.parsed.get('metric_text')}' to MWS data: {mapping_error}")
+        return fetch_errors
+
+    def run_group(self, uid: str, mws_info: Dict[str, Any], locations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fetch one watershed, compute its stats and fan the result out to its rows."""
+        if uid in self._values:
+            # Already computed for an earlier chunk
+            return [dict(_result_row(loc, self.parsed, mws_info), **self._values[uid]) for loc in locations]
+        try:
+            mws_json = self._mws_json.pop(uid, None) or _fetch_mws_json(mws_info)
+            rows, _ = langgraph_agent.extract_timeseries(mws_json, *self.mapping)
+            if not rows:
+                raise LookupError(f"Could not find time series data for metric: {self.parsed.get('metric_text')}")
+            state = langgraph_agent.compute_timeseries_stats({"timeseries": rows, "parsed": dict(self.parsed)})
+            stats = state["stats"]
+            if "error" in stats:
+                raise LookupError(stats["error"])
+        except Exception as e:
+            record("batch.group_errors")
+            return [_result_row(loc, self.parsed, mws_info, "error", f"{type(e).__name__}: {e}") for loc in locations]
+
+        values = {
+            "actual_start_year": stats["actual_start_year"],
+            "actual_end_year": stats["actual_end_year"],
+            "start_val": stats["start_val"],
+            "end_val": stats["end_val"],
+            "percent_change": stats["percent_change"],
+            "peak_year": stats["peak_year"],
+            "peak_value": stats["peak_value"],
+            "slope": stats["slope"],
+            "n_years": len(rows),
+            "timeseries": json.dumps({r["year"]: r["value"] for r in rows}, sort_keys=True),
+        }
+        self._values[uid] = values
+        return [dict(_result_row(loc, self.parsed, mws_info), **values) for loc in locations]
+
+    def run(self, locations, writer: ResultWriter):
+        """
+        Process the locations chunk by chunk; each chunk's rows are written
+        before the next chunk is resolved, so a re-run resumes after it.
+        """
+        # Coordinate rows first, so UID-only rows can take admin names from any resolved point
+        has_point = locations["latitude"].notna() & locations["longitude"].notna()
+        ordered = pd.concat([locations[has_point], locations[~has_point]])
+        chunks = range(0, len(ordered), self.chunk_rows)
+        for n, start in enumerate(chunks, 1):
+            if len(chunks) > 1:
+                print(f"📦 Chunk {n}/{len(chunks)}")
+            self.run_chunk(ordered.iloc[start:start + self.chunk_rows], writer)
+            writer.flush()
+
+    def run_chunk(self, locations, writer: ResultWriter):
+        infos, groups, errors = self.resolve(locations)
+        writer.add(errors)
+        if not groups:
+            return
+
+        # Same-tehsil watersheds next to each other: the API serves them from the same tehsil data
+        order = sorted(groups, key=lambda uid: (str(infos[uid].get("State")), str(infos[uid].get("District")),
+                                                str(infos[uid].get("Tehsil")), uid))
+        tehsils = {(infos[uid].get("State"), infos[uid].get("District"), infos[uid].get("Tehsil")) for uid in order}
+        print(f"🗂️  {len(order)} watersheds in {len(tehsils)} tehsils")
+
+        if self.mapping is None:
+            fetch_errors = self.resolve_mapping(infos, order)
+            for uid, error in fetch_errors.items():
+                writer.add([_result_row(loc, self.parsed, infos[uid], "error", error) for loc in groups[uid]])
+            order = [uid for uid in order if uid not in fetch_errors]
+            if self.mapping is None:
+                return
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as pool:
+            futures = [pool.submit(self.run_group, uid, infos[uid], groups[uid]) for uid in order]
+            for future in as_completed(futures):
+                writer.add(future.result())
+
+
+def run_batch(input_path: str, output_path: str, query: Optional[str] = None, metric: Optional[str] = None,
+              start_year: Optional[int] = None, end_year: Optional[int] = None, workers: int = BATCH_WORKERS,
+              id_column: str = "id", retry_errors: bool = False, flush_rows: int = BATCH_FLUSH_ROWS,
+              chunk_rows: int = BATCH_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Answer one timeseries question for every location in a file.
+
+    Returns:
+        {'rows': input rows, 'skipped': already in output, 'written': rows written, 'errors': error rows}
+    """
+    locations = load_locations(input_path, id_column)
+    writer = ResultWriter(output_path, flush_rows)
+    done = writer.completed(retry_errors)
+    todo = locations[~locations["row_id"].isin(done)]
+    print(f"📋 {len(locations)} locations, {len(locations) - len(todo)} already done, {len(todo)} to run")
+
+    # A resumed run reuses the saved intent: re-parsing --query could change the metric or years
+    parsed = writer.load_intent()
+    if parsed is not None:
+        explicit = {"metric_text": metric, "start_year": start_year, "end_year": end_year}
+        conflicts = [k for k, v in explicit.items() if v and str(v) != str(parsed.get(k))]
+        if conflicts:
+            raise ValueError(f"{output_path} was written for {parsed['metric_text']} "
+                             f"{parsed['start_year']} → {parsed['end_year']}; use a new --output")
+
+    summary = {"rows": len(locations), "skipped": len(locations) - len(todo), "written": 0, "errors": 0}
+    if todo.empty:
+        return summary
+
+    located = todo[todo["uid"].notna() | (todo["latitude"].notna() & todo["longitude"].notna())]
+    if located.empty:
+        raise ValueError("No location has coordinates or a UID")
+    if parsed is None:
+        parsed = parse_batch_intent(query, metric, start_year, end_year, located.iloc[0].to_dict())
+        writer.save_intent(parsed)
+    else:
+        print(f"🧠 Resuming batch intent: {parsed['metric_text']} {parsed['start_year']} → {parsed['end_year']}")
+    with span("batch_run", rows=len(todo), workers=workers):
+        try:
+            BatchRunner(parsed, workers, chunk_rows).run(todo, writer)
+        finally:
+            # Whatever finished is kept, so a re-run resumes after it
+            writer.close()
+
+    summary.update(written=writer.written, errors=writer.errors)
+    print(f"✅ Batch complete: {writer.written} rows written, {writer.errors} errors")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer one timeseries question for many locations")
+    parser.add_argument("input", help="CSV or Parquet file of locations (latitude/longitude and/or uid)")
+    parser.add_argument("--output", required=True, help="Parquet dataset directory (needs pyarrow), or a .csv file")
+    parser.add_argument("--query", help="Question without a location, parsed once by the LLM")
+    parser.add_argument("--metric", help="Metric, e.g. 'cropping intensity' (overrides the parsed one)")
+    parser.add_argument("--start-year", type=int)
+    parser.add_argument("--end-year", type=int)
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--flush-rows", type=int, default=BATCH_FLUSH_ROWS)
+    parser.add_argument("--chunk-rows", type=int, default=BATCH_CHUNK_ROWS,
+                        help="Locations resolved and written per chunk (bounds the work lost on a crash)")
+    parser.add_argument("--retry-errors", action="store_true", help="Also re-run rows that failed previously")
+    parser.add_argument("--track-artifacts", action="store_true",
+                        help="Register artifacts for every row (off by default: thousands of rows)")
+    args = parser.parse_args()
+
+    if not (args.query or args.metric):
+        parser.error("either --query or --metric is required")
+    if not args.track_artifacts:
+        from artifact import set_registry_enabled
+        set_registry_enabled(False)
+
+    summary = run_batch(args.input, args.output, query=args.query, metric=args.metric,
+                        start_year=args.start_year, end_year=args.end_year, workers=args.workers,
+                        id_column=args.id_column, retry_errors=args.retry_errors, flush_rows=args.flush_rows,
+                        chunk_rows=args.chunk_rows)
+    sys.exit(1 if summary["errors"] and summary["errors"] == summary["written"] else 0)
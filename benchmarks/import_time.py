@@ -0,0 +1,172 @@
+"""
+Import-time benchmark for CoreStack Agent System
+- Runs `python -X importtime -c "import <module>"` in a fresh interpreter per module
+- Reports total cumulative import time and the slowest imports
+- Compares against a stored baseline and exits non-zero on regression
+
+Usage:
+    python benchmarks/import_time.py                      # report + compare
+    python benchmarks/import_time.py --update-baseline    # record new baseline
+    python benchmarks/import_time.py --modules new_architecture --top 20
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, Any, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_baseline.json")
+
+DEFAULT_MODULES = ["new_architecture", "architecture4", "ee_features", "area_service", "gazetteer", "geocoding"]
+
+# Allowed slowdown over baseline before a module counts as regressed
+DEFAULT_TOLERANCE = 0.25
+# Absolute slack (ms) so tiny modules don't flap on noise
+MIN_REGRESSION_MS = 20.0
+
+# "import time:       self [us] |  cumulative | imported package"
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+# Heavy packages that must not be pulled in at import time
+HEAVY_PACKAGES = ("ee", "geemap", "rasterio", "geopandas", "pyproj", "smolagents", "langchain_google_genai")
+
+
+def run_importtime(module: str) -> Dict[str, Any]:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        {'module', 'total_ms', 'imports': [{'name', 'self_ms', 'cumulative_ms', 'depth'}], 'error'}
+    """
+    env = dict(os.environ)
+    # Modules read API keys at import time; dummy values keep them importable
+    env.setdefault("GEMINI_API_KEY", "benchmark")
+    env.setdefault("CORE_STACK_API_KEY", "benchmark")
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = m.groups()
+        imports.append({
+            'name': name.strip(),
+            'self_ms': int(self_us) / 1000.0,
+            'cumulative_ms': int(cum_us) / 1000.0,
+            'depth': len(indent) // 2
+        })
+
+    top_level = [i for i in imports if i['name'] == module]
+    total_ms = top_level[-1]['cumulative_ms'] if top_level else None
+
+    error = None
+    if proc.returncode != 0:
+        tail = [l for l in proc.stderr.splitlines() if not l.startswith("import time:")]
+        error = tail[-1] if tail else f"exit code {proc.returncode}"
+
+    return {'module': module, 'total_ms': total_ms, 'imports': imports, 'error': error}
+
+
+def measure(module: str, repeat: int) -> Dict[str, Any]:
+    """Median of several cold imports; the slowest-import list comes from the median run."""
+    runs = [run_importtime(module) for _ in range(repeat)]
+    ok = [r for r in runs if r['total_ms'] is not None and r['error'] is None]
+    if not ok:
+        return runs[-1]
+    median = statistics.median(r['total_ms'] for r in ok)
+    best = min(ok, key=lambda r: abs(r['total_ms'] - median))
+    return dict(best, total_ms=median)
+
+
+def heavy_imports(result: Dict[str, Any]) -> List[str]:
+    names = {i['name'] for i in result['imports']}
+    return [p for p in HEAVY_PACKAGES if p in names]
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get('modules', {})
+
+
+def save_baseline(results: List[Dict[str, Any]], path: str = BASELINE_PATH):
+    data = {
+        'python': sys.version.split()[0],
+        'modules': {r['module']: round(r['total_ms'], 2) for r in results if r['total_ms'] is not None}
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    print(f"💾 Baseline written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list per module")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    results = []
+    regressions = []
+
+    for module in args.modules:
+        result = measure(module, args.repeat)
+        results.append(result)
+
+        print("\n" + "=" * 70)
+        if result['error']:
+            print(f"❌ {module}: {result['error']}")
+            regressions.append(f"{module} failed to import: {result['error']}")
+            continue
+
+        print(f"📦 {module}: {result['total_ms']:.1f} ms")
+        for imp in sorted(result['imports'], key=lambda i: -i['self_ms'])[:args.top]:
+            print(f"   {imp['self_ms']:8.1f} ms self  {imp['cumulative_ms']:8.1f} ms cum  {imp['name']}")
+
+        heavy = heavy_imports(result)
+        if heavy:
+            print(f"⚠️  Heavy packages imported eagerly: {', '.join(heavy)}")
+            regressions.append(f"{module} imports {', '.join(heavy)} at import time")
+
+        previous = baseline.get(module)
+        if previous is None:
+            print(f"   no baseline for {module} (run with --update-baseline)")
+        else:
+            delta = result['total_ms'] - previous
+            print(f"   baseline {previous:.1f} ms ({delta:+.1f} ms)")
+            if delta > max(previous * args.tolerance, MIN_REGRESSION_MS):
+                regressions.append(f"{module}: {result['total_ms']:.1f} ms vs baseline {previous:.1f} ms")
+
+    print("\n" + "=" * 70)
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+        return 0
+
+    if regressions:
+        print("❌ Import-time regressions:")
+        for r in regressions:
+            print(f"   - {r}")
+        return 1
+
+    print("✅ No import-time regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
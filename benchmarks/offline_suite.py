@@ -0,0 +1,208 @@
+"""
+Offline end-to-end benchmark for both agent pipelines
+- Runs TEST_QUERIES from new_architecture and langgraph_agent against
+  recorded fixtures (see benchmarks/replay.py): no geoserver, Gemini or EE
+- Per-node latency comes from the tracing spans of each run
+- Reports throughput and p50/p95 per node, compares against a baseline and
+  exits non-zero on regressions, failed queries, unrecorded requests, or
+  when no fixtures / baseline exist yet
+
+Usage:
+    python benchmarks/offline_suite.py --record                # once, with network + keys
+    python benchmarks/offline_suite.py                         # offline replay + compare
+    python benchmarks/offline_suite.py --repeat 3 --update-baseline
+    python benchmarks/offline_suite.py --pipeline langgraph_agent --queries 0 2
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "offline_baseline.json")
+
+PIPELINES = ("new_architecture", "langgraph_agent")
+
+# Allowed slowdown over baseline p50 before a node or pipeline counts as regressed
+DEFAULT_TOLERANCE = 0.25
+# Absolute slack so sub-10ms nodes don't flap on noise
+MIN_REGRESSION_MS = 10.0
+
+
+class MemoryExporter:
+    """Collects finished spans in memory instead of writing TRACE_FILE."""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, record: Dict[str, Any]):
+        self.spans.append(record)
+
+
+def prepare_environment(args):
+    """Isolate the run: temp registry, no node cache or code templates (every run does the full work)."""
+    workdir = tempfile.mkdtemp(prefix="offline_suite_")
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("CORE_STACK_API_KEY", "offline-benchmark")
+    if not args.with_cache:
+        os.environ["DISABLE_NODE_CACHE"] = "1"
+    os.environ["GEOCODE_CACHE_DB"] = os.path.join(workdir, "geocode_cache.db")
+    os.environ["ARTIFACT_BLOB_DIR"] = os.path.join(workdir, "blobs")
+    os.environ["LAYER_CACHE_DIR"] = os.path.join(workdir, "layer_cache")
+    os.environ["DATA_HANDLE_DIR"] = os.path.join(workdir, "data_handles")
+    os.environ["CODE_TEMPLATE_DB"] = os.path.join(workdir, "code_templates.db")
+    if not args.with_cache:
+        os.environ["DISABLE_CODE_TEMPLATES"] = "1"
+    # Fixture patches live in this process, so generated code must run here too
+    os.environ["SANDBOX_MODE"] = "inline"
+    os.chdir(workdir)  # artifacts.db and other relative paths land here
+    return workdir
+
+
+def run_query(module, query: str, verbose: bool) -> Dict[str, Any]:
+    sink = io.StringIO()
+    redirect = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(sink)
+    start = time.perf_counter()
+    try:
+        with redirect:
+            result = module.run_agent(query)
+        # Nodes catch their own failures (FixtureMissing included) and set "error" on the state
+        error = result.get("error") if isinstance(result, dict) else "run_agent returned no final state"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {"query": query, "wall_ms": (time.perf_counter() - start) * 1000.0, "error": error}
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for pipeline, data in current.items():
+        base = baseline.get(pipeline)
+        if not base:
+            continue
+        checks = [("query p50", data["query_p50_ms"], base.get("query_p50_ms"))]
+        checks += [(f"node {n} p50", s["p50_ms"], base.get("nodes", {}).get(n, {}).get("p50_ms"))
+                   for n, s in data["nodes"].items()]
+        for label, now, before in checks:
+            if before is not None and now - before > max(before * tolerance, MIN_REGRESSION_MS):
+                regressions.append(f"{pipeline} {label}: {now:.1f} ms vs baseline {before:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark")
+    parser.add_argument("--record", action="store_true", help="Run live and (re)record fixtures")
+    parser.add_argument("--fixtures", default=None, help="Fixtures directory")
+    parser.add_argument("--pipeline", choices=PIPELINES, nargs="+", default=list(PIPELINES))
+    parser.add_argument("--queries", type=int, nargs="+", default=None, help="Indexes into TEST_QUERIES")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--with-cache", action="store_true", help="Keep the node result cache enabled")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="Show agent output")
+    args = parser.parse_args()
+
+    import replay
+    import tracing
+    from tracing import summarize, percentile
+
+    # Per-node latency is read from the spans, so tracing is always on here
+    tracing.TRACING_ENABLED = True
+
+    fixtures = os.path.abspath(args.fixtures or replay.DEFAULT_FIXTURES_DIR)
+    baseline_path = os.path.abspath(args.baseline)
+    mode = "record" if args.record else "replay"
+    if mode == "replay" and not (os.path.isdir(fixtures) and os.listdir(fixtures)):
+        print(f"❌ No fixtures in {fixtures}; record them first with --record (needs network and API keys)")
+        return 1
+    if mode == "replay" and not args.update_baseline and not os.path.exists(baseline_path):
+        print(f"❌ No baseline at {baseline_path}; create one with --update-baseline")
+        return 1
+    workdir = prepare_environment(args)
+    print(f"🧪 Offline suite ({mode}) — fixtures: {fixtures}, workdir: {workdir}")
+
+    report = {}
+    failures = []
+
+    for pipeline in args.pipeline:
+        module = __import__(pipeline)
+        queries = module.TEST_QUERIES
+        if args.queries is not None:
+            queries = [queries[i] for i in args.queries if 0 <= i < len(queries)]
+
+        exporter = MemoryExporter()
+        tracing.set_exporter(exporter)
+        runs = []
+
+        with replay.offline_mode(mode, fixtures) as session:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for query in queries:
+                    result = run_query(module, query, args.verbose)
+                    runs.append(result)
+                    status = "❌" if result["error"] else "✅"
+                    print(f"   {status} [{pipeline}] {result['wall_ms']:8.1f} ms  {query[:70]}")
+                    if result["error"]:
+                        failures.append(f"{pipeline}: {query[:60]} → {str(result['error'])[:120]}")
+            elapsed = time.perf_counter() - start
+        if session.stats.get("server_misses"):
+            failures.append(f"{pipeline}: {session.stats['server_misses']} requests had no recorded fixture")
+
+        node_spans = [s for s in exporter.spans if s["name"].startswith("node.")]
+        nodes = {name[len("node."):]: s for name, s in summarize(node_spans).items()}
+        walls = [r["wall_ms"] for r in runs]
+        report[pipeline] = {
+            "queries": len(runs),
+            "failed": sum(1 for r in runs if r["error"]),
+            "throughput_qps": len(runs) / elapsed if elapsed > 0 else 0.0,
+            "query_p50_ms": percentile(walls, 50),
+            "query_p95_ms": percentile(walls, 95),
+            "nodes": {n: {"count": s["count"], "p50_ms": s["p50_ms"], "p95_ms": s["p95_ms"],
+                          "p99_ms": s["p99_ms"]} for n, s in nodes.items()},
+            "session": dict(session.stats)
+        }
+
+    print("\n" + "=" * 70)
+    for pipeline, data in report.items():
+        print(f"📦 {pipeline}: {data['queries']} runs, {data['failed']} failed, "
+              f"{data['throughput_qps']:.2f} queries/s, p50 {data['query_p50_ms']:.0f} ms, "
+              f"p95 {data['query_p95_ms']:.0f} ms")
+        for node, s in sorted(data["nodes"].items(), key=lambda kv: -kv[1]["p50_ms"]):
+            print(f"   {node:<20} n={s['count']:<4} p50 {s['p50_ms']:9.1f} ms   p95 {s['p95_ms']:9.1f} ms")
+        print(f"   fixtures: {data['session']}")
+
+    if args.record:
+        print("💾 Fixtures recorded")
+        return 0 if not failures else 1
+
+    if args.update_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"💾 Baseline written to {baseline_path}")
+
+    regressions = compare(report, load_baseline(baseline_path), args.tolerance) if not args.update_baseline else []
+    if failures or regressions:
+        print("❌ Offline suite failed:")
+        for item in failures + regressions:
+            print(f"   - {item}")
+        return 1
+    print("✅ Offline suite passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
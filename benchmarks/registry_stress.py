@@ -0,0 +1,128 @@
+"""
+Concurrent-writer stress test for ArtifactRegistry
+- Several processes, each with several threads, register lineage chains
+  into one database at the same time
+- Every write is read back immediately (read-your-writes) and every chain's
+  lineage is checked after the run
+- Reports throughput and errors; exits non-zero on any failure
+
+Usage:
+    python benchmarks/registry_stress.py
+    python benchmarks/registry_stress.py --processes 8 --threads 8 --chains 50 --depth 6
+    python benchmarks/registry_stress.py --backend dbapi   # exercise the DBAPIBackend path
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+import multiprocessing as mp
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact import ArtifactRegistry, DBAPIBackend, BUSY_TIMEOUT_S  # noqa: E402
+
+
+def make_registry(db_path: str, backend: str, blob_dir: str) -> ArtifactRegistry:
+    from blob_store import BlobStore
+
+    if backend == "dbapi":
+        backend_impl = DBAPIBackend(
+            lambda: sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_S, check_same_thread=False),
+            name="dbapi-sqlite",
+            init_statements=("PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"),
+            busy_errors=(sqlite3.OperationalError,)
+        )
+        return ArtifactRegistry(db_path, backend=backend_impl, blob_store=BlobStore(blob_dir))
+    return ArtifactRegistry(db_path, blob_store=BlobStore(blob_dir))
+
+
+def worker_process(worker: int, args: Dict[str, Any], results):
+    registry = make_registry(args["db"], args["backend"], args["blob_dir"])
+    errors = []
+    leaves = []
+    lock = threading.Lock()
+
+    def run_thread(thread: int):
+        try:
+            for chain in range(args["chains"]):
+                parent = None
+                for step in range(args["depth"]):
+                    content = {"worker": worker, "thread": thread, "chain": chain, "step": step,
+                               "payload": "x" * args["payload"]}
+                    artifact_id = registry.register(f"stress_step_{step}", content, parent_id=parent)
+                    got = registry.get(artifact_id)
+                    if got is None or got["content"]["step"] != step:
+                        raise AssertionError(f"read-your-writes failed for {artifact_id}")
+                    parent = artifact_id
+                with lock:
+                    leaves.append(parent)
+        except Exception as e:
+            with lock:
+                errors.append(f"w{worker}/t{thread}: {type(e).__name__}: {e}")
+
+    threads = [threading.Thread(target=run_thread, args=(t,)) for t in range(args["threads"])]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    registry.close()
+    results.put({"worker": worker, "errors": errors, "leaves": leaves})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ArtifactRegistry concurrent-writer stress test")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--chains", type=int, default=25, help="Lineage chains per thread")
+    parser.add_argument("--depth", type=int, default=5, help="Artifacts per chain")
+    parser.add_argument("--payload", type=int, default=256, help="Payload bytes per artifact")
+    parser.add_argument("--backend", choices=["sqlite", "dbapi"], default="sqlite")
+    parser.add_argument("--db", default=None, help="Database path (default: temporary)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="registry_stress_")
+    db_path = args.db or os.path.join(workdir, "stress.db")
+    config = {
+        "db": db_path, "backend": args.backend, "blob_dir": os.path.join(workdir, "blobs"),
+        "threads": args.threads, "chains": args.chains, "depth": args.depth, "payload": args.payload
+    }
+    expected = args.processes * args.threads * args.chains * args.depth
+
+    print(f"🔥 {args.processes} processes × {args.threads} threads, {expected} artifacts → {db_path}")
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    start = time.perf_counter()
+    procs = [ctx.Process(target=worker_process, args=(w, config, results)) for w in range(args.processes)]
+    for p in procs:
+        p.start()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    errors = [e for r in collected for e in r["errors"]]
+    leaves = [leaf for r in collected for leaf in r["leaves"]]
+
+    registry = make_registry(db_path, args.backend, config["blob_dir"])
+    stats = registry.get_stats()
+    stored = sum(n for t, n in stats["by_type"].items() if t.startswith("stress_step_"))
+    broken = [leaf for leaf in leaves if len(registry.get_lineage(leaf)) != args.depth]
+    registry.close()
+
+    print(f"⏱️  {elapsed:.2f} s, {expected / elapsed:,.0f} registrations/s (incl. read-back)")
+    print(f"📊 stored {stored}/{expected}, {len(broken)} broken lineages, {len(errors)} errors")
+    for e in errors[:10]:
+        print(f"   ❌ {e}")
+
+    ok = not errors and not broken and stored == expected
+    print("✅ Stress test passed" if ok else "❌ Stress test failed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
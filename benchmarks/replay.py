@@ -0,0 +1,376 @@
+"""
+Record/replay harness for offline benchmarks
+- HTTP (CoreStack API, geoserver GeoJSON/WFS, Nominatim): captured at
+  requests.Session.send; on replay every request is redirected to a local
+  stand-in HTTP server that serves the recorded bytes (with Range support,
+  so GDAL /vsicurl/ raster reads work too)
+- Vector/raster URLs opened by geopandas/rasterio are rewritten to the
+  stand-in server as well
+- Gemini: BaseChatModel.invoke is keyed by model + prompt
+- Earth Engine: ee_features.fetch_features is keyed by its normalized
+  filter, so no EE session is needed on replay
+
+Usage:
+    with offline_mode("record", "benchmarks/fixtures"):   # live, saves fixtures
+        run_agent(query)
+    with offline_mode("replay", "benchmarks/fixtures") as session:
+        run_agent(query)
+    print(session.stats)
+"""
+
+import os
+import sys
+import json
+import base64
+import hashlib
+import threading
+import contextlib
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote, unquote
+from typing import Dict, Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Query parameters holding credentials; never part of a fixture key or file
+_SECRET_PARAMS = {"key", "api_key", "apikey", "token"}
+
+
+class FixtureMissing(KeyError):
+    """Replay found no recording for a request."""
+
+
+def normalize_url(url: str) -> str:
+    """Sort query parameters and drop credentials so equivalent URLs share a fixture."""
+    if url.startswith("/vsicurl/"):
+        url = url[len("/vsicurl/"):]
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in _SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def fixture_key(kind: str, *parts) -> str:
+    payload = json.dumps([kind, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class FixtureStore:
+    """One JSON file per recorded interaction under <root>/<kind>/<key>.json."""
+
+    def __init__(self, root: str = DEFAULT_FIXTURES_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, kind, f"{key}.json")
+
+    def load(self, kind: str, key: str) -> Dict[str, Any]:
+        path = self._path(kind, key)
+        if not os.path.exists(path):
+            raise FixtureMissing(f"{kind}/{key}")
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, kind: str, key: str, record: Dict[str, Any]):
+        path = self._path(kind, key)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp, path)
+
+    # HTTP bodies are stored base64-encoded alongside status and content type
+    def load_http(self, method: str, url: str) -> Dict[str, Any]:
+        record = self.load("http", fixture_key("http", method.upper(), normalize_url(url)))
+        record["body"] = base64.b64decode(record["body_b64"])
+        return record
+
+    def save_http(self, method: str, url: str, status: int, content_type: Optional[str], body: bytes):
+        self.save("http", fixture_key("http", method.upper(), normalize_url(url)), {
+            "method": method.upper(),
+            "url": normalize_url(url),
+            "status": status,
+            "content_type": content_type,
+            "body_b64": base64.b64encode(body).decode()
+        })
+
+
+# ======================================================
+# LOCAL STAND-IN SERVER
+# ======================================================
+
+def _standin_path(url: str) -> str:
+    """https://host/a/b?x=1 -> /https/host/a/b?x=1 (original URL recoverable from the path)."""
+    parts = urlsplit(url)
+    return f"/{parts.scheme}/{parts.netloc}{quote(parts.path)}" + (f"?{parts.query}" if parts.query else "")
+
+
+def _original_url(path: str) -> str:
+    scheme, _, rest = path.lstrip("/").partition("/")
+    netloc, _, remainder = rest.partition("/")
+    path_part, _, query = remainder.partition("?")
+    return urlunsplit((scheme, netloc, "/" + unquote(path_part), query, ""))
+
+
+class StandInServer:
+    """Serves recorded HTTP responses on 127.0.0.1, keyed by the original URL."""
+
+    def __init__(self, store: FixtureStore, host: str = "127.0.0.1", port: int = 0):
+        self.store = store
+        self.stats = Counter()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, send_body: bool):
+                method = "GET" if self.command == "HEAD" else self.command
+                try:
+                    record = server.store.load_http(method, _original_url(self.path))
+                except FixtureMissing:
+                    server.stats["misses"] += 1
+                    self.send_error(599, "No fixture recorded for this request")
+                    return
+                server.stats["hits"] += 1
+                body = record["body"]
+                status = record["status"]
+
+                byte_range = self.headers.get("Range")
+                if byte_range and byte_range.startswith("bytes=") and status == 200:
+                    start_s, _, end_s = byte_range[len("bytes="):].partition("-")
+                    start = int(start_s or 0)
+                    end = min(int(end_s) if end_s else len(body) - 1, len(body) - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+                    body = body[start:end + 1]
+                else:
+                    self.send_response(status)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Type", record.get("content_type") or "application/octet-stream")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve(True)
+
+            def do_HEAD(self):
+                self._serve(False)
+
+            def do_POST(self):
+                self._serve(True)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="standin-http", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def url_for(self, original_url: str) -> str:
+        return self.base_url + _standin_path(normalize_url(original_url))
+
+    def owns(self, url: str) -> bool:
+        return url.startswith(self.base_url)
+
+
+# ======================================================
+# PATCHES
+# ======================================================
+
+class OfflineSession:
+    """Installs record or replay patches; undone on exit."""
+
+    def __init__(self, mode: str, fixtures_dir: str = DEFAULT_FIXTURES_DIR):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"mode must be 'record' or 'replay', not {mode!r}")
+        self.mode = mode
+        self.store = FixtureStore(fixtures_dir)
+        self.server = StandInServer(self.store) if mode == "replay" else None
+        self.stats = Counter()
+        self._undo = []
+
+    def _patch(self, owner, attr, replacement):
+        original = getattr(owner, attr)
+        setattr(owner, attr, replacement)
+        self._undo.append((owner, attr, original))
+        return original
+
+    def __enter__(self):
+        if self.server:
+            self.server.start()
+        self._patch_http()
+        self._patch_spatial_readers()
+        self._patch_llm()
+        self._patch_ee()
+        return self
+
+    def __exit__(self, *exc):
+        for owner, attr, original in reversed(self._undo):
+            setattr(owner, attr, original)
+        self._undo.clear()
+        if self.server:
+            self.stats.update({f"server_{k}": v for k, v in self.server.stats.items()})
+            self.server.stop()
+        return False
+
+    # --- HTTP -------------------------------------------------------------
+
+    def _patch_http(self):
+        import requests
+
+        session = self
+        original_send = requests.Session.send
+
+        def send(self, request, **kwargs):
+            if session.mode == "replay":
+                if not session.server.owns(request.url):
+                    session.stats["http_replayed"] += 1
+                    request.url = session.server.url_for(request.url)
+                response = original_send(self, request, **kwargs)
+                if response.status_code == 599:
+                    raise FixtureMissing(f"HTTP {request.method} {_original_url(urlsplit(request.url).path)}")
+                return response
+
+            response = original_send(self, request, **kwargs)
+            body = response.content
+            session.store.save_http(request.method, request.url, response.status_code,
+                                    response.headers.get("Content-Type"), body)
+            session.stats["http_recorded"] += 1
+            return response
+
+        self._patch(requests.Session, "send", send)
+
+    def _patch_spatial_readers(self):
+        """geopandas/rasterio read URLs through GDAL, outside requests."""
+        session = self
+
+        def is_remote(path) -> bool:
+            return isinstance(path, str) and (path.startswith("http") or path.startswith("/vsicurl/http"))
+
+        def redirect(path: str) -> str:
+            import requests
+
+            if session.mode == "record":
+                # Fetch once through requests so the bytes land in the fixtures
+                requests.get(normalize_url(path), timeout=300)
+                return path
+            url = session.server.url_for(path)
+            return f"/vsicurl/{url}" if path.startswith("/vsicurl/") else url
+
+        try:
+            import geopandas
+        except ImportError:
+            geopandas = None
+        if geopandas is not None:
+            original_read_file = geopandas.read_file
+
+            def read_file(filename, *args, **kwargs):
+                if is_remote(filename):
+                    session.stats["vector_reads"] += 1
+                    filename = redirect(filename)
+                return original_read_file(filename, *args, **kwargs)
+
+            self._patch(geopandas, "read_file", read_file)
+
+        try:
+            import rasterio
+        except ImportError:
+            rasterio = None
+        if rasterio is not None:
+            original_open = rasterio.open
+
+            def open_(fp, *args, **kwargs):
+                if is_remote(fp):
+                    session.stats["raster_reads"] += 1
+                    fp = redirect(fp)
+                return original_open(fp, *args, **kwargs)
+
+            self._patch(rasterio, "open", open_)
+
+    # --- Gemini -----------------------------------------------------------
+
+    def _patch_llm(self):
+        try:
+            from langchain_core.language_models.chat_models import BaseChatModel
+            from langchain_core.messages import AIMessage
+        except ImportError:
+            return
+
+        session = self
+        original_invoke = BaseChatModel.invoke
+
+        def prompt_text(prompt) -> str:
+            if isinstance(prompt, str):
+                return prompt
+            if isinstance(prompt, (list, tuple)):
+                return json.dumps([getattr(m, "content", m) for m in prompt], default=str)
+            return str(prompt)
+
+        def invoke(self, input, *args, **kwargs):
+            model = getattr(self, "model", None) or getattr(self, "model_name", None) or type(self).__name__
+            key = fixture_key("llm", model, getattr(self, "temperature", None), prompt_text(input))
+            if session.mode == "replay":
+                record = session.store.load("llm", key)
+                session.stats["llm_replayed"] += 1
+                return AIMessage(content=record["content"], usage_metadata=record.get("usage_metadata"))
+
+            response = original_invoke(self, input, *args, **kwargs)
+            session.store.save("llm", key, {
+                "model": model,
+                "content": response.content,
+                "usage_metadata": dict(getattr(response, "usage_metadata", None) or {}) or None
+            })
+            session.stats["llm_recorded"] += 1
+            return response
+
+        self._patch(BaseChatModel, "invoke", invoke)
+
+    # --- Earth Engine -------------------------------------------------------
+
+    def _patch_ee(self):
+        import ee_features
+
+        session = self
+        original_fetch = ee_features.fetch_features
+
+        def fetch_features(collection_id, name_field=None, name=None, eq_filters=None, geometry=None):
+            import geopandas
+
+            bounds = tuple(geometry.bounds) if geometry is not None else None
+            key = fixture_key("ee", ee_features._cache_key(collection_id, name_field, name, eq_filters, bounds))
+            if session.mode == "replay":
+                record = session.store.load("ee", key)
+                session.stats["ee_replayed"] += 1
+                gdf = geopandas.GeoDataFrame.from_features(json.loads(record["geojson"])["features"])
+                return gdf.set_crs("EPSG:4326") if gdf.crs is None else gdf
+
+            gdf = original_fetch(collection_id, name_field=name_field, name=name,
+                                 eq_filters=eq_filters, geometry=geometry)
+            session.store.save("ee", key, {"collection": collection_id, "geojson": gdf.to_json()})
+            session.stats["ee_recorded"] += 1
+            return gdf
+
+        # Callers import fetch_features by name, so patch every module that holds it
+        for module_name in ("ee_features", "new_architecture", "crosswalk"):
+            module = sys.modules.get(module_name)
+            if module is not None and getattr(module, "fetch_features", None) is original_fetch:
+                self._patch(module, "fetch_features", fetch_features)
+
+
+@contextlib.contextmanager
+def offline_mode(mode: str, fixtures_dir: str = DEFAULT_FIXTURES_DIR):
+    """Record live responses into fixtures, or replay them with no network access."""
+    with OfflineSession(mode, fixtures_dir) as session:
+        yield session
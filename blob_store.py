@@ -0,0 +1,171 @@
+"""
+Blob Store for CoreStack Agent System
+- Content-addressed storage for large artifact payloads (sha256 of the raw bytes)
+- Identical payloads are stored once, whichever artifacts reference them
+- zstd compression when `zstandard` is installed, zlib otherwise
+- Streaming reads, so large payloads need not be held in memory
+"""
+
+import os
+import io
+import zlib
+import hashlib
+import tempfile
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+    HAVE_ZSTD = True
+except ImportError:
+    zstandard = None
+    HAVE_ZSTD = False
+
+BLOB_DIR = os.getenv("ARTIFACT_BLOB_DIR", "artifact_blobs")
+
+# Payloads at or above this size (bytes of JSON) go to the blob store
+BLOB_THRESHOLD_BYTES = int(os.getenv("ARTIFACT_BLOB_THRESHOLD", 16 * 1024))
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+READ_CHUNK = 64 * 1024
+
+_EXTENSIONS = (".zst", ".zz")
+
+
+def blob_dir_for(db_path: str) -> str:
+    """
+    Blob directory for a registry database: ARTIFACT_BLOB_DIR if set,
+    otherwise `artifact_blobs` next to the database file (absolute, so it
+    does not depend on the working directory).
+    """
+    if os.getenv("ARTIFACT_BLOB_DIR"):
+        return os.path.abspath(os.environ["ARTIFACT_BLOB_DIR"])
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), "artifact_blobs")
+
+
+class _ZlibStreamReader(io.RawIOBase):
+    """Readable stream that inflates a zlib file chunk by chunk."""
+
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._inflater = zlib.decompressobj()
+        self._buffer = b""
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer and not self._eof:
+            chunk = self._file.read(READ_CHUNK)
+            if chunk:
+                self._buffer = self._inflater.decompress(chunk)
+            else:
+                self._buffer = self._inflater.flush()
+                self._eof = True
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class BlobStore:
+    """
+    Files under `root/<2 hex>/<digest><ext>`, written atomically.
+
+    The digest is taken over the uncompressed bytes, so a payload keeps its
+    address whichever codec stored it.
+    """
+
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    def _find(self, digest: str) -> Optional[str]:
+        for ext in _EXTENSIONS:
+            path = self._path(digest, ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def exists(self, digest: str) -> bool:
+        return self._find(digest) is not None
+
+    def put(self, data: bytes, digest: Optional[str] = None) -> str:
+        """Store bytes (no-op if already present) and return their digest."""
+        digest = digest or self.digest(data)
+        if self.exists(digest):
+            return digest
+
+        if HAVE_ZSTD:
+            ext, payload = ".zst", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        else:
+            ext, payload = ".zz", zlib.compress(data, ZLIB_LEVEL)
+
+        path = self._path(digest, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def open(self, digest: str):
+        """
+        Binary stream of the decompressed payload.
+
+        Raises:
+            KeyError: if no blob with this digest exists
+        """
+        path = self._find(digest)
+        if path is None:
+            raise KeyError(digest)
+        f = open(path, "rb")
+        if path.endswith(".zst"):
+            if not HAVE_ZSTD:
+                f.close()
+                raise RuntimeError(f"Blob {digest} is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+        return io.BufferedReader(_ZlibStreamReader(f), buffer_size=READ_CHUNK)
+
+    def get(self, digest: str) -> bytes:
+        with self.open(digest) as stream:
+            return stream.read()
+
+    def size_on_disk(self, digest: str) -> int:
+        path = self._find(digest)
+        return os.path.getsize(path) if path else 0
+
+    def delete(self, digest: str) -> bool:
+        path = self._find(digest)
+        if path is None:
+            return False
+        os.remove(path)
+        return True
+
+    def iter_digests(self) -> Iterator[str]:
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            subdir = os.path.join(self.root, prefix)
+            if not os.path.isdir(subdir):
+                continue
+            for name in os.listdir(subdir):
+                for ext in _EXTENSIONS:
+                    if name.endswith(ext):
+                        yield name[:-len(ext)]
@@ -0,0 +1,255 @@
+"""
+CodeAct Code Templates for CoreStack Agent System
+- Successful (plan, code) pairs are stored as templates keyed by the
+  normalized intent and the layer set they used
+- Location and year values, and the data handles / URLs of the layers the
+  code used, are abstracted into parameters, so a later query with the same
+  structure ("cropping intensity over years in village X") binds its own
+  values and runs without generate_plan / generate_code
+- Templates that fail on reuse are retired after MAX_TEMPLATE_FAILURES
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from tracing import record_cache_hit
+
+CODE_TEMPLATE_DB = os.getenv("CODE_TEMPLATE_DB", "code_templates.db")
+CODE_TEMPLATES_ENABLED = os.getenv("DISABLE_CODE_TEMPLATES") != "1"
+MAX_TEMPLATE_FAILURES = 2
+
+# Intent fields abstracted as template parameters
+TEMPLATE_PARAMS = ("location_name", "district", "latitude", "longitude", "start_year", "end_year")
+
+_MARKER = "__TPL_{}__"
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+# data_handles.DataHandleRegistry.register ids
+_HANDLE = re.compile(r"\bdh_[0-9a-f]{24}\b")
+
+
+def _value_pattern(value) -> Optional[re.Pattern]:
+    """Regex matching a parameter value as it appears in query or code text."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return re.compile(r"(?<![\w])" + re.escape(value) + r"(?![\w])", re.IGNORECASE)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return re.compile(r"(?<!\d)" + str(value) + r"(?!\d)")
+    return None
+
+
+def _replace_numbers(text: str, value: float, marker: str) -> str:
+    """Replace numeric literals equal to a float parameter (coordinates) with a marker."""
+    def swap(match):
+        try:
+            return marker if abs(float(match.group(0)) - value) < 1e-9 else match.group(0)
+        except ValueError:
+            return match.group(0)
+    return _NUMBER.sub(swap, text)
+
+
+def abstract(text: str, params: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """
+    Replace parameter values in text with markers.
+
+    Returns:
+        (abstracted text, names of the parameters that occurred)
+    """
+    used = []
+    # Longer strings first so "Shirur Kasar" is replaced before "Shirur"
+    for name, value in sorted(params.items(), key=lambda kv: -len(str(kv[1]))):
+        marker = _MARKER.format(name)
+        if isinstance(value, float):
+            new_text = _replace_numbers(text, value, marker)
+        else:
+            pattern = _value_pattern(value)
+            new_text = pattern.sub(marker, text) if pattern else text
+        if new_text != text:
+            used.append(name)
+            text = new_text
+    return text, sorted(used)
+
+
+def bind(text: str, params: Dict[str, Any]) -> str:
+    """Substitute parameter values for the markers in a template text."""
+    for name, value in params.items():
+        text = text.replace(_MARKER.format(name), str(value))
+    return text
+
+
+def template_params(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: parsed.get(name) for name in TEMPLATE_PARAMS if parsed.get(name) not in (None, "")}
+
+
+def layer_params(selected_layers: Dict[str, list]) -> Dict[str, Any]:
+    """
+    Handle and URLs of each selected layer as template parameters, numbered in
+    _layer_names order. Handles are clipped to the query's boundary, so code
+    that names one literally must get the new query's handle on reuse.
+    """
+    by_name = {l['layer_name']: l for kind in ('vector', 'raster') for l in selected_layers.get(kind, [])}
+    params = {}
+    for i, name in enumerate(sorted(by_name)):
+        layer = by_name[name]
+        if layer.get('handle'):
+            params[f"layer{i}_handle"] = layer['handle']
+        if layer.get('layer_url'):
+            params[f"layer{i}_url"] = layer['layer_url']
+        for j, entry in enumerate(layer.get('urls') or []):
+            if entry.get('url') and entry['url'] != layer.get('layer_url'):
+                params[f"layer{i}_url{j}"] = entry['url']
+    return params
+
+
+def intent_key(query: str, parsed: Dict[str, Any]) -> str:
+    """
+    Normalized intent: the query with parameter values abstracted, lowercased and
+    whitespace/punctuation-collapsed, plus the location type. Other numbers (radii,
+    thresholds) stay literal, so a "2km" template never answers a "5km" query.
+    """
+    text, _ = abstract(query, template_params(parsed))
+    text = re.sub(r"[^\w\s.<>-]", " ", text.lower())
+    text = re.sub(r"\s+", " ", text).strip(" .")
+    return f"{parsed.get('location_type') or ''}|{text}"
+
+
+def _layer_names(selected_layers: Dict[str, list]) -> List[str]:
+    return sorted(l['layer_name'] for kind in ('vector', 'raster') for l in selected_layers.get(kind, []))
+
+
+class CodeTemplateStore:
+    def __init__(self, db_path: str = CODE_TEMPLATE_DB):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS code_templates (
+                template_key TEXT PRIMARY KEY,
+                intent_key TEXT,
+                layer_names TEXT,
+                params TEXT,
+                plan TEXT,
+                code TEXT,
+                created REAL,
+                last_used REAL,
+                uses INTEGER DEFAULT 0,
+                failures INTEGER DEFAULT 0
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_code_templates_intent ON code_templates(intent_key)")
+            self.conn.commit()
+
+    def store(self, query: str, parsed: Dict[str, Any], plan: Dict[str, Any], code: str,
+              selected_layers: Dict[str, list]) -> Optional[str]:
+        """
+        Save a (plan, code) pair that ran successfully.
+
+        Returns:
+            Template key, or None when the code names a layer handle or URL
+            that could not be turned into a parameter (reusing it would read
+            the original query's data)
+        """
+        layer_values = layer_params(selected_layers)
+        params = dict(template_params(parsed), **layer_values)
+        code_text, code_params = abstract(code, params)
+        plan_text, plan_params = abstract(json.dumps(plan), params)
+        leftovers = set(_HANDLE.findall(code_text + plan_text))
+        leftovers |= {v for v in layer_values.values() if v in code_text or v in plan_text}
+        if leftovers:
+            print(f"⚠️  Code template not stored: layer literals left in the code ({', '.join(sorted(leftovers))[:120]})")
+            return None
+        key_intent = intent_key(query, parsed)
+        layers = _layer_names(selected_layers)
+        template_key = hashlib.sha256(json.dumps([key_intent, layers]).encode()).hexdigest()
+        used_params = sorted(set(code_params) | set(plan_params))
+        now = time.time()
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            INSERT OR REPLACE INTO code_templates
+                (template_key, intent_key, layer_names, params, plan, code, created, last_used, uses, failures)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, 0)
+            """, (template_key, key_intent, json.dumps(layers), json.dumps(used_params), plan_text, code_text,
+                  now, now))
+            self.conn.commit()
+        return template_key
+
+    def lookup(self, query: str, parsed: Dict[str, Any],
+               available_layers: Dict[str, list]) -> Optional[Dict[str, Any]]:
+        """
+        Find a template for this intent whose layers are all available and whose
+        parameters the query provides.
+
+        Returns:
+            {'template_key', 'plan', 'code', 'selected_layers'} with values bound, or None
+        """
+        key_intent = intent_key(query, parsed)
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            SELECT template_key, layer_names, params, plan, code FROM code_templates
+            WHERE intent_key=? AND failures < ?
+            ORDER BY uses DESC, last_used DESC
+            """, (key_intent, MAX_TEMPLATE_FAILURES))
+            rows = c.fetchall()
+        if not rows:
+            return None
+
+        by_name = {l['layer_name']: (kind, l) for kind in ('vector', 'raster') for l in available_layers.get(kind, [])}
+        for template_key, layer_names, used_params, plan_text, code_text in rows:
+            layer_names = json.loads(layer_names)
+            if any(name not in by_name for name in layer_names):
+                continue
+            selected = {'vector': [], 'raster': []}
+            for name in layer_names:
+                kind, layer = by_name[name]
+                selected[kind].append(layer)
+            # This query's values, including the handles and URLs of its own layers
+            params = dict(template_params(parsed), **layer_params(selected))
+            if any(p not in params for p in json.loads(used_params)):
+                continue
+            with self._lock:
+                self.conn.execute("UPDATE code_templates SET uses = uses + 1, last_used = ? WHERE template_key = ?",
+                                  (time.time(), template_key))
+                self.conn.commit()
+            record_cache_hit("code_template")
+            return {
+                'template_key': template_key,
+                'plan': json.loads(bind(plan_text, params)),
+                'code': bind(code_text, params),
+                'selected_layers': selected
+            }
+        return None
+
+    def record_failure(self, template_key: str):
+        """Count a failed reuse; templates reaching MAX_TEMPLATE_FAILURES stop matching."""
+        with self._lock:
+            self.conn.execute("UPDATE code_templates SET failures = failures + 1 WHERE template_key = ?",
+                              (template_key,))
+            self.conn.commit()
+
+
+_store: Optional[CodeTemplateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_template_store() -> Optional[CodeTemplateStore]:
+    """Process-wide store, opened on first use; None when templates are disabled."""
+    global _store
+    if not CODE_TEMPLATES_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CodeTemplateStore()
+    return _store
@@ -0,0 +1,305 @@
+"""
+Village → Tehsil → Watershed Crosswalk for CoreStack Agent System
+- Offline build job: intersects every village with tehsils and watersheds once
+- Stores village_id → [tehsils], [watershed UIDs], bbox, area in an indexed SQLite table
+- Also stores tehsil and state centroids for offline geocoding
+- Geometry resolution becomes a single keyed lookup instead of pan-India intersections
+
+Build:
+    python crosswalk.py --villages ./village_boundaries.geojson [--tehsils FILE] [--watersheds FILE] [--states FILE]
+
+Tehsil, watershed and state boundaries are read from local files when given, otherwise
+from the Earth Engine collections used by resolve_geometry_v2.
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+import threading
+from typing import Dict, Any, List, Optional
+
+from ee_features import TEHSIL_COLLECTION, WATERSHED_COLLECTION, STATE_COLLECTION
+
+CROSSWALK_DB = os.getenv("CROSSWALK_DB", "crosswalk.db")
+
+# Candidate ID columns in the village boundaries file, in order of preference
+VILLAGE_ID_COLUMNS = ("village_id", "vill_id", "pc11_village_id", "censuscode", "id")
+
+
+def name_key(value: Optional[str]) -> str:
+    """Lookup key for names (case- and whitespace-insensitive)."""
+    return " ".join(str(value or "").lower().split())
+
+
+def village_id_column(columns) -> Optional[str]:
+    for col in VILLAGE_ID_COLUMNS:
+        if col in columns:
+            return col
+    return None
+
+
+# ============================================================================
+# LOOKUP
+# ============================================================================
+
+class VillageCrosswalk:
+    """Read-only access to the precomputed crosswalk table."""
+
+    def __init__(self, db_path: str = CROSSWALK_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def _rows_to_entries(self, rows) -> List[Dict[str, Any]]:
+        from shapely import wkb
+        from shapely.geometry import Point
+
+        entries = []
+        for row in rows:
+            (village_id, village_name, district, state_name, tehsils, watersheds,
+             minx, miny, maxx, maxy, area_ha, geometry) = row
+            tehsil_list = json.loads(tehsils)
+            for t in tehsil_list:
+                # Only the tehsil's representative point is needed downstream
+                t['geometry'] = Point(t.pop('lon'), t.pop('lat'))
+            entries.append({
+                'village_id': village_id,
+                'village_name': village_name,
+                'district': district,
+                'state': state_name,
+                'tehsil_list': tehsil_list,
+                'watershed_list': json.loads(watersheds),
+                'bbox': (minx, miny, maxx, maxy),
+                'area_ha': area_ha,
+                'geometry': wkb.loads(geometry)
+            })
+        return entries
+
+    _COLUMNS = ("village_id, village_name, district, state, tehsils, watersheds, "
+                "minx, miny, maxx, maxy, area_ha, geometry")
+
+    def get(self, village_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute(f"SELECT {self._COLUMNS} FROM village_crosswalk WHERE village_id=?", (str(village_id),))
+            row = c.fetchone()
+        return self._rows_to_entries([row])[0] if row else None
+
+    def find(self, village_name: str, district: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            c = self.conn.cursor()
+            if district:
+                c.execute(f"SELECT {self._COLUMNS} FROM village_crosswalk WHERE name_key=? AND district_key=?",
+                          (name_key(village_name), name_key(district)))
+            else:
+                c.execute(f"SELECT {self._COLUMNS} FROM village_crosswalk WHERE name_key=?",
+                          (name_key(village_name),))
+            rows = c.fetchall()
+        return self._rows_to_entries(rows)
+
+    def find_place(self, kind: str, name: str, district: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Centroids of tehsils or states by name (kind: 'tehsil' | 'state')."""
+        query = "SELECT name, district, state, lat, lon FROM place_centroids WHERE kind=? AND name_key=?"
+        params = [kind, name_key(name)]
+        if district:
+            query += " AND district_key=?"
+            params.append(name_key(district))
+        try:
+            with self._lock:
+                c = self.conn.cursor()
+                c.execute(query, params)
+                rows = c.fetchall()
+        except sqlite3.OperationalError:
+            # Table predates place centroids
+            return []
+        return [{'name': r[0], 'district': r[1], 'state': r[2], 'lat': r[3], 'lon': r[4]} for r in rows]
+
+
+_crosswalk = None
+_crosswalk_lock = threading.Lock()
+
+
+def get_crosswalk(db_path: str = CROSSWALK_DB) -> Optional[VillageCrosswalk]:
+    """Shared crosswalk instance, or None if the table has not been built."""
+    global _crosswalk
+    if _crosswalk is None:
+        if not os.path.exists(db_path):
+            return None
+        with _crosswalk_lock:
+            if _crosswalk is None:
+                _crosswalk = VillageCrosswalk(db_path)
+    return _crosswalk
+
+
+# ============================================================================
+# OFFLINE BUILD JOB
+# ============================================================================
+
+def _load_boundaries(path: Optional[str], collection_id: Optional[str], label: str):
+    import geopandas as gpd
+
+    if path:
+        print(f"📂 Loading {path}...")
+        return gpd.read_file(path)
+    if collection_id is None:
+        raise ValueError(f"No {label} boundaries file given and no Earth Engine collection to load them from")
+
+    import geemap
+    from lazy_imports import ensure_ee
+    ee = ensure_ee()
+    print(f"📡 Loading {collection_id} from Earth Engine...")
+    return geemap.ee_to_geopandas(ee.FeatureCollection(collection_id))
+
+
+def build_crosswalk(villages_path: str = "./village_boundaries.geojson",
+                    tehsils_path: Optional[str] = None,
+                    watersheds_path: Optional[str] = None,
+                    states_path: Optional[str] = None,
+                    db_path: str = CROSSWALK_DB) -> int:
+    """
+    Precompute the crosswalk table.
+
+    Args:
+        villages_path: Village boundaries file (village_name, district columns)
+        tehsils_path: Optional local tehsil boundaries (defaults to SOI_tehsil on EE)
+        watersheds_path: Optional local watershed boundaries (defaults to Watershed_pan_india on EE)
+        states_path: Optional local state boundaries (defaults to State_pan_india on EE)
+        db_path: Output SQLite file (replaced atomically)
+
+    Returns:
+        Number of villages written
+    """
+    import geopandas as gpd
+    from area_service import area_service
+
+    villages = _load_boundaries(villages_path, None, "village")
+    tehsils = _load_boundaries(tehsils_path, TEHSIL_COLLECTION, "tehsil")
+    watersheds = _load_boundaries(watersheds_path, WATERSHED_COLLECTION, "watershed")
+    states = _load_boundaries(states_path, STATE_COLLECTION, "state")
+
+    for gdf in (villages, tehsils, watersheds, states):
+        if gdf.crs is None:
+            gdf.set_crs("EPSG:4326", inplace=True)
+    villages = villages.to_crs("EPSG:4326")
+    tehsils = tehsils.to_crs("EPSG:4326")
+    watersheds = watersheds.to_crs("EPSG:4326")
+    states = states.to_crs("EPSG:4326")
+
+    id_col = village_id_column(villages.columns)
+    villages = villages.reset_index(drop=True)
+    villages['_vid'] = villages[id_col].astype(str) if id_col else villages.index.astype(str)
+    print(f"🏘️  {len(villages)} villages (id column: {id_col or 'row index'})")
+
+    # Tehsil rows carry their representative point; that is all the layer fetch needs
+    tehsils = tehsils.reset_index(drop=True)
+    tehsil_points = tehsils.geometry.representative_point()
+    tehsil_info = [{
+        'state': row.get('state_name', row.get('state')),
+        'district': row.get('district_name', row.get('district')),
+        'tehsil': row.get('name'),
+        'lat': float(tehsil_points.iloc[i].y),
+        'lon': float(tehsil_points.iloc[i].x)
+    } for i, row in tehsils.iterrows()]
+
+    print("🔍 Intersecting villages with tehsils...")
+    v_t = gpd.sjoin(villages[['_vid', 'geometry']], tehsils[['geometry']], how='inner', predicate='intersects')
+    village_tehsils: Dict[str, List[int]] = {}
+    for vid, t_idx in zip(v_t['_vid'], v_t['index_right']):
+        village_tehsils.setdefault(vid, []).append(int(t_idx))
+
+    print("🔍 Intersecting villages with watersheds...")
+    village_watersheds: Dict[str, List[str]] = {}
+    if 'uid' in watersheds.columns:
+        v_w = gpd.sjoin(villages[['_vid', 'geometry']], watersheds[['uid', 'geometry']],
+                        how='inner', predicate='intersects')
+        for vid, uid in zip(v_w['_vid'], v_w['uid']):
+            village_watersheds.setdefault(vid, []).append(str(uid))
+
+    print("📐 Computing village areas...")
+    areas = area_service.compute_areas({'villages': villages}, per_geometry=True)['villages']['areas_ha']
+
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    c = conn.cursor()
+    c.execute("""
+    CREATE TABLE village_crosswalk (
+        village_id TEXT PRIMARY KEY,
+        village_name TEXT,
+        name_key TEXT,
+        district TEXT,
+        district_key TEXT,
+        state TEXT,
+        tehsils TEXT,
+        watersheds TEXT,
+        minx REAL, miny REAL, maxx REAL, maxy REAL,
+        area_ha REAL,
+        geometry BLOB
+    )
+    """)
+
+    rows = []
+    for i, row in villages.iterrows():
+        vid = row['_vid']
+        geom = row.geometry
+        if geom is None:
+            continue
+        minx, miny, maxx, maxy = geom.bounds
+        district = row.get('district')
+        rows.append((
+            vid,
+            row.get('village_name'),
+            name_key(row.get('village_name')),
+            district,
+            name_key(district),
+            row.get('state', row.get('state_name')),
+            json.dumps([tehsil_info[t] for t in village_tehsils.get(vid, [])]),
+            json.dumps(sorted(set(village_watersheds.get(vid, [])))),
+            minx, miny, maxx, maxy,
+            areas[i],
+            geom.wkb
+        ))
+    c.executemany("INSERT OR REPLACE INTO village_crosswalk VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    c.execute("CREATE INDEX idx_crosswalk_name ON village_crosswalk (name_key, district_key)")
+
+    c.execute("""
+    CREATE TABLE place_centroids (
+        kind TEXT,
+        name TEXT,
+        name_key TEXT,
+        district TEXT,
+        district_key TEXT,
+        state TEXT,
+        lat REAL,
+        lon REAL
+    )
+    """)
+    places = [('tehsil', t['tehsil'], name_key(t['tehsil']), t['district'], name_key(t['district']),
+               t['state'], t['lat'], t['lon']) for t in tehsil_info]
+    state_points = states.geometry.representative_point()
+    for i, row in states.reset_index(drop=True).iterrows():
+        state_name = row.get('state_name', row.get('name'))
+        places.append(('state', state_name, name_key(state_name), None, '', state_name,
+                       float(state_points.iloc[i].y), float(state_points.iloc[i].x)))
+    c.executemany("INSERT INTO place_centroids VALUES (?, ?, ?, ?, ?, ?, ?, ?)", places)
+    c.execute("CREATE INDEX idx_place_name ON place_centroids (kind, name_key, district_key)")
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+    print(f"✅ Crosswalk written: {len(rows)} villages → {db_path}")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the village → tehsil → watershed crosswalk table")
+    parser.add_argument("--villages", default="./village_boundaries.geojson")
+    parser.add_argument("--tehsils", default=None, help="Local tehsil boundaries (default: SOI_tehsil on Earth Engine)")
+    parser.add_argument("--watersheds", default=None, help="Local watershed boundaries (default: Watershed_pan_india on Earth Engine)")
+    parser.add_argument("--states", default=None, help="Local state boundaries (default: State_pan_india on Earth Engine)")
+    parser.add_argument("--db", default=CROSSWALK_DB)
+    args = parser.parse_args()
+
+    build_crosswalk(args.villages, args.tehsils, args.watersheds, args.states, args.db)
@@ -0,0 +1,245 @@
+"""
+Data Handles for CoreStack Agent System
+- A handle names one catalog layer (all its regional URLs) plus the query
+  boundary it is clipped to; the graph registers handles, generated code
+  loads them with load_layer(handle) instead of downloading URLs itself
+- Loading merges the regions, clips to the boundary and caches the result
+  in memory and as a pickle under DATA_HANDLE_DIR, so the data is fetched
+  once and every later load (any process, any tool call) is a cache read
+- Vectors load as GeoDataFrames; rasters as a window dict with
+  data / transform / crs / nodata / bounds. Every load returns a copy, so
+  code that edits its data in place never changes the cached layer
+- Pickles beyond DATA_HANDLE_MAX_MB are pruned least recently used first
+"""
+
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from lazy_imports import lazy_module
+from prefetch import read_vector
+from tracing import record_cache_hit
+
+gpd = lazy_module("geopandas")
+pd = lazy_module("pandas")
+np = lazy_module("numpy")
+
+DATA_HANDLE_DIR = os.getenv("DATA_HANDLE_DIR", "data_handles")
+HANDLE_MEMORY_ENTRIES = int(os.getenv("HANDLE_MEMORY_ENTRIES", 8))
+DATA_HANDLE_MAX_BYTES = int(float(os.getenv("DATA_HANDLE_MAX_MB", 2048)) * 1024 * 1024)
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _vsicurl(url: str) -> str:
+    return f"/vsicurl/{url}" if url.startswith("http") else url
+
+
+def _copy(value):
+    """A caller's own copy of a loaded layer (GeoDataFrame, or raster window dict)."""
+    if isinstance(value, dict):
+        return dict(value, data=value['data'].copy())
+    return value.copy()
+
+
+def _prune_handle_dir(root: str, max_bytes: int):
+    """Delete least recently used pickles beyond max_bytes (specs are tiny and kept)."""
+    try:
+        entries = [e for e in os.scandir(root) if e.name.endswith(".pkl")]
+    except OSError:
+        return
+    stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+class DataHandleRegistry:
+    """
+    Registry of layer handles.
+
+    Args:
+        root: Directory for handle specs and materialized pickles
+        max_entries: Loaded layers kept in memory (LRU)
+    """
+
+    def __init__(self, root: str = DATA_HANDLE_DIR, max_entries: int = HANDLE_MEMORY_ENTRIES,
+                 max_bytes: int = DATA_HANDLE_MAX_BYTES):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        self._loaded: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    # ---------------------------------------------------------------- specs
+
+    def register(self, layer: Dict[str, Any], clip_geom=None) -> str:
+        """
+        Register a catalog layer (optionally clipped to a EPSG:4326 boundary).
+
+        Returns:
+            Handle id, stable for the same URLs and boundary
+        """
+        urls = [u['url'] for u in layer.get('urls', [])] or [layer['layer_url']]
+        spec = {
+            'layer_name': layer['layer_name'],
+            'layer_type': layer.get('layer_type', 'vector'),
+            'urls': urls,
+            'clip_wkb': clip_geom.wkb_hex if clip_geom is not None else None
+        }
+        handle = "dh_" + hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:24]
+        with self._lock:
+            self._specs[handle] = spec
+        os.makedirs(self.root, exist_ok=True)
+        spec_path = os.path.join(self.root, f"{handle}.json")
+        if not os.path.exists(spec_path):
+            _atomic_write(spec_path, json.dumps(spec).encode())
+        return handle
+
+    def describe(self, handle: str) -> Dict[str, Any]:
+        """Spec of a handle (also readable in processes that did not register it)."""
+        with self._lock:
+            spec = self._specs.get(handle)
+        if spec is None:
+            path = os.path.join(self.root, f"{handle}.json")
+            if not os.path.exists(path):
+                raise KeyError(f"Unknown data handle: {handle}")
+            with open(path) as f:
+                spec = json.load(f)
+            with self._lock:
+                self._specs[handle] = spec
+        return spec
+
+    # ---------------------------------------------------------------- loading
+
+    def load(self, handle: str, clip: bool = True):
+        """
+        Load a handle's data: memory → pickle on disk → download, merge, clip.
+
+        Args:
+            handle: Id returned by register()
+            clip: Clip to the registered boundary (False = full merged regions)
+
+        Returns:
+            A copy of the GeoDataFrame (vector layers) or window dict (raster
+            layers); the cached value itself is never handed out
+        """
+        spec = self.describe(handle)
+        clip_wkb = spec['clip_wkb'] if clip else None
+        # Unclipped data is shared by every handle over the same URLs
+        key = hashlib.sha256(json.dumps([spec['urls'], clip_wkb]).encode()).hexdigest()[:32]
+
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                record_cache_hit("data_handle")
+                return _copy(self._loaded[key])
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._loaded:
+                    record_cache_hit("data_handle")
+                    return _copy(self._loaded[key])
+
+            path = os.path.join(self.root, f"{key}.pkl")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+                os.utime(path)  # keeps recently used pickles out of pruning
+                record_cache_hit("data_handle")
+            else:
+                clip_geom = None
+                if clip_wkb:
+                    from shapely import wkb
+                    clip_geom = wkb.loads(bytes.fromhex(clip_wkb))
+                if spec['layer_type'] == 'raster':
+                    value = self._materialize_raster(spec, clip_geom)
+                else:
+                    value = self._materialize_vector(spec, clip_geom)
+                os.makedirs(self.root, exist_ok=True)
+                _atomic_write(path, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                _prune_handle_dir(self.root, self.max_bytes)
+
+            with self._lock:
+                self._loaded[key] = value
+                while len(self._loaded) > self.max_entries:
+                    self._loaded.popitem(last=False)
+            return _copy(value)
+
+    def _materialize_vector(self, spec: Dict[str, Any], clip_geom):
+        frames = [read_vector(url) for url in spec['urls']]
+        print(f"📦 Handle {spec['layer_name']}: merging {len(frames)} region(s)")
+        merged = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs=frames[0].crs)
+        if len(frames) > 1:
+            # Regions overlap at their borders; drop exact duplicate geometries
+            merged = merged[~merged.geometry.to_wkb().duplicated()]
+        if clip_geom is not None:
+            boundary = gpd.GeoSeries([clip_geom], crs="EPSG:4326")
+            if merged.crs is not None:
+                boundary = boundary.to_crs(merged.crs)
+            merged = gpd.clip(merged, boundary.iloc[0])
+        print(f"   ✅ {len(merged)} features")
+        return merged
+
+    def _materialize_raster(self, spec: Dict[str, Any], clip_geom):
+        import rasterio
+        from rasterio.merge import merge as rio_merge
+        from rasterio.features import geometry_mask
+        from rasterio.warp import transform_geom, transform_bounds
+
+        sources = [rasterio.open(_vsicurl(url)) for url in spec['urls']]
+        try:
+            src = sources[0]
+            crs = src.crs
+            nodata = src.nodata
+            geom = None
+            bounds = None
+            if clip_geom is not None:
+                geom = transform_geom("EPSG:4326", crs, clip_geom.__geo_interface__) if crs else clip_geom.__geo_interface__
+                bounds = transform_bounds("EPSG:4326", crs, *clip_geom.bounds) if crs else clip_geom.bounds
+
+            # Windowed read: only the boundary's bbox is fetched (HTTP range requests)
+            data, transform = rio_merge(sources, bounds=bounds, indexes=[1])
+            band = data[0]
+            if geom is not None:
+                outside = geometry_mask([geom], out_shape=band.shape, transform=transform)
+                fill = nodata if nodata is not None else 0
+                band = np.where(outside, fill, band)
+        finally:
+            for s in sources:
+                s.close()
+
+        print(f"📦 Handle {spec['layer_name']}: raster window {band.shape} from {len(spec['urls'])} region(s)")
+        return {
+            'data': band,
+            'transform': transform,
+            'crs': crs.to_string() if crs else None,
+            'nodata': nodata,
+            'bounds': bounds
+        }
+
+
+data_handles = DataHandleRegistry()
+
+
+def load_layer(handle: str, clip: bool = True):
+    """Load a registered layer (see DataHandleRegistry.load)."""
+    return data_handles.load(handle, clip=clip)
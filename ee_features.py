@@ -0,0 +1,99 @@
+"""
+Earth Engine Feature Access for CoreStack Agent System
+- Pushes name and filterBounds filters to Earth Engine so only matching
+  features are transferred, instead of whole national FeatureCollections
+- Names match case-insensitively (compared lowercased on the server)
+- Client-side LRU cache of resolved features keyed by collection + filter
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any
+
+from lazy_imports import ensure_ee
+from tracing import record_cache_hit
+
+VILLAGE_COLLECTION = "projects/ext-datasets/assets/datasets/Village_pan_india"
+STATE_COLLECTION = "projects/ext-datasets/assets/datasets/State_pan_india"
+TEHSIL_COLLECTION = "projects/ext-datasets/assets/datasets/SOI_tehsil"
+WATERSHED_COLLECTION = "projects/ext-datasets/assets/datasets/Watershed_pan_india"
+
+MAX_CACHED_QUERIES = 128
+
+_cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Temporary property holding the lowercased name during filtering
+_NAME_KEY = "_name_lower"
+
+
+def _cache_key(collection_id, name_field, name, eq_filters, bounds):
+    rounded = tuple(round(v, 6) for v in bounds) if bounds is not None else None
+    return (
+        collection_id,
+        name_field,
+        name.strip().lower() if name else None,
+        tuple(sorted((eq_filters or {}).items())),
+        rounded
+    )
+
+
+def fetch_features(collection_id: str, name_field: Optional[str] = None, name: Optional[str] = None,
+                   eq_filters: Optional[Dict[str, Any]] = None, geometry=None):
+    """
+    Fetch only the features of an EE FeatureCollection that match the filters.
+
+    Args:
+        collection_id: EE asset id
+        name_field: Property holding the feature name
+        name: Name to match (case-insensitive)
+        eq_filters: Additional {property: value} equality filters
+        geometry: Shapely geometry; features are filtered server-side to its
+            bbox, callers refine with an exact intersects test
+
+    Returns:
+        GeoDataFrame (EPSG:4326) of matching features
+    """
+    bounds = tuple(geometry.bounds) if geometry is not None else None
+    key = _cache_key(collection_id, name_field, name, eq_filters, bounds)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            record_cache_hit("ee_features")
+            print(f"♻️  EE cache hit: {collection_id.rsplit('/', 1)[-1]}")
+            return cached.copy()
+
+    import geemap
+    ee = ensure_ee()
+
+    fc = ee.FeatureCollection(collection_id)
+    for prop, value in (eq_filters or {}).items():
+        fc = fc.filter(ee.Filter.eq(prop, value))
+    if bounds is not None:
+        fc = fc.filterBounds(ee.Geometry.Rectangle(list(bounds), 'EPSG:4326', False))
+    if name_field and name:
+        # EE string filters are case-sensitive: compare a lowercased copy of the name
+        fc = fc.filter(ee.Filter.notNull([name_field])).map(
+            lambda f: f.set(_NAME_KEY, ee.String(f.get(name_field)).toLowerCase())
+        ).filter(ee.Filter.eq(_NAME_KEY, name.strip().lower()))
+
+    gdf = geemap.ee_to_geopandas(fc)
+    if _NAME_KEY in gdf.columns:
+        gdf = gdf.drop(columns=[_NAME_KEY])
+    if gdf.crs is None:
+        gdf = gdf.set_crs("EPSG:4326")
+    print(f"📡 EE: {len(gdf)} features from {collection_id.rsplit('/', 1)[-1]}")
+
+    with _cache_lock:
+        _cache[key] = gdf
+        while len(_cache) > MAX_CACHED_QUERIES:
+            _cache.popitem(last=False)
+
+    return gdf.copy()
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,247 @@
+"""
+Village Gazetteer for CoreStack Agent System
+- In-memory index over the local village boundaries file, built lazily on first use
+- Normalized and transliteration-folded name keys ("Shirur" == "Shiroor")
+- Trigram candidate index for fuzzy matches, filterable by district and state
+"""
+
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+from crosswalk import village_id_column
+from lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+
+VILLAGE_BOUNDARIES_PATH = os.getenv("VILLAGE_BOUNDARIES_PATH", "./village_boundaries.geojson")
+
+# Candidates scoring below this are not considered a match
+MIN_MATCH_SCORE = 0.45
+
+# A candidate is used without asking only above this score and when no other
+# village scores within MIN_SCORE_MARGIN of it ("Shirpur" must not silently
+# become "Shirur"); otherwise the candidates go back to the user
+AUTO_ACCEPT_SCORE = 0.85
+MIN_SCORE_MARGIN = 0.1
+
+# Trigrams shared by more than this fraction of villages carry little signal
+MAX_POSTING_FRACTION = 0.02
+
+# Romanization variants of Indic names, applied in order after lower-casing
+_TRANSLITERATION_RULES = [
+    (r"aa", "a"), (r"ee", "i"), (r"ii", "i"), (r"oo", "u"), (r"uu", "u"), (r"ou", "u"),
+    (r"ph", "f"), (r"w", "v"), (r"z", "j"), (r"q", "k"), (r"ck", "k"),
+    (r"([kgcjtdpb])h", r"\1"),   # drop aspiration: kh→k, bh→b, th→t ...
+    (r"sh", "s"),
+    (r"y\b", "i"),              # Palli / Pally
+    (r"([a-z])\1+", r"\1"),     # collapse doubled letters: Kottur → Kotur
+]
+_TRANSLITERATION_RULES = [(re.compile(p), r) for p, r in _TRANSLITERATION_RULES]
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lower-case, strip diacritics and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(name or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return " ".join(text.split())
+
+
+def phonetic_key(name: Optional[str]) -> str:
+    """Normalized name with common transliteration variants folded together."""
+    key = normalize_name(name)
+    for pattern, repl in _TRANSLITERATION_RULES:
+        key = pattern.sub(repl, key)
+    return key.replace(" ", "")
+
+
+def trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class VillageGazetteer:
+    """
+    Ranked village-name lookup.
+
+    Exact and transliteration-equivalent names resolve through a dict lookup;
+    other spellings go through the trigram index and are ranked by Dice
+    similarity of their phonetic keys.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame.reset_index(drop=True)
+
+        id_col = village_id_column(self.frame.columns)
+        names = self.frame['village_name'].tolist()
+        districts = self.frame['district'].tolist() if 'district' in self.frame.columns else [None] * len(names)
+        state_col = 'state' if 'state' in self.frame.columns else ('state_name' if 'state_name' in self.frame.columns else None)
+        states = self.frame[state_col].tolist() if state_col else [None] * len(names)
+
+        self.village_ids = (self.frame[id_col].astype(str) if id_col else self.frame.index.astype(str)).tolist()
+        self.names = names
+        self.districts = districts
+        self.states = states
+        self.exact_keys = [normalize_name(n) for n in names]
+        self.keys = [phonetic_key(n) for n in names]
+        self.district_keys = np.array([normalize_name(d) for d in districts], dtype=object)
+        self.state_keys = np.array([normalize_name(s) for s in states], dtype=object)
+        self.key_sizes = np.array([len(trigrams(k)) for k in self.keys], dtype=np.int32)
+
+        by_key = defaultdict(list)
+        postings = defaultdict(list)
+        for row, key in enumerate(self.keys):
+            by_key[key].append(row)
+            for gram in trigrams(key):
+                postings[gram].append(row)
+        self.by_key = {k: np.array(v, dtype=np.int32) for k, v in by_key.items()}
+        self.postings = {g: np.array(v, dtype=np.int32) for g, v in postings.items()}
+        self.max_posting = max(1, int(len(self.keys) * MAX_POSTING_FRACTION))
+
+    @classmethod
+    def from_file(cls, path: str = VILLAGE_BOUNDARIES_PATH) -> "VillageGazetteer":
+        import geopandas as gpd
+
+        print(f"📖 Building village gazetteer from {path}...")
+        gazetteer = cls(gpd.read_file(path))
+        print(f"✅ Gazetteer ready: {len(gazetteer.keys)} villages, {len(gazetteer.postings)} trigrams")
+        return gazetteer
+
+    def _filter(self, rows: "np.ndarray", district: Optional[str], state: Optional[str]) -> "np.ndarray":
+        if district:
+            rows = rows[self.district_keys[rows] == normalize_name(district)]
+        if state:
+            rows = rows[self.state_keys[rows] == normalize_name(state)]
+        return rows
+
+    def _candidate(self, row: int, score: float) -> Dict[str, Any]:
+        return {
+            'row': int(row),
+            'village_id': self.village_ids[row],
+            'village_name': self.names[row],
+            'district': self.districts[row],
+            'state': self.states[row],
+            'score': round(float(score), 4)
+        }
+
+    def search(self, name: str, district: Optional[str] = None, state: Optional[str] = None,
+               limit: int = 5, min_score: float = MIN_MATCH_SCORE) -> List[Dict[str, Any]]:
+        """
+        Ranked candidates for a village name.
+
+        Args:
+            name: Village name as written by the user
+            district: Optional district filter
+            state: Optional state filter
+            limit: Maximum number of candidates
+            min_score: Drop candidates below this similarity
+
+        Returns:
+            List of {row, village_id, village_name, district, state, score}, best first
+        """
+        key = phonetic_key(name)
+        if not key:
+            return []
+        exact = normalize_name(name)
+
+        # Fast path: exact or transliteration-equivalent spelling
+        rows = self._filter(self.by_key.get(key, np.empty(0, dtype=np.int32)), district, state)
+        if len(rows):
+            ranked = sorted(rows, key=lambda r: self.exact_keys[r] != exact)
+            return [self._candidate(r, 1.0 if self.exact_keys[r] == exact else 0.95) for r in ranked[:limit]]
+
+        # Fuzzy path: count shared trigrams, rarest grams first
+        grams = [g for g in trigrams(key) if g in self.postings]
+        if not grams:
+            return []
+        grams.sort(key=lambda g: len(self.postings[g]))
+        selective = [g for g in grams if len(self.postings[g]) <= self.max_posting] or grams[:1]
+        candidates, shared = np.unique(np.concatenate([self.postings[g] for g in selective]), return_counts=True)
+
+        # Recount the common grams only for the surviving candidates
+        for g in grams:
+            if g not in selective:
+                shared = shared + np.isin(candidates, self.postings[g], assume_unique=True)
+
+        if district or state:
+            mask = np.ones(len(candidates), dtype=bool)
+            if district:
+                mask &= self.district_keys[candidates] == normalize_name(district)
+            if state:
+                mask &= self.state_keys[candidates] == normalize_name(state)
+            candidates, shared = candidates[mask], shared[mask]
+        if len(candidates) == 0:
+            return []
+
+        scores = 2.0 * shared / (len(trigrams(key)) + self.key_sizes[candidates])
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [self._candidate(candidates[i], scores[i]) for i in order if scores[i] >= min_score]
+
+    def geometry(self, candidate: Dict[str, Any]):
+        return self.frame.geometry.iloc[candidate['row']]
+
+
+def pick_match(candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    The candidate to use without asking the user.
+
+    Args:
+        candidates: Output of VillageGazetteer.search, best first
+
+    Returns:
+        The top candidate, or None when it is uncertain (low score, or another
+        village in a different place scores nearly as high)
+    """
+    if not candidates or candidates[0]['score'] < AUTO_ACCEPT_SCORE:
+        return None
+    top = candidates[0]
+    place = (normalize_name(top['village_name']), normalize_name(top['district']))
+    for other in candidates[1:]:
+        # Exact spelling (1.0) outranks transliteration-equivalent spellings (0.95)
+        if other['score'] <= top['score'] - MIN_SCORE_MARGIN or other['score'] < top['score'] == 1.0:
+            break
+        # The same name twice in one district cannot be told apart by asking
+        if (normalize_name(other['village_name']), normalize_name(other['district'])) != place:
+            return None
+    return top
+
+
+def clarification(name: str, candidates: List[Dict[str, Any]], district: Optional[str] = None) -> str:
+    """
+    Question for the user when pick_match returns None.
+
+    Distinguishes a name that matches villages in several places from a
+    name with no sufficiently close match.
+    """
+    top = candidates[0]
+    close = [c for c in candidates if c['score'] > top['score'] - MIN_SCORE_MARGIN]
+    if top['score'] >= AUTO_ACCEPT_SCORE and len(close) > 1:
+        if len({normalize_name(c['village_name']) for c in close}) == 1:
+            districts = list(dict.fromkeys(str(c['district']) for c in close))
+            return (f"Clarification needed: '{top['village_name']}' exists in districts "
+                    f"{', '.join(districts)}. Which district did you mean?")
+        options = ", ".join(f"{c['village_name']} ({c['district']})" for c in close)
+        return f"Clarification needed: several villages match '{name}': {options}. Which one did you mean?"
+    options = ", ".join(f"{c['village_name']} ({c['district']})" for c in candidates)
+    return (f"Clarification needed: no close match for village '{name}'"
+            f"{' in ' + district if district else ''}. Did you mean: {options}?")
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer(path: str = VILLAGE_BOUNDARIES_PATH) -> Optional[VillageGazetteer]:
+    """Shared gazetteer, built on first call; None if the village file is missing."""
+    global _gazetteer
+    if _gazetteer is None:
+        if not os.path.exists(path):
+            return None
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = VillageGazetteer.from_file(path)
+    return _gazetteer
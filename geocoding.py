@@ -0,0 +1,192 @@
+"""
+Geocoding for CoreStack Agent System
+- Local-first: village, tehsil and state centroids from the gazetteer / crosswalk
+- Persistent SQLite cache with TTL (misses are cached too, for a shorter time)
+- Shared, rate-limited Nominatim client for anything not resolved locally
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+from tracing import record_cache_hit
+
+GEOCODE_CACHE_DB = os.getenv("GEOCODE_CACHE_DB", "geocode_cache.db")
+GEOCODE_TTL_S = float(os.getenv("GEOCODE_TTL_S", 30 * 24 * 3600))
+GEOCODE_NEGATIVE_TTL_S = float(os.getenv("GEOCODE_NEGATIVE_TTL_S", 24 * 3600))
+
+# Nominatim usage policy: at most 1 request per second
+NOMINATIM_MIN_INTERVAL_S = 1.0
+
+# Gazetteer matches below this score are left to the network geocoder
+LOCAL_VILLAGE_MIN_SCORE = 0.9
+
+
+class RateLimiter:
+    """Blocks callers so that calls are spaced at least min_interval apart."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_allowed - now
+            self._next_allowed = max(now, self._next_allowed) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class GeocodeCache:
+    def __init__(self, db_path: str = GEOCODE_CACHE_DB, ttl: float = GEOCODE_TTL_S,
+                 negative_ttl: float = GEOCODE_NEGATIVE_TTL_S):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                query_key TEXT PRIMARY KEY,
+                latitude REAL,
+                longitude REAL,
+                source TEXT,
+                timestamp REAL
+            )
+            """)
+            self.conn.commit()
+
+    def get(self, query_key: str):
+        """
+        Returns:
+            (hit, coords): hit is False when nothing fresh is cached;
+            coords is None for a cached miss
+        """
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("SELECT latitude, longitude, timestamp FROM geocode_cache WHERE query_key=?", (query_key,))
+            row = c.fetchone()
+        if not row:
+            return False, None
+        lat, lon, ts = row
+        ttl = self.ttl if lat is not None else self.negative_ttl
+        if time.time() - ts > ttl:
+            return False, None
+        return True, (None if lat is None else (lat, lon))
+
+    def put(self, query_key: str, coords: Optional[Tuple[float, float]], source: str):
+        lat, lon = coords if coords else (None, None)
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            INSERT OR REPLACE INTO geocode_cache (query_key, latitude, longitude, source, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+            """, (query_key, lat, lon, source, time.time()))
+            self.conn.commit()
+
+
+def _query_key(location_name: str, location_type: Optional[str], district: Optional[str]) -> str:
+    from crosswalk import name_key
+    return f"{location_type or ''}|{name_key(location_name)}|{name_key(district)}"
+
+
+def local_geocode(location_name: str, location_type: Optional[str] = None,
+                  district: Optional[str] = None) -> Optional[Tuple[float, float]]:
+    """
+    Resolve a place name from local boundary data only.
+
+    Tries the requested location_type first; when unknown, states, then
+    tehsils, then (exact) village names.
+    """
+    from crosswalk import get_crosswalk
+    from gazetteer import get_gazetteer
+
+    if location_type in ("state", "tehsil", "village"):
+        kinds = [location_type]
+    else:
+        kinds = ["state", "tehsil", "village"]
+
+    crosswalk = get_crosswalk()
+    for kind in kinds:
+        if kind == "village":
+            gazetteer = get_gazetteer()
+            if gazetteer is not None:
+                min_score = LOCAL_VILLAGE_MIN_SCORE if location_type == "village" else 1.0
+                candidates = gazetteer.search(location_name, district=district, limit=1, min_score=min_score)
+                if candidates:
+                    point = gazetteer.geometry(candidates[0]).representative_point()
+                    return (point.y, point.x)
+        elif crosswalk is not None:
+            places = crosswalk.find_place(kind, location_name, district if kind == "tehsil" else None)
+            if places:
+                return (places[0]['lat'], places[0]['lon'])
+    return None
+
+
+class Geocoder:
+    """Cache → local boundaries → rate-limited Nominatim."""
+
+    def __init__(self, cache: Optional[GeocodeCache] = None, user_agent: str = "geospatial_agent"):
+        self.cache = cache
+        self.user_agent = user_agent
+        self.rate_limiter = RateLimiter(NOMINATIM_MIN_INTERVAL_S)
+        self._nominatim = None
+        self._lock = threading.Lock()
+
+    def _get_cache(self) -> GeocodeCache:
+        if self.cache is None:
+            with self._lock:
+                if self.cache is None:
+                    self.cache = GeocodeCache()
+        return self.cache
+
+    def _get_nominatim(self):
+        if self._nominatim is None:
+            with self._lock:
+                if self._nominatim is None:
+                    from geopy.geocoders import Nominatim
+                    self._nominatim = Nominatim(user_agent=self.user_agent)
+        return self._nominatim
+
+    def geocode(self, location_name: str, location_type: Optional[str] = None,
+                district: Optional[str] = None) -> Optional[Tuple[float, float]]:
+        cache = self._get_cache()
+        key = _query_key(location_name, location_type, district)
+
+        hit, coords = cache.get(key)
+        if hit:
+            record_cache_hit("geocode")
+            return coords
+
+        try:
+            coords = local_geocode(location_name, location_type, district)
+        except Exception as e:
+            print(f"⚠️  Local geocoding failed: {e}")
+            coords = None
+        if coords:
+            cache.put(key, coords, "local")
+            return coords
+
+        query = f"{location_name}, {district}" if district else location_name
+        try:
+            self.rate_limiter.wait()
+            location = self._get_nominatim().geocode(query)
+        except Exception as e:
+            # Transient network errors are not cached
+            print(f"Geocoding error: {e}")
+            return None
+
+        coords = (location.latitude, location.longitude) if location else None
+        cache.put(key, coords, "nominatim")
+        return coords
+
+
+geocoder = Geocoder()
@@ -0,0 +1,77 @@
+"""
+Graph State for CoreStack Agent System
+- Root state type with a merge reducer, so parallel LangGraph branches can
+  write to the state in the same step (fan-out / fan-in)
+- Branch nodes run on a private copy of the state and return only the keys
+  they changed; the reducer merges those deltas into the shared state
+"""
+
+from typing import Dict, Any, Annotated, Callable, Iterable
+
+# Keys whose dict values are unioned instead of overwritten when branches merge
+UNION_KEYS = ("branch_errors", "branch_artifacts")
+
+
+def merge_state(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reducer for the root graph state.
+
+    Sequential nodes mutate and return the state itself, which is kept as-is.
+    Branch deltas are merged key by key, later writes winning, except for
+    UNION_KEYS whose dicts are combined so every branch's entry survives.
+    """
+    if update is current or update is None:
+        return current
+    merged = dict(current or {})
+    for key, value in update.items():
+        if key in UNION_KEYS and isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = {**merged[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+# StateGraph(GraphState) gives the root channel the merge reducer
+GraphState = Annotated[dict, merge_state]
+
+
+def _private_copy(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Shallow copy, plus one level of nested dicts (e.g. "parsed") that nodes mutate in place."""
+    return {k: (dict(v) if isinstance(v, dict) else v) for k, v in state.items()}
+
+
+def branch_node(name: str, steps: Iterable[Callable], isolate_errors: bool = False):
+    """
+    Build a node that runs `steps` in order on a private copy of the state.
+
+    Args:
+        name: Branch name, used for branch_errors / branch_artifacts entries
+        steps: Node functions run one after the other (each takes and returns state)
+        isolate_errors: If True, an error raised by this branch is recorded under
+            branch_errors[name] instead of "error", so sibling branches still
+            reach the response; the join node decides what is fatal
+
+    Returns:
+        Node function returning only the keys the branch added or changed.
+    """
+    steps = list(steps)
+
+    def run(state: Dict[str, Any]) -> Dict[str, Any]:
+        before = state
+        result = _private_copy(state)
+        for step in steps:
+            result = step(result)
+
+        delta = {k: v for k, v in result.items() if k not in before or before[k] is not v}
+        # Nested dicts were copied, so only report them when their content changed
+        delta = {k: v for k, v in delta.items() if not (isinstance(v, dict) and v == before.get(k))}
+
+        if "artifact_id" in delta:
+            # Each branch has its own lineage; the join node links them back together
+            delta["branch_artifacts"] = {name: delta.pop("artifact_id")}
+        if isolate_errors and "error" in delta:
+            delta["branch_errors"] = {name: delta.pop("error")}
+        return delta
+
+    run.__name__ = f"{name}_branch"
+    return run
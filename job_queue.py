@@ -0,0 +1,311 @@
+"""
+Job Queue for CoreStack Agent System
+- Queries run as background jobs on a bounded worker pool, not on the
+  Streamlit script thread, so reruns (any widget interaction) don't drop them
+- Jobs, their progress lines and partial LLM output live in SQLite; the UI
+  polls by job id
+- The same query submitted while a job for it is queued/running (or finished
+  less than JOB_RESULT_TTL_S ago) gets that job's id instead of a new job,
+  across sessions; failed jobs (raised, or returned an error) are retried
+- Finished jobs and their progress lines are deleted after JOB_RESULT_TTL_S
+- Each queue instance owns the jobs it runs and heartbeats them; jobs whose
+  owner stopped heartbeating (dead process) are taken over by a live queue.
+  A job is claimed with a conditional UPDATE, so it runs exactly once even
+  with several processes on one database
+"""
+
+import os
+import re
+import time
+import uuid
+import socket
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+
+JOB_DB = os.getenv("JOB_DB", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_RESULT_TTL_S = float(os.getenv("JOB_RESULT_TTL_S", 600))
+# Partial LLM output is written at most this often while tokens stream in
+PARTIAL_FLUSH_S = 0.25
+# Owners refresh their jobs' heartbeat this often; a job whose heartbeat is
+# older than JOB_STALE_S belongs to a dead process and is taken over
+JOB_HEARTBEAT_S = float(os.getenv("JOB_HEARTBEAT_S", 5))
+JOB_STALE_S = float(os.getenv("JOB_STALE_S", 30))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_compiled_app = None
+
+
+def job_key(query: str) -> str:
+    """Dedup key: the query lowercased with whitespace collapsed."""
+    normalized = re.sub(r"\s+", " ", query.strip().lower())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def run_agent_job(query: str, emit: Callable[[str, Any], None]) -> Dict[str, Any]:
+    """
+    Default job runner: the LangGraph agent in streaming mode.
+
+    Args:
+        query: User query
+        emit: emit("node", {"node", "lines"}) / emit("token", text) progress callback
+
+    Returns:
+        {'response': str, 'error': str or None}
+    """
+    from langgraph_agent import stream_agent, graph
+
+    global _compiled_app
+    if _compiled_app is None:
+        _compiled_app = graph.compile()
+
+    result_state = {}
+    for kind, payload in stream_agent(query, app=_compiled_app, span_name="job"):
+        if kind == "done":
+            result_state = payload
+        else:
+            emit(kind, payload)
+    return {
+        'response': result_state.get("response", "No response generated"),
+        'error': result_state.get("error")
+    }
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue with a bounded worker pool.
+
+    Args:
+        db_path: SQLite file (shared by every session of the app process)
+        workers: Maximum number of jobs running at once
+        runner: runner(query, emit) -> {'response', 'error'}
+    """
+
+    def __init__(self, db_path: str = JOB_DB, workers: int = JOB_WORKERS,
+                 runner: Callable[[str, Callable], Dict[str, Any]] = run_agent_job):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.runner = runner
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._stop = threading.Event()
+        self._init_db()
+        self._recover()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def _init_db(self):
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                job_key TEXT,
+                query TEXT,
+                status TEXT,
+                created REAL,
+                started REAL,
+                finished REAL,
+                response TEXT,
+                error TEXT,
+                partial TEXT DEFAULT ''
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT,
+                seq INTEGER,
+                created REAL,
+                node TEXT,
+                line TEXT,
+                PRIMARY KEY (job_id, seq)
+            )
+            """)
+            # Migrate databases created before jobs had owners
+            columns = {row[1] for row in c.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                c.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "heartbeat" not in columns:
+                c.execute("ALTER TABLE jobs ADD COLUMN heartbeat REAL")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(job_key, status)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished)")
+            self.conn.commit()
+
+    def _recover(self):
+        """Take over unfinished jobs whose owner stopped heartbeating."""
+        stale = time.time() - JOB_STALE_S
+        taken = []
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            SELECT job_id FROM jobs WHERE status IN (?, ?) AND IFNULL(heartbeat, 0) < ? ORDER BY created
+            """, (*ACTIVE_STATUSES, stale))
+            for (job_id,) in c.fetchall():
+                # Conditional: another live queue may take the same job at the same time
+                c.execute("""
+                UPDATE jobs SET status='queued', owner=?, heartbeat=?, started=NULL, partial=''
+                WHERE job_id=? AND status IN (?, ?) AND IFNULL(heartbeat, 0) < ?
+                """, (self.owner, time.time(), job_id, *ACTIVE_STATUSES, stale))
+                if c.rowcount == 1:
+                    c.execute("DELETE FROM job_events WHERE job_id=?", (job_id,))
+                    taken.append(job_id)
+            self.conn.commit()
+        if taken:
+            print(f"♻️  Requeued {len(taken)} job(s) left by a stopped process")
+        for job_id in taken:
+            self._executor.submit(self._run, job_id)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(JOB_HEARTBEAT_S):
+            try:
+                self._execute("UPDATE jobs SET heartbeat=? WHERE owner=? AND status IN (?, ?)",
+                              (time.time(), self.owner, *ACTIVE_STATUSES))
+                self._recover()
+                self._prune()
+            except Exception as e:
+                print(f"⚠️  Job heartbeat failed: {e}")
+
+    def _prune(self):
+        """Delete finished jobs (and their progress lines) older than JOB_RESULT_TTL_S."""
+        cutoff = time.time() - JOB_RESULT_TTL_S
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            DELETE FROM job_events WHERE job_id IN
+                (SELECT job_id FROM jobs WHERE status IN ('done', 'failed') AND finished < ?)
+            """, (cutoff,))
+            c.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished < ?", (cutoff,))
+            self.conn.commit()
+
+    def submit(self, query: str) -> str:
+        """
+        Queue a query, or join an existing job for the same query.
+
+        Returns:
+            Job id
+        """
+        key = job_key(query)
+        now = time.time()
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            SELECT job_id FROM jobs
+            WHERE job_key=? AND (status IN (?, ?) OR (status='done' AND finished > ?))
+            ORDER BY created DESC LIMIT 1
+            """, (key, *ACTIVE_STATUSES, now - JOB_RESULT_TTL_S))
+            row = c.fetchone()
+            if row:
+                print(f"🔗 Joining existing job {row[0]}")
+                return row[0]
+            job_id = uuid.uuid4().hex[:12]
+            c.execute("""
+            INSERT INTO jobs (job_id, job_key, query, status, created, owner, heartbeat)
+            VALUES (?, ?, ?, 'queued', ?, ?, ?)
+            """, (job_id, key, query, now, self.owner, now))
+            self.conn.commit()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job record: job_id, query, status, created/started/finished, response, error, partial."""
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            SELECT job_id, query, status, created, started, finished, response, error, partial
+            FROM jobs WHERE job_id=?
+            """, (job_id,))
+            row = c.fetchone()
+        if row is None:
+            return None
+        keys = ("job_id", "query", "status", "created", "started", "finished", "response", "error", "partial")
+        return dict(zip(keys, row))
+
+    def events(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """Progress lines of a job with seq > after_seq, in order."""
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("SELECT seq, node, line FROM job_events WHERE job_id=? AND seq>? ORDER BY seq",
+                      (job_id, after_seq))
+            rows = c.fetchall()
+        return [{"seq": seq, "node": node, "line": line} for seq, node, line in rows]
+
+    def position(self, job_id: str) -> int:
+        """Number of queued jobs submitted before this one (0 when running or done)."""
+        with self._lock:
+            c = self.conn.cursor()
+            c.execute("""
+            SELECT COUNT(*) FROM jobs
+            WHERE status='queued' AND created < (SELECT created FROM jobs WHERE job_id=? AND status='queued')
+            """, (job_id,))
+            return c.fetchone()[0]
+
+    def _execute(self, sql: str, params: tuple) -> int:
+        with self._lock:
+            rowcount = self.conn.execute(sql, params).rowcount
+            self.conn.commit()
+        return rowcount
+
+    def _run(self, job_id: str):
+        # Atomic claim: only the owner runs a job, and only once
+        now = time.time()
+        claimed = self._execute("""
+        UPDATE jobs SET status='running', started=?, heartbeat=?
+        WHERE job_id=? AND status='queued' AND owner=?
+        """, (now, now, job_id, self.owner))
+        if claimed != 1:
+            return
+        job = self.get(job_id)
+
+        seq = 0
+        partial = []
+        last_flush = 0.0
+
+        def emit(kind: str, payload: Any):
+            nonlocal seq, last_flush
+            if kind == "node":
+                lines = payload["lines"] or [f"✔️ {payload['node']}"]
+                for line in lines:
+                    seq += 1
+                    self._execute("INSERT INTO job_events (job_id, seq, created, node, line) VALUES (?, ?, ?, ?, ?)",
+                                  (job_id, seq, time.time(), payload["node"], line))
+            elif kind == "token":
+                partial.append(payload)
+                if time.time() - last_flush >= PARTIAL_FLUSH_S:
+                    last_flush = time.time()
+                    self._execute("UPDATE jobs SET partial=? WHERE job_id=?", ("".join(partial), job_id))
+
+        # Results are only written while this queue still owns the job. A
+        # returned error is stored as failed, so the next identical query retries
+        try:
+            result = self.runner(job["query"], emit)
+            status = "failed" if result.get("error") else "done"
+            self._execute("""
+            UPDATE jobs SET status=?, finished=?, response=?, error=?, partial=? WHERE job_id=? AND owner=?
+            """, (status, time.time(), result.get("response"), result.get("error"), "".join(partial),
+                  job_id, self.owner))
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {e}")
+            self._execute("UPDATE jobs SET status='failed', finished=?, error=? WHERE job_id=? AND owner=?",
+                          (time.time(), f"{type(e).__name__}: {e}", job_id, self.owner))
+
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide queue, shared by every Streamlit session."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
@@ -29,41 +29,30 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import StateGraph
 from dotenv import load_dotenv
 
-from artifact import ArtifactRegistry
-from geospatial_artifact_registry import GeospatialArtifactRegistry
+from artifact import ArtifactRegistry, LazyRegistry
+from node_cache import cached_node, API_FETCH_TTL_S, LLM_TTL_S, COMPUTE_TTL_S
+from tracing import span, traced_node
+from graph_state import GraphState, branch_node, merge_state
 from geospatial_handlers import GeospatialDataHandler
 
-# Initialize both registries for backward compatibility and new features
-artifact_registry = ArtifactRegistry()  # Legacy registry
-geo_artifact_registry = GeospatialArtifactRegistry()  # New geospatial registry
-import os
-DISABLE_REGISTRY = os.getenv('DISABLE_ARTIFACT_REGISTRY') == '1'
 
-if DISABLE_REGISTRY:
-    # Create dummy registries that do nothing
-    class DummyRegistry:
-        def register(self, *args, **kwargs):
-            return "dummy_id"
-        def get(self, *args, **kwargs):
-            return {}
-        def get_stats(self, *args, **kwargs):
-            return {"total_artifacts": 0, "by_type": {}}
-        def register_geospatial_artifact(self, *args, **kwargs):
-            return "dummy_id"
-        def get_processing_lineage(self, *args, **kwargs):
-            return []
-    
-    artifact_registry = DummyRegistry()
-    geo_artifact_registry = DummyRegistry()
-else:
-    artifact_registry = ArtifactRegistry()
-    geo_artifact_registry = GeospatialArtifactRegistry()
-    
+def _build_geo_artifact_registry():
+    from geospatial_artifact_registry import GeospatialArtifactRegistry
+    return GeospatialArtifactRegistry()
+
+
+# Both registries are opened on first use, once per process; when tracking is
+# disabled (artifact.set_registry_enabled(False) or DISABLE_ARTIFACT_REGISTRY=1)
+# calls go to a no-op backend and no database is opened.
+artifact_registry = LazyRegistry(ArtifactRegistry)  # Legacy registry
+geo_artifact_registry = LazyRegistry(_build_geo_artifact_registry)  # New geospatial registry
+
 load_dotenv()
 # Initialising API keys
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 CORE_STACK_API_KEY = os.getenv("CORE_STACK_API_KEY")
 print("CORE_STACK_API_KEY is:", CORE_STACK_API_KEY)
+CORESTACK_BASE_URL = "https://geoserver.core-stack.org/api/v1/"
 
 class SpatialDataProcessor:
     """Handles raster and vector spatial data processing"""
@@ -460,6 +449,30 @@ def validate(state: Dict[str, Any]) -> Dict[str, Any]:
     state["artifact_id"] = artifact_id
     return state
 
+def request_mws_info(latitude: float, longitude: float) -> requests.Response:
+    """CoreStack get_mwsid_by_latlon: watershed UID and State/District/Tehsil of a point."""
+    return requests.get(f"{CORESTACK_BASE_URL}get_mwsid_by_latlon/",
+                        params={"latitude": latitude, "longitude": longitude},
+                        headers={"X-API-Key": CORE_STACK_API_KEY})
+
+def request_mws_data(mws_info: Dict[str, Any]) -> requests.Response:
+    """CoreStack get_mws_data for the watershed described by a get_mwsid_by_latlon response."""
+    params_mws_data = {
+        'state': mws_info.get('State'), 
+        'district': mws_info.get('District'),
+        'tehsil': mws_info.get('Tehsil'), 
+        'mws_id': mws_info.get('uid')
+    }
+    return requests.get(f"{CORESTACK_BASE_URL}get_mws_data/", params=params_mws_data,
+                        headers={"X-API-Key": CORE_STACK_API_KEY})
+
+@cached_node(
+    "fetch_mws_data",
+    inputs=["parsed.uid", "parsed.latitude", "parsed.longitude"],
+    outputs=["mws_json", "parsed.uid"],
+    ttl=API_FETCH_TTL_S,
+    registry=artifact_registry
+)
 def fetch_mws_data(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Fetches MWS data from the CoreStack API using either UID or lat/long coordinates.
@@ -467,7 +480,6 @@ def fetch_mws_data(state: Dict[str, Any]) -> Dict[str, Any]:
     if "error" in state:
         return state
     
-    base_url = "https://geoserver.core-stack.org/api/v1/"
     headers = {"X-API-Key": CORE_STACK_API_KEY}
     
     # Get UID and coordinates from parsed data
@@ -485,10 +497,9 @@ def fetch_mws_data(state: Dict[str, Any]) -> Dict[str, Any]:
         return state
     elif (latitude and longitude) and not uid:
         # Coordinates provided but no UID - get UID from coordinates
-        params_latlon = {"latitude": latitude, "longitude": longitude}
         print("CORE_STACK_API_KEY:", CORE_STACK_API_KEY)
         print("Headers being sent:", headers)
-        response_mwsid = requests.get(f"{base_url}get_mwsid_by_latlon/", params=params_latlon, headers=headers)
+        response_mwsid = request_mws_info(latitude, longitude)
         
         if response_mwsid.status_code != 200:
             state["error"] = f"Could not get UID from coordinates: {response_mwsid.text}"
@@ -501,8 +512,7 @@ def fetch_mws_data(state: Dict[str, Any]) -> Dict[str, Any]:
             uid = mws_info.get('uid')
     elif uid and latitude and longitude:
         # Both provided - use coordinates to get location info
-        params_latlon = {"latitude": latitude, "longitude": longitude}
-        response_mwsid = requests.get(f"{base_url}get_mwsid_by_latlon/", params=params_latlon, headers=headers)
+        response_mwsid = request_mws_info(latitude, longitude)
         
         if response_mwsid.status_code != 200:
             state["error"] = f"Could not get location info: {response_mwsid.text}"
@@ -519,14 +529,7 @@ def fetch_mws_data(state: Dict[str, Any]) -> Dict[str, Any]:
         state["parsed"]["uid"] = mws_info.get('uid')
     
     # Step 2: Get full data using location parameters
-    params_mws_data = {
-        'state': mws_info.get('State'), 
-        'district': mws_info.get('District'),
-        'tehsil': mws_info.get('Tehsil'), 
-        'mws_id': mws_info.get('uid')
-    }
-    
-    response = requests.get(f"{base_url}get_mws_data/", params=params_mws_data, headers=headers)
+    response = request_mws_data(mws_info)
     
     print(f"API Response Status: {response.status_code}")
     if response.status_code != 200:
@@ -552,6 +555,71 @@ def fetch_mws_data(state: Dict[str, Any]) -> Dict[str, Any]:
     state["mws_json"] = mws_json
     return state
 
+def extract_timeseries(mws_json: Dict[str, Any], data_block: str, key_prefix: str):
+    """
+    Yearly rows of one metric from an MWS response.
+    
+    Args:
+        mws_json: get_mws_data response
+        data_block: Block holding the metric (e.g. 'hydrological_annual')
+        key_prefix: Field prefix before the year (e.g. 'precipitation_in_mm_')
+    
+    Returns:
+        ([{'year', 'value', 'source'}], key_prefix that matched; common
+        variations of the prefix are tried when the exact one finds nothing)
+    """
+    rows = []
+    block_data = mws_json.get(data_block, [{}])[0]
+    
+    for k, v in block_data.items():
+        if isinstance(v, (int, float)) and k.startswith(key_prefix):
+            # Extract year from pattern like 'prefix_2017-2018'
+            year = k.replace(key_prefix, '')
+            if year.count("-") == 1:  # Validate year format
+                rows.append({
+                    "year": year,
+                    "value": v,
+                    "source": f"{data_block}.{k}"
+                })
+    
+    if not rows:
+        # Fallback - if LLM suggestion didn't yield data, try some common variations of the key prefix
+        print(f"No data found with exact prefix. Trying variations of {key_prefix}")
+        
+        # Try variations like removing underscores, adding/removing "_in_", etc.
+        variations = [
+            key_prefix,
+            key_prefix.replace("_", ""),
+            re.sub(r'_in_[a-z]+_$', "_", key_prefix),
+            re.sub(r'_$', "", key_prefix),
+            key_prefix + "_"
+        ]
+        
+        for variation in variations:
+            for k, v in block_data.items():
+                if isinstance(v, (int, float)) and k.startswith(variation):
+                    # Extract year from pattern
+                    year = k.replace(variation, '')
+                    if year.count("-") == 1:  # Validate year format
+                        rows.append({
+                            "year": year,
+                            "value": v,
+                            "source": f"{data_block}.{k}"
+                        })
+            
+            if rows:
+                key_prefix = variation
+                break
+    
+    return rows, key_prefix
+
+@cached_node(
+    "normalize_data",
+    inputs=["mws_json", "parsed.metric_text"],
+    outputs=["timeseries", "metric_block", "metric_key_prefix", "geo_artifact_id"],
+    ttl=LLM_TTL_S,
+    registry=artifact_registry
+)
 def normalize_data(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     LLM-powered normalizer that intelligently maps metrics to appropriate data blocks and fields.
@@ -645,48 +713,7 @@ def normalize_data(state: Dict[str, Any]) -> Dict[str, Any]:
         print(f"LLM selected data block: {data_block}, key prefix: {key_prefix}")
         
         # Extract timeseries data using the LLM-identified block and prefix
-        rows = []
-        block_data = mws_json.get(data_block, [{}])[0]
-        
-        for k, v in block_data.items():
-            if isinstance(v, (int, float)) and k.startswith(key_prefix):
-                # Extract year from pattern like 'prefix_2017-2018'
-                year = k.replace(key_prefix, '')
-                if year.count("-") == 1:  # Validate year format
-                    rows.append({
-                        "year": year,
-                        "value": v,
-                        "source": f"{data_block}.{k}"
-                    })
-        
-        if not rows:
-            # Fallback - if LLM suggestion didn't yield data, try some common variations of the key prefix
-            print(f"No data found with exact prefix. Trying variations of {key_prefix}")
-            
-            # Try variations like removing underscores, adding/removing "_in_", etc.
-            variations = [
-                key_prefix,
-                key_prefix.replace("_", ""),
-                re.sub(r'_in_[a-z]+_$', "_", key_prefix),
-                re.sub(r'_$', "", key_prefix),
-                key_prefix + "_"
-            ]
-            
-            for variation in variations:
-                for k, v in block_data.items():
-                    if isinstance(v, (int, float)) and k.startswith(variation):
-                        # Extract year from pattern
-                        year = k.replace(variation, '')
-                        if year.count("-") == 1:  # Validate year format
-                            rows.append({
-                                "year": year,
-                                "value": v,
-                                "source": f"{data_block}.{k}"
-                            })
-                
-                if rows:
-                    key_prefix = variation
-                    break
+        rows, key_prefix = extract_timeseries(mws_json, data_block, key_prefix)
         
         if not rows:
             state["error"] = f"Could not find time series data for metric: {metric_text}"
@@ -736,6 +763,13 @@ def normalize_data(state: Dict[str, Any]) -> Dict[str, Any]:
         state["artifact_id"] = artifact_id
         return state
 
+@cached_node(
+    "compute_stats",
+    inputs=["timeseries", "parsed.start_year", "parsed.end_year"],
+    outputs=["stats"],
+    ttl=COMPUTE_TTL_S,
+    registry=artifact_registry
+)
 def compute_timeseries_stats(state: Dict[str, Any]) -> Dict[str, Any]:
     if "error" in state:
         return state
@@ -806,6 +840,44 @@ def compute_timeseries_stats(state: Dict[str, Any]) -> Dict[str, Any]:
     state["artifact_id"] = artifact_id
     return state
 
+def summarize_timeseries_stats(state: Dict[str, Any]) -> str:
+    """One-paragraph summary of compute_timeseries_stats output (or its error)."""
+    parsed = state["parsed"]
+    stats = state["stats"]
+    uid = parsed.get("uid")
+    requested_start_year = parsed.get("start_year")
+    requested_end_year = parsed.get("end_year")
+    metric_text = parsed.get("metric_text", "value")
+    
+    # Get actual years used for analysis (may differ from requested if not available)
+    actual_start_year = stats.get("actual_start_year", requested_start_year)
+    actual_end_year = stats.get("actual_end_year", requested_end_year)
+    
+    # Get location identifier (either UID or coordinates)
+    if uid:
+        location_str = f"UID {uid}"
+    else:
+        lat = parsed.get("latitude")
+        lon = parsed.get("longitude")
+        location_str = f"Location ({lat:.5f}, {lon:.5f})" if lat and lon else "Unknown location"
+    
+    if "error" in stats:
+        return stats["error"]
+    else:
+        # Note if we had to use different years than requested
+        year_note = ""
+        if (requested_start_year and requested_end_year and 
+            (actual_start_year != requested_start_year or actual_end_year != requested_end_year)):
+            year_note = f" (Note: Used available years {actual_start_year} to {actual_end_year})"
+        
+        return (
+            f"{location_str} — {metric_text.title()} changed from {stats['start_val']} ({actual_start_year}) "
+            f"to a peak of {stats['peak_value']} ({stats['peak_year']}) and is {stats['end_val']} in {actual_end_year}. "
+            f"Net change {actual_start_year}→{actual_end_year} ≈ {stats['percent_change']}%.{year_note} "
+            f"Data sources: {', '.join(stats['sources'])}."
+        )
+
+
 def format_response(state: Dict[str, Any]) -> Dict[str, Any]:
     """Enhanced response formatter for all data types: timeseries, raster, and vector"""
     # Debug the state structure
@@ -916,6 +988,12 @@ def format_response(state: Dict[str, Any]) -> Dict[str, Any]:
             
             state["response"] = "\n".join(response_parts)
         
+        # Queries that needed both data types also ran the timeseries branch
+        if "stats" in state:
+            state["response"] += "\n\n📈 Timeseries: " + summarize_timeseries_stats(state)
+        for branch, error in state.get("branch_errors", {}).items():
+            state["response"] += f"\n\n⚠️ {branch.title()} data unavailable: {error}"
+        
         # Register artifact
         artifact_content = {"response": state.get("response")}
         artifact_id = artifact_registry.register(
@@ -927,39 +1005,9 @@ def format_response(state: Dict[str, Any]) -> Dict[str, Any]:
         
     elif "stats" in state:
         # Timeseries analysis response (existing logic)
-        stats = state["stats"]
-        uid = parsed.get("uid")
-        requested_start_year = parsed.get("start_year")
-        requested_end_year = parsed.get("end_year")
-        metric_text = parsed.get("metric_text", "value")
-        
-        # Get actual years used for analysis (may differ from requested if not available)
-        actual_start_year = stats.get("actual_start_year", requested_start_year)
-        actual_end_year = stats.get("actual_end_year", requested_end_year)
-        
-        # Get location identifier (either UID or coordinates)
-        if uid:
-            location_str = f"UID {uid}"
-        else:
-            lat = parsed.get("latitude")
-            lon = parsed.get("longitude")
-            location_str = f"Location ({lat:.5f}, {lon:.5f})" if lat and lon else "Unknown location"
-        
-        if "error" in stats:
-            state["response"] = stats["error"]
-        else:
-            # Note if we had to use different years than requested
-            year_note = ""
-            if (requested_start_year and requested_end_year and 
-                (actual_start_year != requested_start_year or actual_end_year != requested_end_year)):
-                year_note = f" (Note: Used available years {actual_start_year} to {actual_end_year})"
-            
-            state["response"] = (
-                f"{location_str} — {metric_text.title()} changed from {stats['start_val']} ({actual_start_year}) "
-                f"to a peak of {stats['peak_value']} ({stats['peak_year']}) and is {stats['end_val']} in {actual_end_year}. "
-                f"Net change {actual_start_year}→{actual_end_year} ≈ {stats['percent_change']}%.{year_note} "
-                f"Data sources: {', '.join(stats['sources'])}."
-            )
+        state["response"] = summarize_timeseries_stats(state)
+        for branch, error in state.get("branch_errors", {}).items():
+            state["response"] += f"\n\n⚠️ {branch.title()} data unavailable: {error}"
         
         # Register artifact
         artifact_content = {"response": state.get("response")}
@@ -1266,7 +1314,10 @@ def router(state: Dict[str, Any]) -> Dict[str, Any]:
     
     if data_type_needed == "timeseries":
         state["router"] = "fetch_timeseries"
-    elif data_type_needed in ["vector", "raster", "both"]:
+    elif data_type_needed == "both":
+        # Timeseries and spatial branches run in parallel and join before format
+        state["router"] = "both"
+    elif data_type_needed in ["vector", "raster"]:
         state["router"] = "fetch_spatial"
     else:
         # Default to timeseries for backward compatibility
@@ -1275,31 +1326,74 @@ def router(state: Dict[str, Any]) -> Dict[str, Any]:
     print(f"Router decision: {state['router']} (data_type_needed: {data_type_needed})")
     return state
 
+def route_after_router(state: Dict[str, Any]):
+    """Next node(s) after the router; 'both' fans out to the two parallel branches."""
+    if state["router"] == "both":
+        return ["timeseries_branch", "spatial_branch"]
+    return state["router"]
+
+def join_branches(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fan-in for parallel branches: fails only if every branch failed, and
+    records one artifact linking both branch lineages.
+    """
+    branch_errors = state.get("branch_errors", {})
+    branch_artifacts = state.get("branch_artifacts", {})
+    
+    if branch_errors and len(branch_errors) >= 2:
+        state["error"] = "; ".join(f"{branch}: {error}" for branch, error in branch_errors.items())
+    
+    # Continue the lineage from the spatial branch (or whichever branch has one)
+    parent_id = branch_artifacts.get("spatial") or branch_artifacts.get("timeseries") or state.get("artifact_id")
+    state["artifact_id"] = artifact_registry.register(
+        "join_branches",
+        {"branch_artifacts": branch_artifacts, "branch_errors": branch_errors},
+        parent_id=parent_id
+    )
+    return state
+
 # --- Enhanced LangGraph StateGraph wiring ---
-graph = StateGraph(dict)
+# GraphState merges writes from parallel branches (see graph_state.py)
+graph = StateGraph(GraphState)
+
+fetch_timeseries_node = traced_node("fetch_timeseries", fetch_mws_data)
+normalize_node = traced_node("normalize", normalize_data)
+compute_node = traced_node("compute", compute_timeseries_stats)
+fetch_spatial_node = traced_node("fetch_spatial", fetch_spatial_layers)
+analyze_spatial_node = traced_node("analyze_spatial", analyze_spatial_data)
 
 # Add all nodes
-graph.add_node("intent", llm_intent_parser)
-graph.add_node("validate", validate)
-graph.add_node("router", router)
-graph.add_node("fetch_timeseries", fetch_mws_data)  
-graph.add_node("fetch_spatial", fetch_spatial_layers)  
-graph.add_node("analyze_spatial", analyze_spatial_data)  
-graph.add_node("normalize", normalize_data)
-graph.add_node("compute", compute_timeseries_stats)
-graph.add_node("format", format_response)
+graph.add_node("intent", traced_node("intent", llm_intent_parser))
+graph.add_node("validate", traced_node("validate", validate))
+graph.add_node("router", traced_node("router", router))
+graph.add_node("fetch_timeseries", fetch_timeseries_node)
+graph.add_node("fetch_spatial", fetch_spatial_node)
+graph.add_node("analyze_spatial", analyze_spatial_node)
+graph.add_node("normalize", normalize_node)
+graph.add_node("compute", compute_node)
+graph.add_node("format", traced_node("format", format_response))
+
+# Parallel branches for queries needing both data types; each runs its
+# whole path on a private copy of the state so their writes don't collide
+graph.add_node("timeseries_branch", traced_node("timeseries_branch", branch_node(
+    "timeseries", [fetch_timeseries_node, normalize_node, compute_node], isolate_errors=True)))
+graph.add_node("spatial_branch", traced_node("spatial_branch", branch_node(
+    "spatial", [fetch_spatial_node, analyze_spatial_node], isolate_errors=True)))
+graph.add_node("join", traced_node("join", join_branches))
 
 # Add edges with conditional routing
 graph.add_edge("intent", "validate")
 graph.add_edge("validate", "router")
 
-# Router decides between timeseries and spatial paths
+# Router decides between timeseries, spatial, or both in parallel
 graph.add_conditional_edges(
     "router",
-    lambda x: x["router"],
+    route_after_router,
     {
         "fetch_timeseries": "fetch_timeseries",
         "fetch_spatial": "fetch_spatial",
+        "timeseries_branch": "timeseries_branch",
+        "spatial_branch": "spatial_branch",
         "format": "format"
     }
 )
@@ -1313,14 +1407,122 @@ graph.add_edge("compute", "format")
 graph.add_edge("fetch_spatial", "analyze_spatial")
 graph.add_edge("analyze_spatial", "format")
 
+# Both: join waits for both branches, so latency is the slower branch, not the sum
+graph.add_edge(["timeseries_branch", "spatial_branch"], "join")
+graph.add_edge("join", "format")
+
 graph.set_entry_point("intent")
 graph.set_finish_point("format")
 
+# --- Example queries (also replayed offline by benchmarks/offline_suite.py) ---
+TEST_QUERIES = [
+    # Timeseries queries 
+    "How did cropping intensity change from 2017 to 2023 at latitude 25.31698754297551, longitude 75.09702609349773?",
+    "What was the precipitation trend from 2017 to 2023 at latitude 25.31698754297551, longitude 75.09702609349773?",
+    "Show me groundwater depletion rates between 2018-2022 near coordinates 25.317, 75.097",
+    
+    # Vector data queries 
+    "How many water bodies are within 1km of coordinates 25.31698754297551, 75.09702609349773?",
+    #"What's the total agricultural area around uid 12_75340?",
+    "Analyze drainage network density near latitude 25.31, longitude 75.09",
+    "Count the number of SOGE features within 3km of my location at 25.317, 75.097",
+    
+    # Raster data queries 
+    "What's the average vegetation index around latitude 25.31, longitude 75.09?",
+    "Analyze elevation patterns within 2km of uid 12_75340",
+    "What are the slope statistics for the watershed at coordinates 25.317, 75.097?",
+    "Show me NDVI distribution in a 5km radius of latitude 25.31, longitude 75.09",
+    
+    # Advanced spatial queries 
+    "What are the terrain characteristics near coordinates 25.31698754297551, 75.09702609349773?",
+    "Analyze land use distribution around uid 12_75340",
+    "Show aquifer characteristics within 1km of latitude 25.31, longitude 75.09"
+]
+
+# --- Streaming runner (Streamlit UI) ---
+# Nodes that stream LLM tokens to the UI; other nodes' LLM calls (intent
+# parsing, block selection) are internal and only show up as node progress
+STREAMED_LLM_NODES = ("format",)
+
+def describe_progress(changed: Dict[str, Any], state: Dict[str, Any]) -> List[str]:
+    """
+    Human-readable lines for the state keys a node just produced.
+    
+    Args:
+        changed: Keys the node added or replaced
+        state: Accumulated state after the node
+    """
+    lines = []
+    if "error" in changed:
+        lines.append(f"❌ {changed['error']}")
+    if "parsed" in changed:
+        parsed = changed["parsed"]
+        where = f"UID {parsed['uid']}" if parsed.get("uid") else f"({parsed.get('latitude')}, {parsed.get('longitude')})"
+        years = f", {parsed['start_year']}→{parsed['end_year']}" if parsed.get("start_year") else ""
+        lines.append(f"🧠 {parsed.get('metric_text', 'query')} at {where}{years} "
+                     f"[{parsed.get('data_type_needed', 'timeseries')}]")
+    if "router" in changed:
+        lines.append(f"🔀 Route: {changed['router']}")
+    if "location_info" in changed:
+        info = changed["location_info"]
+        parts = [info.get(k) or info.get(k.lower()) for k in ("Tehsil", "District", "State")]
+        lines.append("📍 Location: " + ", ".join(p for p in parts if p) +
+                     (f" (MWS {info['uid']})" if info.get("uid") else ""))
+    if "mws_json" in changed:
+        lines.append("💧 Watershed data fetched")
+    if "timeseries" in changed:
+        lines.append(f"📈 {len(changed['timeseries'])} timeseries points ({state.get('metric_block', 'metric')})")
+    if "available_layers" in changed:
+        layers = changed["available_layers"]
+        lines.append(f"🗂️ {len(layers.get('vector', []))} vector and {len(layers.get('raster', []))} raster layers")
+    if "stats" in changed and "parsed" in state:
+        lines.append("📊 " + summarize_timeseries_stats(state))
+    if "spatial_analysis_results" in changed:
+        lines.append(f"🔬 Analyzed {len(changed['spatial_analysis_results'])} layers")
+    for branch, error in changed.get("branch_errors", {}).items():
+        lines.append(f"⚠️ {branch.title()} branch failed: {error}")
+    return lines
+
+def stream_agent(user_query: str, app=None, span_name: str = "stream_agent"):
+    """
+    Run the graph in streaming mode.
+    
+    Args:
+        user_query: Natural language query
+        app: Compiled graph (compiled here if not given)
+        span_name: Name of the enclosing trace span
+    
+    Yields:
+        ("node", {"node": name, "lines": [...]}) as each node completes,
+        ("token", text) for LLM output of STREAMED_LLM_NODES as it is generated,
+        ("done", final_state) once the graph has finished
+    """
+    app = app or graph.compile()
+    state = {"user_query": user_query}
+    with span(span_name, pipeline="langgraph_agent"):
+        # Nodes mutate their input in place; keep `state` as our own snapshot
+        for mode, chunk in app.stream(dict(state), stream_mode=["updates", "messages"]):
+            if mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") in STREAMED_LLM_NODES and isinstance(message.content, str):
+                    yield "token", message.content
+                continue
+            
+            for node, update in chunk.items():
+                if not update:
+                    continue
+                # Sequential nodes return the whole state: report only the keys they replaced
+                changed = {k: v for k, v in update.items() if state.get(k) is not v}
+                state = merge_state(state, update)
+                yield "node", {"node": node, "lines": describe_progress(changed, state)}
+    yield "done", state
+
 # --- Main MVP agent runner ---
 def run_agent(user_query: str):
     state = {"user_query": user_query}
     app = graph.compile()
-    result_state = app.invoke(state)
+    with span("run_agent", pipeline="langgraph_agent"):
+        result_state = app.invoke(state)
     print("\n--- Final Agent Response ---\n")
     print(result_state["response"])
     
@@ -1330,21 +1532,13 @@ def run_agent(user_query: str):
     
     if artifact_id:
         print("\n--- Legacy Artifact Lineage ---")
-        lineage = []
-        current_id = artifact_id
-        
-        # Build lineage chain backwards
-        while current_id:
-            artifact = artifact_registry.get(current_id)
-            if not artifact:
-                break
-            lineage.append(artifact)
-            current_id = artifact["parent_id"]
-        
-        # Print lineage in chronological order (oldest to newest)
-        for i, artifact in enumerate(reversed(lineage)):
+        # Single query, metadata only; content stays in the registry
+        lineage = artifact_registry.get_lineage(artifact_id)
+
+        # Lineage is returned in chronological order (oldest to newest)
+        for i, artifact in enumerate(lineage):
             print(f"\n{i+1}. Artifact: {artifact['type']} | ID: {artifact['id']}")
-            print(f"   Content keys: {list(artifact['content'].keys()) if isinstance(artifact['content'], dict) else 'Non-dict content'}")
+            print(f"   Content size: {artifact['content_size']} bytes")
             if artifact.get('parent_id'):
                 print(f"   Parent ID: {artifact['parent_id']}")
     
@@ -1373,32 +1567,11 @@ def run_agent(user_query: str):
     if geo_stats['spatial_statistics']:
         print("Spatial statistics:", geo_stats['spatial_statistics'])
 
+    return result_state
+
 # --- Enhanced example usage ---
 if __name__ == "__main__":
     # Example queries the enhanced agent can handle
-    test_queries = [
-        # Timeseries queries 
-        "How did cropping intensity change from 2017 to 2023 at latitude 25.31698754297551, longitude 75.09702609349773?",
-        "What was the precipitation trend from 2017 to 2023 at latitude 25.31698754297551, longitude 75.09702609349773?",
-        "Show me groundwater depletion rates between 2018-2022 near coordinates 25.317, 75.097",
-        
-        # Vector data queries 
-        "How many water bodies are within 1km of coordinates 25.31698754297551, 75.09702609349773?",
-        #"What's the total agricultural area around uid 12_75340?",
-        "Analyze drainage network density near latitude 25.31, longitude 75.09",
-        "Count the number of SOGE features within 3km of my location at 25.317, 75.097",
-        
-        # Raster data queries 
-        "What's the average vegetation index around latitude 25.31, longitude 75.09?",
-        "Analyze elevation patterns within 2km of uid 12_75340",
-        "What are the slope statistics for the watershed at coordinates 25.317, 75.097?",
-        "Show me NDVI distribution in a 5km radius of latitude 25.31, longitude 75.09",
-        
-        # Advanced spatial queries 
-        "What are the terrain characteristics near coordinates 25.31698754297551, 75.09702609349773?",
-        "Analyze land use distribution around uid 12_75340",
-        "Show aquifer characteristics within 1km of latitude 25.31, longitude 75.09"
-    ]
     
     print("=== Enhanced Geospatial Agent Testing ===\n")
     print("Available query types:")
@@ -1407,7 +1580,7 @@ if __name__ == "__main__":
     print("3. Raster Data Analysis")
     
     # Run 
-    #run_agent(test_queries[0])
+    #run_agent(TEST_QUERIES[0])
     
 
     # Test the land use distribution query:
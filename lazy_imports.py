@@ -0,0 +1,83 @@
+"""
+Lazy Imports for CoreStack Agent System
+- Module proxies that import on first attribute access
+- Earth Engine initialized once, on the first call that needs it
+"""
+
+import os
+import importlib
+import threading
+import types
+
+GEE_PROJECT = os.getenv("GEE_PROJECT", "apt-achievment-453417-h6")
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module; the real import happens on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_name = name
+        self._lazy_module = None
+
+    def _load(self):
+        if self._lazy_module is None:
+            self._lazy_module = importlib.import_module(self._lazy_name)
+        return self._lazy_module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<lazy module '{self._lazy_name}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def lazy_callable(module_name: str, attr: str):
+    """
+    Callable stand-in for a class or function (e.g. ChatGoogleGenerativeAI);
+    the owning module is imported on first call.
+    """
+    module = LazyModule(module_name)
+
+    def _call(*args, **kwargs):
+        return getattr(module, attr)(*args, **kwargs)
+
+    _call.__name__ = attr
+    _call.__qualname__ = attr
+    _call.__doc__ = f"Lazily imported {module_name}.{attr}"
+    return _call
+
+
+_ee_module = None
+_ee_lock = threading.Lock()
+
+
+def ensure_ee(project: str = None):
+    """
+    Import and initialize Earth Engine once per process.
+
+    Returns:
+        The ee module (initialization failures are reported, not raised,
+        matching the previous import-time behaviour)
+    """
+    global _ee_module
+    if _ee_module is None:
+        with _ee_lock:
+            if _ee_module is None:
+                import ee
+                project = project or GEE_PROJECT
+                try:
+                    ee.Initialize(project=project)
+                    print(f"✅ Earth Engine initialized with project: {project}")
+                except Exception as e:
+                    print(f"⚠️  Earth Engine initialization failed: {e}")
+                _ee_module = ee
+    return _ee_module
@@ -6,7 +6,6 @@ New Clean Architecture for Geospatial Agent
 """
 
 import os
-import requests
 import json
 import statistics
 import re
@@ -15,38 +14,44 @@ from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import tempfile
 
-# LangGraph and LLM imports
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.graph import StateGraph
 from dotenv import load_dotenv
 
+# Heavy dependencies (LLM client, LangGraph, geospatial stack, Earth Engine) are
+# imported on first use so that importing this module stays cheap
+from lazy_imports import lazy_module, lazy_callable
+
+requests = lazy_module("requests")
+
+# LangGraph and LLM imports
+ChatGoogleGenerativeAI = lazy_callable("langchain_google_genai", "ChatGoogleGenerativeAI")
+StateGraph = lazy_callable("langgraph.graph", "StateGraph")
+
 # Geospatial processing imports
-import pandas as pd
-import geopandas as gpd
-import rasterio
-from rasterio.mask import mask
-from rasterio.merge import merge as rio_merge
-from rasterio.mask import mask as rio_mask
-from shapely.geometry import Point, box, shape, Polygon
-from shapely.ops import transform as shp_transform
-import pyproj
-from pyproj import CRS, Transformer
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic as geopy_geodesic
-import numpy as np
-
-import ee
-import geemap
- 
+pd = lazy_module("pandas")
+gpd = lazy_module("geopandas")
+rasterio = lazy_module("rasterio")
+pyproj = lazy_module("pyproj")
+np = lazy_module("numpy")
+
+from area_service import area_service
+from tracing import span, traced_node
+from prompt_builder import PromptBuilder
+from graph_state import GraphState, branch_node
+from prefetch import LayerPrefetcher, vector_cache, layer_version
+from sandbox import execute_sandboxed, start_sandbox_pool
+from code_templates import get_template_store
+from data_handles import data_handles, load_layer
+from crosswalk import get_crosswalk
+from gazetteer import get_gazetteer, pick_match, clarification
+from geocoding import geocoder
+from ee_features import (
+    fetch_features, VILLAGE_COLLECTION, STATE_COLLECTION, TEHSIL_COLLECTION, WATERSHED_COLLECTION
+)
+
 load_dotenv()
 
-# Initialize Earth Engine
+# Earth Engine is initialized on first use (see lazy_imports.ensure_ee)
 GEE_PROJECT = os.getenv("GEE_PROJECT", "apt-achievment-453417-h6")
-try:
-    ee.Initialize(project=GEE_PROJECT)
-    print(f"✅ Earth Engine initialized with project: {GEE_PROJECT}")
-except Exception as e:
-    print(f"⚠️  Earth Engine initialization failed: {e}")
 
 # ============================================================================
 
@@ -267,19 +272,18 @@ class CoreStackAPI:
 # UTILITY FUNCTIONS
 # ============================================================================
 
-def geocode_location(location_name: str) -> Optional[Tuple[float, float]]:
-    """Geocode a location name to coordinates (latitude, longitude)"""
-    try:
-        geolocator = Nominatim(user_agent="geospatial_agent")
-        location = geolocator.geocode(location_name)
-        if location:
-            return (location.latitude, location.longitude)
-    except Exception as e:
-        print(f"Geocoding error: {e}")
-    return None
+def geocode_location(location_name: str, location_type: Optional[str] = None,
+                     district: Optional[str] = None) -> Optional[Tuple[float, float]]:
+    """
+    Geocode a location name to coordinates (latitude, longitude).
+
+    Resolution order: persistent cache → local village/tehsil/state centroids
+    → rate-limited Nominatim (results cached with a TTL).
+    """
+    return geocoder.geocode(location_name, location_type=location_type, district=district)
 
 
-def geodesic_buffer(lon: float, lat: float, radius_m: float, out_crs: str = "EPSG:4326") -> Polygon:
+def geodesic_buffer(lon: float, lat: float, radius_m: float, out_crs: str = "EPSG:4326") -> "Polygon":
     """
     Create a circular buffer around a point using geodesic distance.
     
@@ -293,6 +297,8 @@ def geodesic_buffer(lon: float, lat: float, radius_m: float, out_crs: str = "EPS
         Shapely Polygon representing the buffer
     """
     from pyproj import Geod
+    from shapely.geometry import Polygon
+    from shapely.ops import transform as shp_transform
     geod = Geod(ellps="WGS84")
     angles = np.linspace(0, 360, 64)
     circle_points = []
@@ -337,10 +343,12 @@ class SpatialDataProcessor:
         print(f"\n📡 DOWNLOADING VECTOR: {url[:100]}...")
         
         try:
-            gdf = gpd.read_file(url)
+            # Shared with the speculative prefetcher; joins a download already in flight
+            gdf = vector_cache.get_or_load(url)
             print(f"📦 LOADED: {len(gdf)} features")
             print(f"📋 COLUMNS: {list(gdf.columns)}")
-            
+            layer_gdf = gdf
+
             # Filter by buffer if point provided
             if point:
                 lat, lon = point
@@ -348,22 +356,23 @@ class SpatialDataProcessor:
                 gdf = gdf[gdf.intersects(buffer_geom)]
                 print(f"🔍 FILTERED: {len(gdf)} features within {buffer_km}km")
             
-            # Calculate statistics (reproject to UTM for accurate area calculation)
+            # Calculate statistics (reproject to a metric CRS for accurate area calculation)
             stats = {
                 'feature_count': len(gdf),
                 'columns': list(gdf.columns),
                 'attributes': {},
                 'sample_features': []
             }
-            
-            # Calculate area in hectares (reproject to UTM zone for India: EPSG:32643)
+
+            # Calculate area in hectares (UTM zone / equal-area CRS picked from the layer bbox;
+            # the projected layer is cached per URL and content hash so repeat queries skip reprojection)
             if len(gdf) > 0:
                 try:
-                    gdf_projected = gdf.to_crs('EPSG:32643')  # UTM Zone 43N for India
-                    stats['total_area_ha'] = gdf_projected.geometry.area.sum() / 10000  # m² to ha
-                except:
+                    stats['total_area_ha'] = area_service.area_ha(layer_gdf, layer_key=url, version=layer_version(url),
+                                                                  index=gdf.index)
+                except Exception as e:
                     stats['total_area_ha'] = 0
-                    stats['area_calculation_error'] = 'Could not reproject for area calculation'
+                    stats['area_calculation_error'] = f'Could not reproject for area calculation: {e}'
             else:
                 stats['total_area_ha'] = 0
             
@@ -489,6 +498,154 @@ class SpatialDataProcessor:
             return {'error': str(e)}
 
 
+def find_layer(layer_list: List[Dict], search_term: str) -> Optional[Dict]:
+    """
+    Find a layer by name with fuzzy matching (case-insensitive, partial match).
+    Returns the best match or None.
+    """
+    search_lower = search_term.lower()
+    
+    # First try exact match (case-insensitive)
+    for layer in layer_list:
+        if layer['layer_name'].lower() == search_lower:
+            return layer
+    
+    # Then try partial match
+    for layer in layer_list:
+        if search_lower in layer['layer_name'].lower():
+            return layer
+    
+    # Last resort: try matching individual words
+    search_words = search_lower.split()
+    for layer in layer_list:
+        layer_name_lower = layer['layer_name'].lower()
+        if all(word in layer_name_lower for word in search_words):
+            return layer
+    
+    return None
+
+
+def sandbox_namespace() -> Dict[str, Any]:
+    """
+    Globals available to CodeAct-generated code. Called once per sandbox
+    worker at start-up, so geopandas and numpy are imported before any query.
+    """
+    import geopandas
+    import numpy
+    return {
+        'SpatialDataProcessor': SpatialDataProcessor,
+        'geodesic_buffer': geodesic_buffer,
+        'find_layer': find_layer,
+        'load_layer': load_layer,
+        'gpd': geopandas,
+        'np': numpy,
+        'json': json
+    }
+
+
+# ============================================================================
+# CODEACT PROMPTS
+# ============================================================================
+# Static sections first (served from the provider's prefix cache), examples
+# only for the layer kinds the plan selected, per-call data last.
+
+CODEACT_MODEL = "gemini-2.0-flash-lite"
+
+PLAN_PROMPT = PromptBuilder("codeact.plan", static=[("instructions", """You are a geospatial analyst. Create a clear execution plan.
+
+TASK: Create a step-by-step plan to answer the query using the available data below.
+
+RULES:
+1. Each step should be clear and specific
+2. Identify which data layers to use
+3. Specify operations needed (filter, intersect, mask, calculate, etc.)
+4. Keep it simple - aim for 3-6 steps
+
+OUTPUT FORMAT (JSON):
+{
+  "steps": [
+    "Step 1: Download and load cropping intensity vector layer",
+    "Step 2: Filter features where intensity > threshold",
+    "Step 3: Calculate total area of filtered regions"
+  ],
+  "data_needed": ["Cropping Intensity", "LULC_level_1"]
+}
+""")])
+
+CODE_PROMPT = PromptBuilder(
+    "codeact.code",
+    static=[("instructions", """You are a Python code generator for geospatial analysis.
+
+AVAILABLE FUNCTIONS:
+- load_layer(layer['handle'], clip=True) → data already merged across regions and clipped to the query area,
+  cached in memory (PREFERRED over downloading URLs):
+    - vector layers: GeoDataFrame
+    - raster layers: dict with 'data' (2D numpy array), 'transform', 'crs', 'nodata', 'bounds'
+  Use clip=False for the full tehsil data.
+- SpatialDataProcessor.process_vector_url(url, point=None, buffer_km=1.0) → dict with 'feature_count',
+  'total_area_ha', 'columns', 'attributes' (column → mean/sum/min/max), 'sample_features' (first 3, no geometry)
+- SpatialDataProcessor.process_raster_url(url, bounds=None, circle_geom_4326=None) → dict with stats
+- geodesic_buffer(lon, lat, radius_m, out_crs="EPSG:4326") → circle geometry (standalone function!)
+- find_layer(layer_list, search_term) → dict (fuzzy layer matching - RECOMMENDED!)
+
+VARIABLES IN SCOPE:
+- query_lat, query_lon: floats (user's location if provided)
+- vector_layers, raster_layers: lists of dicts with 'layer_name', 'handle' and 'layer_url'
+- SpatialDataProcessor, geodesic_buffer, find_layer (see above)
+
+CODE GENERATION RULES:
+1. Write clean Python code (no markdown, no explanations)
+2. Use the provided helper functions to load/process data
+3. Store final result in variable called 'result' (dict or string)
+4. Handle errors gracefully (try-except where needed)
+5. For raster buffers use radius_m >= 1000: 1000-5000m for point queries, 5000-10000m for "around/near" queries
+6. DO NOT import additional libraries beyond what's available
+7. Keep it simple and focused on answering the query
+8. Match layers by the EXACT names listed under AVAILABLE DATA (case-sensitive, may contain spaces,
+   e.g. "Cropping Intensity", not "crop_intensity"); prefer find_layer(vector_layers, 'Cropping Intensity')
+""")],
+    optional=[
+        ("example.vector", ("vector",), """
+EXAMPLE CODE FOR VECTOR DATA:
+```python
+target_layer = find_layer(vector_layers, 'Cropping Intensity')
+
+if target_layer:
+    stats = SpatialDataProcessor.process_vector_url(
+        target_layer['layer_url'],
+        point=(query_lat, query_lon),
+        buffer_km=5.0
+    )
+    result = {
+        'total_area': stats['attributes']['doubly_cropped_area_2023']['sum']
+    }
+else:
+    result = {'error': 'Layer not found'}
+```
+"""),
+        ("example.raster", ("raster",), """
+EXAMPLE CODE FOR RASTER DATA:
+```python
+lulc_layer = find_layer(raster_layers, 'LULC_level_1')
+
+if lulc_layer:
+    buffer_geom = geodesic_buffer(query_lon, query_lat, 5000, out_crs="EPSG:4326")
+    stats = SpatialDataProcessor.process_raster_url(
+        lulc_layer['layer_url'],
+        circle_geom_4326=buffer_geom
+    )
+    result = {
+        'mean_value': stats.get('mean'),
+        'pixel_count': stats.get('pixel_count')
+    }
+else:
+    result = {'error': 'Layer not found'}
+```
+"""),
+    ]
+)
+
+
 # ============================================================================
 # CODEACT AGENT
 # ============================================================================
@@ -498,7 +655,7 @@ class CodeActAgent:
     
     def __init__(self, gemini_api_key: str):
         self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-lite",
+            model=CODEACT_MODEL,
             temperature=0.1,
             google_api_key=gemini_api_key
         )
@@ -513,36 +670,17 @@ class CodeActAgent:
         vector_layers = [f"{l['layer_name']} (vector)" for l in available_layers.get('vector', [])]
         raster_layers = [f"{l['layer_name']} (raster)" for l in available_layers.get('raster', [])]
         
-        prompt = f"""You are a geospatial analyst. Create a clear execution plan.
-
+        prompt = PLAN_PROMPT.build(dynamic=[("query", f"""
 USER QUERY: "{query}"
 
 AVAILABLE DATA:
 Vector Layers: {', '.join(vector_layers) if vector_layers else 'None'}
 Raster Layers: {', '.join(raster_layers) if raster_layers else 'None'}
 
-TASK: Create a step-by-step plan to answer the query.
-
-RULES:
-1. Each step should be clear and specific
-2. Identify which data layers to use
-3. Specify operations needed (filter, intersect, mask, calculate, etc.)
-4. Keep it simple - aim for 3-6 steps
-
-OUTPUT FORMAT (JSON):
-{{
-  "steps": [
-    "Step 1: Download and load cropping intensity vector layer",
-    "Step 2: Filter features where intensity > threshold",
-    "Step 3: Calculate total area of filtered regions"
-  ],
-  "data_needed": ["Cropping Intensity", "LULC_level_1"]
-}}
-
-Generate plan now:"""
+Generate plan now:""")])
 
         try:
-            response = self.llm.invoke(prompt)
+            response = self.llm.invoke(prompt.text)
             content = response.content.strip()
             content = re.sub(r"^```json\s*|```$", "", content, flags=re.MULTILINE).strip()
             plan = json.loads(content)
@@ -569,7 +707,7 @@ Generate plan now:"""
         
         # For vector layers, try to fetch schema information
         for layer in selected_layers.get('vector', []):
-            layer_info = f"VECTOR: '{layer['layer_name']}' at URL: {layer['layer_url']}"
+            layer_info = f"VECTOR: '{layer['layer_name']}' handle: {layer.get('handle')} URL: {layer.get('layer_url')}"
             
             # Try to get column information (quick peek)
             try:
@@ -583,10 +721,11 @@ Generate plan now:"""
             layer_context.append(layer_info)
         
         for layer in selected_layers.get('raster', []):
-            layer_context.append(f"RASTER: '{layer['layer_name']}' at URL: {layer['layer_url']}")
+            layer_context.append(f"RASTER: '{layer['layer_name']}' handle: {layer.get('handle')} URL: {layer.get('layer_url')}")
         
-        prompt = f"""You are a Python code generator for geospatial analysis.
-
+        kinds = {kind for kind in ('vector', 'raster') if selected_layers.get(kind)}
+        prompt = CODE_PROMPT.build(
+            dynamic=[("query", f"""
 USER QUERY: "{query}"
 
 EXECUTION PLAN:
@@ -595,96 +734,12 @@ EXECUTION PLAN:
 AVAILABLE DATA:
 {chr(10).join(layer_context)}
 
-AVAILABLE FUNCTIONS:
-- SpatialDataProcessor.process_vector_url(url, point=None, buffer_km=1.0) → Returns dict with:
-    - 'feature_count': number of features
-    - 'total_area_ha': total area in hectares
-    - 'columns': list of all column names
-    - 'attributes': dict mapping column names to stats (mean, sum, min, max)
-    - 'sample_features': list of first 3 feature dicts (without geometry)
-- SpatialDataProcessor.process_raster_url(url, bounds=None, circle_geom_4326=None) → dict with stats
-- geodesic_buffer(lon, lat, radius_m, out_crs="EPSG:4326") → circle geometry (standalone function!)
-  **IMPORTANT**: For raster analysis, use radius_m >= 1000 (1km+) to capture sufficient pixels
-- find_layer(layer_list, search_term) → dict (helper to find layers with fuzzy matching - RECOMMENDED!)
-
-VARIABLES IN SCOPE:
-- query_lat: float (user's latitude if provided)
-- query_lon: float (user's longitude if provided)
-- vector_layers: list of dicts with 'layer_name' and 'layer_url'
-- raster_layers: list of dicts with 'layer_name' and 'layer_url'
-- SpatialDataProcessor: class with static methods for processing layers
-- geodesic_buffer: standalone function for creating buffers
-- find_layer: helper function for robust layer search
-
-CODE GENERATION RULES:
-1. Write clean Python code (no markdown, no explanations)
-2. Use the provided helper functions to download/process data
-3. Store final result in variable called 'result' (dict or string)
-4. Handle errors gracefully (try-except where needed)
-5. For vector data: use process_vector_url()
-6. For raster data: use process_raster_url() with geodesic_buffer(lon, lat, radius_m)
-   - **CRITICAL**: Use radius_m >= 1000 (at least 1km) for rasters to capture enough pixels
-   - For point queries: use 1000-5000m radius
-   - For "around/near" queries: use 5000-10000m radius
-7. DO NOT import additional libraries beyond what's available
-8. Keep it simple and focused on answering the query
-9. **CRITICAL**: When searching for layers, use EXACT MATCHING with the layer names provided above
-10. Layer names are case-sensitive and may have spaces (e.g., "Cropping Intensity", not "crop_intensity")
-
-LAYER MATCHING EXAMPLES:
-- **RECOMMENDED**: Use find_layer() helper for robust matching:
-  target_layer = find_layer(vector_layers, 'Cropping Intensity')
-  target_layer = find_layer(raster_layers, 'NDVI')
-  
-- Manual exact match: if layer['layer_name'] == 'Cropping Intensity'
-- Manual case-insensitive: if 'cropping intensity' in layer['layer_name'].lower()
-
-EXAMPLE CODE FOR VECTOR DATA:
-```python
-# Use find_layer helper for robust layer matching
-target_layer = find_layer(vector_layers, 'Cropping Intensity')
-
-if target_layer:
-    stats = SpatialDataProcessor.process_vector_url(
-        target_layer['layer_url'],
-        point=(query_lat, query_lon),
-        buffer_km=5.0
-    )
-    
-    result = {{
-        'total_area': stats['attributes']['doubly_cropped_area_2023']['sum']
-    }}
-else:
-    result = {{'error': 'Layer not found'}}
-```
-
-EXAMPLE CODE FOR RASTER DATA:
-```python
-# Find LULC or NDVI raster layer
-lulc_layer = find_layer(raster_layers, 'LULC_level_1')
-
-if lulc_layer:
-    # Create buffer geometry (use 1-10km radius for rasters!)
-    buffer_geom = geodesic_buffer(query_lon, query_lat, 5000, out_crs="EPSG:4326")
-    
-    # Process raster
-    stats = SpatialDataProcessor.process_raster_url(
-        lulc_layer['layer_url'],
-        circle_geom_4326=buffer_geom
-    )
-    
-    result = {{
-        'mean_value': stats.get('mean'),
-        'pixel_count': stats.get('pixel_count')
-    }}
-else:
-    result = {{'error': 'Layer not found'}}
-```
-
-NOW GENERATE CODE (Python only, no markdown):"""
+NOW GENERATE CODE (Python only, no markdown):""")],
+            intents=kinds
+        )
 
         try:
-            response = self.llm.invoke(prompt)
+            response = self.llm.invoke(prompt.text)
             code = response.content.strip()
             code = re.sub(r"^```python\s*|^```\s*|```$", "", code, flags=re.MULTILINE).strip()
             
@@ -699,69 +754,28 @@ NOW GENERATE CODE (Python only, no markdown):"""
             print(f"❌ Code generation error: {e}")
             return "result = {'error': 'Code generation failed'}"
     
-    def execute_code(self, code: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute the generated code in a controlled environment"""
+    def execute_code(self, code: str, context: Dict[str, Any],
+                     cancel: Optional["threading.Event"] = None) -> Dict[str, Any]:
+        """
+        Execute the generated code in a sandbox worker process
+        (timeout, memory limit and cancellation; see sandbox.py)
+        """
         print("\n" + "="*70)
         print("🚀 EXECUTING CODE")
         print("="*70)
         
-        # Helper function to find layers by name (case-insensitive, partial match)
-        def find_layer(layer_list: List[Dict], search_term: str) -> Optional[Dict]:
-            """
-            Find a layer by name with fuzzy matching.
-            Returns the best match or None.
-            """
-            search_lower = search_term.lower()
-            
-            # First try exact match (case-insensitive)
-            for layer in layer_list:
-                if layer['layer_name'].lower() == search_lower:
-                    return layer
-            
-            # Then try partial match
-            for layer in layer_list:
-                if search_lower in layer['layer_name'].lower():
-                    return layer
-            
-            # Last resort: try matching individual words
-            search_words = search_lower.split()
-            for layer in layer_list:
-                layer_name_lower = layer['layer_name'].lower()
-                if all(word in layer_name_lower for word in search_words):
-                    return layer
-            
-            return None
-        
-        # Prepare safe execution environment
-        safe_globals = {
-            '__builtins__': __builtins__,
-            'SpatialDataProcessor': SpatialDataProcessor,
-            'geodesic_buffer': geodesic_buffer,
-            'find_layer': find_layer,  # Add helper function
-            'gpd': gpd,
-            'np': np,
-            'json': json
-        }
-        
-        # Add context variables
-        safe_globals.update(context)
+        outcome = execute_sandboxed(code, context, cancel=cancel)
         
-        try:
-            exec(code, safe_globals)
-            result = safe_globals.get('result', {'error': 'No result variable found'})
-            
+        if outcome['error'] is None:
             print("✅ CODE EXECUTED SUCCESSFULLY")
-            print(f"📊 RESULT: {result}")
-            
-            return {'result': result, 'error': None}
-            
-        except Exception as e:
-            error_msg = f"{type(e).__name__}: {str(e)}"
-            print(f"❌ EXECUTION ERROR: {error_msg}")
-            print("\n🔍 TRACEBACK:")
-            print(traceback.format_exc())
-            
-            return {'result': None, 'error': error_msg}
+            print(f"📊 RESULT: {outcome['result']}")
+        else:
+            print(f"❌ EXECUTION ERROR: {outcome['error']}")
+            if outcome.get('traceback'):
+                print("\n🔍 TRACEBACK:")
+                print(outcome['traceback'])
+        
+        return {'result': outcome['result'], 'error': outcome['error']}
 
 
 # ============================================================================
@@ -773,6 +787,10 @@ def llm_intent_parser(state: Dict[str, Any]) -> Dict[str, Any]:
     Simplified intent parser: Extract ONLY location and temporal info.
     Layer selection is handled by Architecture 4's CodeAct.
     """
+    if state.get("parsed"):
+        # Already parsed by the caller (e.g. architecture4's tool cache lookup)
+        return state
+    
     print("\n" + "="*70)
     print("🧠 PARSING INTENT (Location & Temporal)")
     print("="*70)
@@ -851,7 +869,11 @@ NOW PARSE THE QUERY:"""
         
         # Geocode if needed
         if parsed.get('location_name') and not parsed.get('latitude'):
-            coords = geocode_location(parsed['location_name'])
+            coords = geocode_location(
+                parsed['location_name'],
+                location_type=parsed.get('location_type'),
+                district=parsed.get('district')
+            )
             if coords:
                 parsed['latitude'], parsed['longitude'] = coords
                 print(f"🌍 Geocoded '{parsed['location_name']}' → ({coords[0]:.5f}, {coords[1]:.5f})")
@@ -888,6 +910,7 @@ def fetch_spatial_layers_multiregion(state: Dict[str, Any]) -> Dict[str, Any]:
     parsed = state["parsed"]
     resolved = state.get("resolved_geometry", {})
     tehsil_list = resolved.get("tehsil_list", [])
+    point_catalog = state.get("point_catalog")
     
     if not tehsil_list:
         state["error"] = "No tehsils resolved"
@@ -906,21 +929,27 @@ def fetch_spatial_layers_multiregion(state: Dict[str, Any]) -> Dict[str, Any]:
         print(f"\n   🔍 Fetching: {tehsil_name} ({district_name}, {state_name})")
         
         try:
-            # Get representative point from tehsil geometry
-            centroid = tehsil_info['geometry'].centroid
-            lat, lon = centroid.y, centroid.x
-            
-            # Call CoreStack API for this specific tehsil
-            admin_info = api.get_admin_details_by_latlon(
-                latitude=lat,
-                longitude=lon
-            )
-            
-            layers = api.get_generated_layer_urls(
-                state=state_name,
-                district=district_name,
-                tehsil=tehsil_name
-            )
+            if _catalog_matches(point_catalog, tehsil_info):
+                # Already fetched in parallel with geometry resolution
+                admin_info = point_catalog['admin']
+                layers = point_catalog['layers']
+                print(f"      ♻️  Using layer catalog fetched for the query point")
+            else:
+                # Get representative point from tehsil geometry
+                centroid = tehsil_info['geometry'].centroid
+                lat, lon = centroid.y, centroid.x
+                
+                # Call CoreStack API for this specific tehsil
+                admin_info = api.get_admin_details_by_latlon(
+                    latitude=lat,
+                    longitude=lon
+                )
+                
+                layers = api.get_generated_layer_urls(
+                    state=state_name,
+                    district=district_name,
+                    tehsil=tehsil_name
+                )
             
             location_info = admin_info  # Store last location info
             
@@ -986,6 +1015,41 @@ def fetch_spatial_layers_multiregion(state: Dict[str, Any]) -> Dict[str, Any]:
     
     return state
 
+def fetch_point_catalog(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fetch the layer catalog of the tehsil containing the query point.
+    Runs in parallel with geometry resolution; fetch_spatial_layers_multiregion
+    reuses it for that tehsil instead of calling the API again.
+    Failures are not fatal (the multi-region fetch simply does the lookup).
+    """
+    if "error" in state:
+        return state
+    
+    parsed = state["parsed"]
+    latitude = parsed.get("latitude")
+    longitude = parsed.get("longitude")
+    if latitude is None or longitude is None:
+        return state
+    
+    try:
+        admin_info, layers = api.get_spatial_layers_by_coordinates(latitude, longitude)
+        state["point_catalog"] = {"admin": admin_info, "layers": layers}
+        print(f"✅ Layer catalog for query point: {len(layers)} layers ({admin_info.get('Tehsil')})")
+    except Exception as e:
+        print(f"⚠️  Point layer catalog unavailable: {str(e)}")
+    
+    return state
+
+def _catalog_matches(point_catalog: Optional[Dict[str, Any]], tehsil_info: Dict[str, Any]) -> bool:
+    """True if the point catalog was fetched for this tehsil."""
+    if not point_catalog:
+        return False
+    admin = point_catalog.get("admin") or {}
+    def norm(value):
+        return str(value or "").strip().lower()
+    return (norm(admin.get("Tehsil")) == norm(tehsil_info.get("tehsil")) and
+            norm(admin.get("District")) == norm(tehsil_info.get("district")))
+
 def fetch_timeseries_data(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Fetch timeseries data for the location.
@@ -994,11 +1058,15 @@ def fetch_timeseries_data(state: Dict[str, Any]) -> Dict[str, Any]:
     if "error" in state:
         return state
     
+    parsed = state["parsed"]
+    # Only temporal queries need the MWS timeseries
+    if not parsed.get("temporal") and parsed.get("data_type_needed") != "timeseries":
+        return state
+    
     print("\n" + "="*70)
     print("� FETCHING TIMESERIES DATA")
     print("="*70)
     
-    parsed = state["parsed"]
     latitude = parsed.get("latitude")
     longitude = parsed.get("longitude")
     uid = parsed.get("uid")
@@ -1028,142 +1096,55 @@ def fetch_timeseries_data(state: Dict[str, Any]) -> Dict[str, Any]:
 
 def merge_and_clip_spatial_data(state: Dict[str, Any]) -> Dict[str, Any]:
     """
-    NEW CRITICAL FUNCTION: Merge multi-region data and clip to exact boundary.
-    Handles both vector union and raster mosaic.
+    Register a data handle per available layer: all of its regional URLs,
+    clipped to the resolved boundary. Merging (vector union / raster mosaic)
+    and clipping happen on the first load_layer(handle) and are cached, so
+    generated code gets in-memory data and nothing is downloaded twice.
     """
     
     if "error" in state:
         return state
     
     print("\n" + "="*70)
-    print("🔗 MERGING & CLIPPING DATA")
+    print("🔗 REGISTERING DATA HANDLES (merge & clip on first load)")
     print("="*70)
     
-    data_urls = state.get("data_urls", {})
+    available_layers = state.get("available_layers", {})
     resolved = state.get("resolved_geometry", {})
     village_geom = resolved.get("village_geom")
-    location_name = resolved.get("location_name")
     
-    if not village_geom or (len(data_urls.get('vector', [])) == 0 and len(data_urls.get('raster', [])) == 0):
-        state["error"] = "No data to merge"
-        return state
+    handles = {}
+    for layer_type in ('vector', 'raster'):
+        for layer in available_layers.get(layer_type, []):
+            layer['handle'] = data_handles.register(layer, clip_geom=village_geom)
+            if layer.get('urls') and not layer.get('layer_url'):
+                # First region's URL, for code that still reads URLs directly
+                layer['layer_url'] = layer['urls'][0]['url']
+            handles[layer['layer_name']] = layer['handle']
     
-    try:
-        # VECTOR MERGING PATH
-        if data_urls['vector']:
-            print(f"\n📦 Vector merging: {len(data_urls['vector'])} layers")
-            
-            all_gdf_list = []
-            for layer_info in data_urls['vector']:
-                print(f"   Loading: {layer_info['tehsil']} - {layer_info['layer_name']}")
-                gdf = gpd.read_file(layer_info['url'])
-                all_gdf_list.append(gdf)
-            
-            # Union all GeoDataFrames
-            print(f"   Unioning {len(all_gdf_list)} GeoDataFrames...")
-            merged_gdf = gpd.GeoDataFrame(
-                pd.concat(all_gdf_list, ignore_index=True),
-                crs=all_gdf_list[0].crs
-            )
-            
-            # Remove exact duplicates (same geometry)
-            print(f"   Removing duplicates...")
-            merged_gdf = merged_gdf.drop_duplicates(subset=['geometry'])
-            print(f"   Before dedup: {len(pd.concat(all_gdf_list))}, After: {len(merged_gdf)}")
-            
-            # Clip to village boundary
-            print(f"   Clipping to village boundary...")
-            clipped_gdf = gpd.clip(merged_gdf, village_geom)
-            
-            print(f"   ✅ Result: {len(clipped_gdf)} features within {location_name}")
-            
-            # Save for CodeAct
-            clipped_gdf.to_file('./exports/merged_clipped_data.geojson', driver='GeoJSON')
-            state["merged_data"] = clipped_gdf
-            state["merged_data_type"] = "vector"
-            state["merged_data_path"] = './exports/merged_clipped_data.geojson'
-        
-        # RASTER MERGING PATH
-        elif data_urls['raster']:
-            print(f"\n🖼️  Raster merging: {len(data_urls['raster'])} layers")
-            
-            import rasterio
-            from rasterio.merge import merge as rio_merge
-            from rasterio.mask import mask as rio_mask
-            from rasterio.vrt import WarpedVRT
-            
-            raster_paths = []
-            
-            # Download rasters (in real implementation, use /vsicurl/)
-            for layer_info in data_urls['raster']:
-                print(f"   Accessing: {layer_info['tehsil']} - {layer_info['layer_name']}")
-                # For HTTP URLs, use /vsicurl/ prefix for GDAL
-                url = layer_info['url']
-                if url.startswith('http') and not url.startswith('/vsicurl/'):
-                    url = f'/vsicurl/{url}'
-                raster_paths.append(url)
-            
-            # Mosaic rasters
-            if len(raster_paths) > 1:
-                print(f"   Mosaicking {len(raster_paths)} rasters...")
-                mosaicked, out_transform = rio_merge(raster_paths)
-                
-                with rasterio.open(raster_paths[0]) as src:
-                    merged_profile = src.profile
-                    merged_profile.update({
-                        'height': mosaicked.shape[1],
-                        'width': mosaicked.shape[2],
-                        'transform': out_transform
-                    })
-                
-                merged_path = './exports/merged_raster.tif'
-                with rasterio.open(merged_path, 'w', **merged_profile) as dst:
-                    dst.write(mosaicked)
-            else:
-                merged_path = raster_paths[0]
-                print(f"   Single raster, using as-is")
-            
-            # Clip to village boundary
-            print(f"   Clipping to village boundary...")
-            with rasterio.open(merged_path) as src:
-                try:
-                    clipped, clipped_transform = rio_mask(
-                        src,
-                        [village_geom],
-                        crop=True,
-                        filled=True
-                    )
-                    
-                    clipped_profile = src.profile
-                    clipped_profile.update({
-                        'height': clipped.shape[1],
-                        'width': clipped.shape[2],
-                        'transform': clipped_transform
-                    })
-                    
-                    clipped_path = './exports/merged_clipped_raster.tif'
-                    with rasterio.open(clipped_path, 'w', **clipped_profile) as dst:
-                        dst.write(clipped)
-                    
-                    print(f"   ✅ Clipped raster saved: {clipped_path}")
-                    
-                except Exception as e:
-                    print(f"   ⚠️  Clipping failed: {e}, using full raster")
-                    clipped_path = merged_path
-            
-            state["merged_data_path"] = clipped_path
-            state["merged_data_type"] = "raster"
-        
-        print(f"\n✅ MERGE & CLIP COMPLETE")
-        
-    except Exception as e:
-        state["error"] = f"Merge and clip failed: {str(e)}"
-        print(f"❌ ERROR: {state['error']}")
-        import traceback
-        traceback.print_exc()
+    state["data_handles"] = handles
+    print(f"✅ {len(handles)} handles registered"
+          f"{' (clipped to ' + str(resolved.get('location_name') or 'query area') + ')' if village_geom is not None else ''}")
     
     return state
 
+def _execution_context(state: Dict[str, Any], selected_layers: Dict[str, list]) -> Dict[str, Any]:
+    """Variables in scope for generated code."""
+    parsed = state.get("parsed", {})
+    return {
+        'query_lat': parsed.get('latitude'),
+        'query_lon': parsed.get('longitude'),
+        'vector_layers': selected_layers.get('vector', []),
+        'raster_layers': selected_layers.get('raster', []),
+        'timeseries': state.get('timeseries_raw'),
+        'query': state["user_query"]
+    }
+
+def _execution_succeeded(execution_result: Dict[str, Any]) -> bool:
+    """No exception and no 'error' in the result dict the code produced."""
+    result = execution_result.get('result')
+    return not execution_result.get('error') and not (isinstance(result, dict) and result.get('error'))
+
 def codeact_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     CodeAct node for complex analysis.
@@ -1204,34 +1185,60 @@ def codeact_node(state: Dict[str, Any]) -> Dict[str, Any]:
         # Spatial analysis (existing logic)
         available_layers = state.get("available_layers", {})
         
-        # STEP 1: Generate plan
-        plan = agent.generate_plan(query, available_layers)
-        
-        # STEP 2: Filter layers
-        needed_layer_names = plan.get('data_needed', [])
-        selected_layers = {
-            'vector': [l for l in available_layers.get('vector', []) if l['layer_name'] in needed_layer_names],
-            'raster': [l for l in available_layers.get('raster', []) if l['layer_name'] in needed_layer_names]
-        }
-        
-        # Fallback: use all if none selected
-        if not selected_layers['vector'] and not selected_layers['raster']:
-            selected_layers = available_layers
-        
-        # STEP 3: Generate code
-        code = agent.generate_code(query, plan, selected_layers)
-        
-        # STEP 4: Prepare execution context
-        context = {
-            'query_lat': parsed.get('latitude'),
-            'query_lon': parsed.get('longitude'),
-            'vector_layers': selected_layers.get('vector', []),
-            'raster_layers': selected_layers.get('raster', []),
-            'query': query
-        }
-        
-        # STEP 5: Execute code
-        execution_result = agent.execute_code(code, context)
+        templates = get_template_store()
+        execution_result = None
+        
+        # STEP 0: Structurally identical queries reuse a stored (plan, code)
+        # template with this query's location/years bound in; no LLM calls
+        template = templates.lookup(query, parsed, available_layers) if templates else None
+        if template:
+            print(f"\n♻️  Reusing code template {template['template_key'][:12]} (plan and code generation skipped)")
+            plan = template['plan']
+            code = template['code']
+            selected_layers = template['selected_layers']
+            execution_result = agent.execute_code(code, _execution_context(state, selected_layers),
+                                                  cancel=state.get("cancel_event"))
+            if not _execution_succeeded(execution_result):
+                print("⚠️  Template run failed, regenerating code")
+                templates.record_failure(template['template_key'])
+                execution_result = None
+        
+        if execution_result is None:
+            # Start downloading likely layers now so I/O overlaps with the LLM calls
+            prefetcher = LayerPrefetcher()
+            prefetcher.start(query, available_layers)
+            
+            # STEP 1: Generate plan
+            plan = agent.generate_plan(query, available_layers)
+            
+            # STEP 2: Filter layers
+            needed_layer_names = plan.get('data_needed', [])
+            selected_layers = {
+                'vector': [l for l in available_layers.get('vector', []) if l['layer_name'] in needed_layer_names],
+                'raster': [l for l in available_layers.get('raster', []) if l['layer_name'] in needed_layer_names]
+            }
+            
+            # Fallback: use all if none selected
+            if not selected_layers['vector'] and not selected_layers['raster']:
+                selected_layers = available_layers
+            # Keep prefetches for the layers actually handed to the code (all of them after the fallback)
+            prefetcher.retain(l['layer_name'] for kind in ('vector', 'raster') for l in selected_layers.get(kind, []))
+            
+            # STEP 3: Generate code
+            code = agent.generate_code(query, plan, selected_layers)
+            
+            # STEP 4: Prepare execution context
+            context = _execution_context(state, selected_layers)
+            
+            # STEP 5: Execute code
+            try:
+                # A caller may put a threading.Event in state["cancel_event"] to abort the run
+                execution_result = agent.execute_code(code, context, cancel=state.get("cancel_event"))
+            finally:
+                prefetcher.close()
+            
+            if templates and _execution_succeeded(execution_result):
+                templates.store(query, parsed, plan, code, selected_layers)
         
         # STEP 6: Store result
         if execution_result['error']:
@@ -1339,19 +1346,64 @@ def resolve_geometry_v2(state: Dict[str, Any]) -> Dict[str, Any]:
     district = parsed.get("district")
     
     try:
+        precomputed = None
+        village_match = None
         if location_type == "village":
-            # Load village boundaries from YOUR GeoJSON
-            try:
-                village_gdf = gpd.read_file('./village_boundaries.geojson')
-            except:
-                # Fallback: load from GEE if local file not available
-                print("⚠️  Local village GeoJSON not found, loading from GEE...")
-                village_fc = ee.FeatureCollection("projects/ext-datasets/assets/datasets/Village_pan_india")
-                # This will be slow, but at least works
-                village_gdf = geemap.ee_to_geopandas(village_fc)
+            gazetteer = get_gazetteer()
+            crosswalk = get_crosswalk()
+
+            if gazetteer is not None:
+                # Normalized / fuzzy name lookup (handles "Shirur" vs "Shiroor")
+                candidates = gazetteer.search(location_name, district=district)
+                if not candidates:
+                    state["error"] = f"Village '{location_name}' in {district} not found"
+                    print(f"❌ ERROR: {state['error']}")
+                    return state
+                village_match = pick_match(candidates)
+                if village_match is None:
+                    state["error"] = clarification(location_name, candidates, district)
+                    print(f"❓ {state['error']}")
+                    return state
+                print(f"✅ Matched village: {village_match['village_name']} "
+                      f"({village_match['district']}, score={village_match['score']})")
+                if len(candidates) > 1:
+                    print(f"   Other candidates: {', '.join(c['village_name'] + ' (' + str(c['district']) + ')' for c in candidates[1:])}")
+
+                # Precomputed crosswalk: village → tehsils/watersheds in a single keyed lookup
+                if crosswalk is not None:
+                    precomputed = crosswalk.get(village_match['village_id'])
+            elif crosswalk is not None:
+                matches = crosswalk.find(location_name, district)
+                if matches:
+                    # Same name-key lookup: all exact matches; ask when they are in different districts
+                    candidates = [dict(m, score=1.0) for m in matches]
+                    precomputed = pick_match(candidates)
+                    if precomputed is None:
+                        state["error"] = clarification(location_name, candidates, district)
+                        print(f"❓ {state['error']}")
+                        return state
+
+            if precomputed is not None:
+                print(f"✅ Found village in crosswalk: {precomputed['village_name']} (id={precomputed['village_id']})")
+
+        if precomputed is not None:
+            village_geom = precomputed['geometry']
+            print(f"   Area: {precomputed['area_ha']:.1f} ha")
+
+        elif village_match is not None:
+            village_geom = gazetteer.geometry(village_match)
+            print(f"   Area: {village_geom.area:.4f} square degrees")
+
+        elif location_type == "village":
+            # Fallback: load from GEE if local file not available
+            print("⚠️  Local village GeoJSON not found, querying GEE...")
+            # Name filter runs server-side; only matching villages are transferred
+            village_gdf = fetch_features(VILLAGE_COLLECTION, name_field='village_name', name=location_name)
             
             # Filter to specific village
-            if district:
+            if len(village_gdf) == 0:
+                village = village_gdf
+            elif district:
                 village = village_gdf[
                     (village_gdf['village_name'].str.lower() == location_name.lower()) &
                     (village_gdf['district'].str.lower() == district.lower())
@@ -1376,24 +1428,34 @@ def resolve_geometry_v2(state: Dict[str, Any]) -> Dict[str, Any]:
         
         elif location_type == "state":
             # Load state boundary
-            state_fc = ee.FeatureCollection("projects/ext-datasets/assets/datasets/State_pan_india")
-            state_gdf = geemap.ee_to_geopandas(state_fc)
+            state_gdf = fetch_features(STATE_COLLECTION, name_field='state_name', name=location_name)
             state_geom = state_gdf[state_gdf['state_name'].str.lower() == location_name.lower()].geometry.iloc[0]
             print(f"✅ Using state: {location_name}")
             village_geom = state_geom
         
         elif location_type == "tehsil":
             # Load tehsil boundary
-            tehsil_fc = ee.FeatureCollection("projects/ext-datasets/assets/datasets/SOI_tehsil")
-            tehsil_gdf = geemap.ee_to_geopandas(tehsil_fc)
+            tehsil_gdf = fetch_features(TEHSIL_COLLECTION, name_field='name', name=location_name)
             tehsil = tehsil_gdf[tehsil_gdf['name'].str.lower() == location_name.lower()].iloc[0]
             print(f"✅ Using tehsil: {location_name}")
             village_geom = tehsil.geometry
         
-        # Find intersecting tehsils
+        if precomputed is not None:
+            state["resolved_geometry"] = {
+                'village_geom': village_geom,
+                'tehsil_list': precomputed['tehsil_list'],
+                'watershed_list': precomputed['watershed_list'],
+                'location_name': location_name,
+                'location_type': location_type
+            }
+            print(f"✅ {len(precomputed['tehsil_list'])} tehsils, {len(precomputed['watershed_list'])} watersheds (precomputed)")
+            print(f"\n✅ GEOMETRY RESOLUTION COMPLETE")
+            return state
+
+        # Find intersecting tehsils (live intersection for ad-hoc geometries)
         print(f"\n🔍 Finding intersecting tehsils...")
-        tehsil_fc = ee.FeatureCollection("projects/ext-datasets/assets/datasets/SOI_tehsil")
-        tehsil_gdf = geemap.ee_to_geopandas(tehsil_fc)
+        # filterBounds runs server-side; exact intersection is checked locally
+        tehsil_gdf = fetch_features(TEHSIL_COLLECTION, geometry=village_geom)
         
         intersecting_tehsils = tehsil_gdf[tehsil_gdf.geometry.intersects(village_geom)]
         
@@ -1412,8 +1474,7 @@ def resolve_geometry_v2(state: Dict[str, Any]) -> Dict[str, Any]:
         
         # Find intersecting watersheds (optional)
         print(f"\n🔍 Finding intersecting watersheds...")
-        watershed_fc = ee.FeatureCollection("projects/ext-datasets/assets/datasets/Watershed_pan_india")
-        watershed_gdf = geemap.ee_to_geopandas(watershed_fc)
+        watershed_gdf = fetch_features(WATERSHED_COLLECTION, geometry=village_geom)
         
         intersecting_watersheds = watershed_gdf[watershed_gdf.geometry.intersects(village_geom)]
         watershed_list = intersecting_watersheds['uid'].tolist() if 'uid' in intersecting_watersheds.columns else []
@@ -1460,38 +1521,55 @@ def router_node(state: Dict[str, Any]) -> Dict[str, Any]:
     
     print(f"   Analysis Type: {analysis_type}")
     
-    # ALL queries go through geometry resolution first
+    # ALL queries go through geometry resolution; the point layer catalog and
+    # (for temporal queries) the MWS timeseries are fetched alongside it
     state["next_node"] = "resolve_geometry"
     
-    print(f"   → Next: resolve_geometry")
+    print(f"   → Next: resolve_geometry ∥ fetch_catalog ∥ fetch_timeseries")
     
     return state
 
 
-def build_graph() -> StateGraph:
+def build_graph() -> "StateGraph":
     """
-    FIXED: Complete workflow with proper data collection phases.
+    Workflow with the independent data collection steps fanned out:
+    geometry resolution, the query point's layer catalog and the MWS
+    timeseries run concurrently, so their latency is the slowest of the
+    three rather than the sum. GraphState merges the parallel writes.
     """
-    graph = StateGraph(dict)
+    # Sandbox workers warm up while the first query runs its earlier nodes
+    start_sandbox_pool()
+    graph = StateGraph(GraphState)
     
     # Add nodes
-    graph.add_node("parse_intent", llm_intent_parser)
-    graph.add_node("router", router_node)
+    graph.add_node("parse_intent", traced_node("parse_intent", llm_intent_parser))
+    graph.add_node("router", traced_node("router", router_node))
     
-    # NEW NODES (data collection)
-    graph.add_node("resolve_geometry", resolve_geometry_v2)
-    graph.add_node("fetch_spatial", fetch_spatial_layers_multiregion)
-    graph.add_node("merge_clip", merge_and_clip_spatial_data)
+    # Parallel data collection (each branch works on a private copy of the state)
+    graph.add_node("resolve_geometry", branch_node(
+        "geometry", [traced_node("resolve_geometry", resolve_geometry_v2)]))
+    graph.add_node("fetch_catalog", branch_node(
+        "catalog", [traced_node("fetch_catalog", fetch_point_catalog)]))
+    graph.add_node("fetch_timeseries", branch_node(
+        "timeseries", [traced_node("fetch_timeseries", fetch_timeseries_data)], isolate_errors=True))
+    
+    graph.add_node("fetch_spatial", traced_node("fetch_spatial", fetch_spatial_layers_multiregion))
+    graph.add_node("merge_clip", traced_node("merge_clip", merge_and_clip_spatial_data))
     
     # Existing nodes (execution)
-    graph.add_node("codeact", codeact_node)
-    graph.add_node("format", format_response)
+    graph.add_node("codeact", traced_node("codeact", codeact_node))
+    graph.add_node("format", traced_node("format", format_response))
     
-    # Add edges (LINEAR FLOW: no branching needed)
+    # Fan-out after routing
     graph.add_edge("parse_intent", "router")
-    graph.add_edge("router", "resolve_geometry")          # NEW
-    graph.add_edge("resolve_geometry", "fetch_spatial")   # NEW
-    graph.add_edge("fetch_spatial", "merge_clip")         # NEW
+    graph.add_edge("router", "resolve_geometry")
+    graph.add_edge("router", "fetch_catalog")
+    graph.add_edge("router", "fetch_timeseries")
+    
+    # Fan-in: spatial fetch needs the geometry and the point catalog;
+    # merge waits for the spatial layers and the timeseries
+    graph.add_edge(["resolve_geometry", "fetch_catalog"], "fetch_spatial")
+    graph.add_edge(["fetch_spatial", "fetch_timeseries"], "merge_clip")
     graph.add_edge("merge_clip", "codeact")
     graph.add_edge("codeact", "format")
     
@@ -1501,6 +1579,25 @@ def build_graph() -> StateGraph:
     
     return graph
 
+# ============================================================================
+# TEST QUERIES (also replayed offline by benchmarks/offline_suite.py)
+# ============================================================================
+
+TEST_QUERIES = [
+    # SPATIAL QUERIES (uses admin details → layer URLs workflow)
+    # Using coordinates in BHILWARA district (the correct location)
+    "Show me the water bodies near coordinates 25.31698754297551, 75.09702609349773",
+    "What's the vegetation cover around coordinates 25.31, 75.09?",
+    "How many drainage features are within 2km of coordinates 25.317, 75.097?",
+    "Analyze land use distribution near coordinates 25.31698754297551, 75.09702609349773",
+    
+    # TIMESERIES QUERIES (uses watershed UID → timeseries workflow)
+    "How did cropping intensity change from 2017 to 2023 at coordinates 25.31698754297551, 75.09702609349773?",
+    "What was the precipitation trend from 2018 to 2022 near coordinates 25.317, 75.097?",
+    "Show groundwater depletion between 2017-2023 at coordinates 25.31, 75.09",
+]
+
+
 # ============================================================================
 # MAIN RUNNER
 # ============================================================================
@@ -1518,7 +1615,8 @@ def run_agent(user_query: str):
     
     # Run agent
     state = {"user_query": user_query}
-    result_state = app.invoke(state)
+    with span("run_agent", pipeline="new_architecture"):
+        result_state = app.invoke(state)
     
     # Print result
     print("\n" + "="*70)
@@ -1545,25 +1643,12 @@ if __name__ == "__main__":
     - Queries about trends, changes over time
     """
     
-    test_queries = [
-        # SPATIAL QUERIES (uses admin details → layer URLs workflow)
-        # Using coordinates in BHILWARA district (the correct location)
-        "Show me the water bodies near coordinates 25.31698754297551, 75.09702609349773",
-        "What's the vegetation cover around coordinates 25.31, 75.09?",
-        "How many drainage features are within 2km of coordinates 25.317, 75.097?",
-        "Analyze land use distribution near coordinates 25.31698754297551, 75.09702609349773",
-        
-        # TIMESERIES QUERIES (uses watershed UID → timeseries workflow)
-        "How did cropping intensity change from 2017 to 2023 at coordinates 25.31698754297551, 75.09702609349773?",
-        "What was the precipitation trend from 2018 to 2022 near coordinates 25.317, 75.097?",
-        "Show groundwater depletion between 2017-2023 at coordinates 25.31, 75.09",
-    ]
     
     print("\n" + "="*70)
     print("🧪 GEOSPATIAL AGENT TEST SUITE")
     print("="*70)
     print("\nAvailable test queries:")
-    for i, q in enumerate(test_queries, 1):
+    for i, q in enumerate(TEST_QUERIES, 1):
         query_type = "📊 TIMESERIES" if "change" in q.lower() or "trend" in q.lower() else "🗺️  SPATIAL"
         print(f"{i}. [{query_type}] {q}")
     
@@ -0,0 +1,133 @@
+"""
+Node Result Cache for CoreStack Agent System
+- Memoizes LangGraph nodes through the artifact registry
+- Keyed by node name, the node's relevant input fields and its code version
+- Per-node freshness: TTLs for API fetches and LLM calls, none for pure computations
+- Cache hits are registered as `cache_hit` artifacts that point at the
+  artifact the output was originally produced by, so lineage stays intact
+"""
+
+import os
+import json
+import time
+import hashlib
+import functools
+from typing import Dict, Any, Iterable, Optional
+
+from tracing import record_cache_hit
+
+# Freshness rules (seconds); None = valid until the code or inputs change
+API_FETCH_TTL_S = float(os.getenv("NODE_CACHE_API_TTL_S", 6 * 3600))
+LLM_TTL_S = float(os.getenv("NODE_CACHE_LLM_TTL_S", 24 * 3600))
+COMPUTE_TTL_S = None
+
+NODE_CACHE_ENABLED = os.getenv("DISABLE_NODE_CACHE") != "1"
+
+_MISSING = object()
+
+
+def get_path(state: Dict[str, Any], path: str, default=_MISSING):
+    """Read a dotted path ("parsed.uid") from nested dicts."""
+    value = state
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
+
+
+def set_path(state: Dict[str, Any], path: str, value):
+    parts = path.split(".")
+    target = state
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def code_version(fn) -> str:
+    """Hash of a function's bytecode and constants; changes whenever the node is edited."""
+    code = fn.__code__
+    h = hashlib.sha256()
+    h.update(code.co_code)
+    h.update(repr(code.co_consts).encode())
+    h.update(repr(code.co_names).encode())
+    return h.hexdigest()[:16]
+
+
+def cache_key(node: str, inputs: Dict[str, Any], version: str) -> str:
+    payload = json.dumps({"node": node, "inputs": inputs, "version": version}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cached_node(name: str, inputs: Iterable[str], outputs: Iterable[str], ttl: Optional[float] = None,
+                registry=None, version: Optional[str] = None):
+    """
+    Decorator memoizing a LangGraph node through the artifact registry.
+
+    Args:
+        name: Node name (part of the cache key)
+        inputs: State fields (dotted paths allowed) the node's output depends on
+        outputs: State fields the node writes and that are restored on a hit
+        ttl: Maximum age in seconds of a reusable result; None = no expiry
+        registry: ArtifactRegistry (or LazyRegistry proxy) holding the results
+        version: Explicit code version; defaults to a hash of the node's bytecode
+
+    States that already carry an "error" bypass the cache, and results that
+    set "error" are never stored.
+    """
+    inputs = list(inputs)
+    outputs = list(outputs)
+
+    def decorator(fn):
+        node_version = version or code_version(fn)
+
+        @functools.wraps(fn)
+        def wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+            if not NODE_CACHE_ENABLED or registry is None or "error" in state:
+                return fn(state)
+
+            key_inputs = {path: get_path(state, path, None) for path in inputs}
+            try:
+                key = cache_key(name, key_inputs, node_version)
+            except (TypeError, ValueError):
+                return fn(state)
+
+            hit = registry.cache_get(key, max_age_s=ttl)
+            if hit is not None:
+                source_id, cached = hit
+                for path, value in cached.get("outputs", {}).items():
+                    set_path(state, path, value)
+                state["artifact_id"] = registry.register(
+                    "cache_hit",
+                    {"node": name, "cache_key": key, "source_artifact_id": source_id, "hit_at": time.time()},
+                    parent_id=state.get("artifact_id")
+                )
+                record_cache_hit(f"node.{name}")
+                print(f"♻️  Node cache hit: {name}")
+                return state
+
+            result = fn(state)
+            if "error" in result:
+                return result
+
+            produced = {}
+            for path in outputs:
+                value = get_path(result, path)
+                if value is not _MISSING:
+                    produced[path] = value
+            try:
+                output_id = registry.register(
+                    "node_output",
+                    {"node": name, "cache_key": key, "outputs": produced},
+                    parent_id=result.get("artifact_id")
+                )
+            except (TypeError, ValueError) as e:
+                print(f"⚠️  Node cache: {name} output not serializable, not cached ({e})")
+                return result
+            registry.cache_put(key, name, output_id)
+            return result
+
+        wrapper.cache_version = node_version
+        return wrapper
+
+    return decorator
@@ -0,0 +1,377 @@
+"""
+Speculative Layer Prefetch for CoreStack Agent System
+- Starts downloading the vector layers a query is likely to need as soon as
+  the layer catalog is known, so data I/O overlaps with LLM planning
+- Candidates come from a keyword → layer-name prior
+- Downloads land in an on-disk layer cache that process_vector_url reads
+  through, so they are usable from sandbox worker processes too; a download
+  already in flight is joined, never repeated, including one running in
+  another process (a sandbox worker waits for the parent's prefetch)
+- Once the plan arrives, guesses it doesn't use are cancelled (or deleted
+  from the cache if they already finished)
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Iterable, Tuple
+
+from lazy_imports import lazy_module
+from tracing import record_cache_hit
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: in-flight downloads are then only joined within a process
+    fcntl = None
+
+requests = lazy_module("requests")
+gpd = lazy_module("geopandas")
+
+PREFETCH_ENABLED = os.getenv("DISABLE_PREFETCH") != "1"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 4))
+PREFETCH_MAX_LAYERS = int(os.getenv("PREFETCH_MAX_LAYERS", 3))
+VECTOR_CACHE_SIZE = int(os.getenv("VECTOR_CACHE_SIZE", 8))
+LAYER_CACHE_DIR = os.getenv("LAYER_CACHE_DIR", "layer_cache")
+LAYER_CACHE_MAX_BYTES = int(float(os.getenv("LAYER_CACHE_MAX_MB", 2048)) * 1024 * 1024)
+DOWNLOAD_TIMEOUT_S = 120
+
+# Query keyword → layer-name fragments it usually needs (lowercase, matched as substrings)
+LAYER_PRIORS = {
+    "cropping": ["cropping_intensity", "cropping intensity"],
+    "crop": ["cropping_intensity", "cropping intensity", "crop"],
+    "agricultur": ["cropping_intensity", "cropping intensity", "lulc"],
+    "farm": ["cropping_intensity", "cropping intensity"],
+    "water bod": ["surface_water", "water_bodies", "waterbodies"],
+    "surface water": ["surface_water", "water_bodies", "waterbodies"],
+    "drainage": ["drainage"],
+    "stream": ["drainage", "stream"],
+    "river": ["drainage", "river"],
+    "groundwater": ["aquifer", "soge", "well_depth", "welldepth"],
+    "aquifer": ["aquifer"],
+    "soge": ["soge"],
+    "well": ["well_depth", "welldepth", "soge"],
+    "land use": ["lulc"],
+    "lulc": ["lulc"],
+    "tree": ["tree", "change_detection"],
+    "forest": ["tree", "lulc"],
+    "terrain": ["terrain"],
+    "slope": ["terrain", "slope"],
+    "elevation": ["terrain", "elevation"],
+    "nrega": ["nrega"],
+    "watershed": ["mws", "watershed"],
+}
+
+
+def layer_urls(layer: Dict[str, Any]) -> List[str]:
+    """All download URLs of a catalog entry (multi-region entries carry several)."""
+    if layer.get('urls'):
+        return [u['url'] for u in layer['urls'] if u.get('url')]
+    return [layer['layer_url']] if layer.get('layer_url') else []
+
+
+def rank_candidates(query: str, available_layers: Dict[str, list],
+                    max_layers: int = PREFETCH_MAX_LAYERS) -> List[Dict[str, Any]]:
+    """
+    Guess which vector layers a query will use.
+
+    Args:
+        query: User query
+        available_layers: {'vector': [...], 'raster': [...]} catalog entries
+        max_layers: Maximum number of layers to return
+
+    Returns:
+        Vector catalog entries, best guess first. Rasters are read with
+        windowed range requests at execution time, so they are not prefetched.
+    """
+    query_lower = query.lower()
+    fragments = []
+    for keyword, names in LAYER_PRIORS.items():
+        if keyword in query_lower:
+            fragments.extend(n for n in names if n not in fragments)
+    if not fragments:
+        return []
+
+    scored = []
+    for layer in available_layers.get('vector', []):
+        name = re.sub(r"\s+", " ", layer['layer_name'].lower())
+        # Earlier fragments come from more specific keywords and rank higher
+        score = max((len(fragments) - i for i, f in enumerate(fragments) if f in name), default=0)
+        if score:
+            scored.append((score, layer))
+    scored.sort(key=lambda s: -s[0])
+    return [layer for _, layer in scored[:max_layers]]
+
+
+# ======================================================
+# ON-DISK LAYER CACHE
+# ======================================================
+
+_download_locks: Dict[str, threading.Lock] = {}
+_download_locks_guard = threading.Lock()
+
+
+def _download_lock(path: str) -> threading.Lock:
+    with _download_locks_guard:
+        return _download_locks.setdefault(path, threading.Lock())
+
+
+@contextlib.contextmanager
+def _path_lock(path: str, blocking: bool = True):
+    """
+    Serializes work on one cache file across threads (lock) and processes
+    (flock on a lock file). Non-blocking, it yields False when the file is busy.
+    """
+    lock = _download_lock(path)
+    if not lock.acquire(blocking):
+        yield False
+        return
+    try:
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(LAYER_CACHE_DIR, exist_ok=True)
+        with open(path[:-len(".geojson")] + ".lock", "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        lock.release()
+
+
+def _layer_lock(url: str):
+    return _path_lock(layer_cache_path(url))
+
+
+def layer_cache_path(url: str) -> str:
+    """Cache file for a layer URL (GeoJSON, which is what the layer URLs serve)."""
+    digest = hashlib.sha256(url.encode()).hexdigest()[:32]
+    return os.path.join(LAYER_CACHE_DIR, f"{digest}.geojson")
+
+
+def _version_path(path: str) -> str:
+    return path[:-len(".geojson")] + ".version"
+
+
+def download_layer(url: str) -> str:
+    """
+    Download a layer into the disk cache (atomic rename) and return its path.
+    A content hash of the file is stored next to it (see layer_version).
+    """
+    path = layer_cache_path(url)
+    with _layer_lock(url):
+        if os.path.exists(path):
+            return path
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        digest = hashlib.sha256()
+        try:
+            with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT_S) as response:
+                response.raise_for_status()
+                with open(tmp, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                        digest.update(chunk)
+            with open(_version_path(path), "w") as f:
+                f.write(digest.hexdigest()[:32])
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    _prune_layer_cache()
+    return path
+
+
+def read_vector(url: str):
+    """
+    Load a vector layer, from the disk cache when it has been prefetched.
+    Waits for a prefetch of the same URL that is in flight in this or
+    another process.
+    """
+    path = layer_cache_path(url)
+    # Read under the lock, so pruning cannot remove the file mid-read
+    with _layer_lock(url):
+        if os.path.exists(path):
+            record_cache_hit("layer_file")
+            os.utime(path)  # keeps recently used layers out of pruning
+            return gpd.read_file(path)
+    return gpd.read_file(url)
+
+
+def layer_version(url: str) -> Optional[str]:
+    """Content hash of a layer in the disk cache, or None if it was not downloaded there."""
+    try:
+        with open(_version_path(layer_cache_path(url))) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _prune_layer_cache():
+    """
+    Delete least recently used layer files beyond LAYER_CACHE_MAX_BYTES.
+    Files being downloaded or read (locked) are skipped.
+    """
+    try:
+        entries = [e for e in os.scandir(LAYER_CACHE_DIR) if e.name.endswith(".geojson")]
+    except OSError:
+        return
+    stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in sorted(stats):
+        if total <= LAYER_CACHE_MAX_BYTES:
+            break
+        with _path_lock(path, blocking=False) as acquired:
+            if not acquired:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+            try:
+                os.remove(_version_path(path))
+            except OSError:
+                pass
+
+
+# ======================================================
+# IN-PROCESS CACHE AND PREFETCHER
+# ======================================================
+
+class VectorCache:
+    """
+    Bounded LRU of parsed vector layers keyed by URL (per process).
+
+    Loads of the same URL are serialized: a caller that arrives while a
+    download is in flight waits for it and then reads the cached result.
+    """
+
+    def __init__(self, max_entries: int = VECTOR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def get(self, url: str):
+        with self._lock:
+            if url in self._entries:
+                self._entries.move_to_end(url)
+                return self._entries[url]
+        return None
+
+    def get_or_load(self, url: str, loader: Callable[[str], Any] = read_vector):
+        """Return the cached layer for url, loading (or waiting for a load in flight) if needed."""
+        cached = self.get(url)
+        if cached is not None:
+            record_cache_hit("vector_layer")
+            return cached
+
+        with self._url_lock(url):
+            cached = self.get(url)
+            if cached is not None:
+                record_cache_hit("vector_layer")
+                return cached
+            value = loader(url)
+            with self._lock:
+                self._entries[url] = value
+                self._entries.move_to_end(url)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+
+    def discard(self, url: str):
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+vector_cache = VectorCache()
+
+
+class LayerPrefetcher:
+    """
+    Prefetches likely vector layers for one query into the disk cache,
+    using a background thread pool.
+
+    Usage:
+        prefetcher = LayerPrefetcher()
+        prefetcher.start(query, available_layers)   # before planning
+        plan = agent.generate_plan(...)
+        prefetcher.retain(plan['data_needed'])       # cancel wrong guesses
+        ...execute...
+        prefetcher.close()
+    """
+
+    def __init__(self, loader: Callable[[str], Any] = download_layer, max_workers: int = PREFETCH_WORKERS):
+        self.loader = loader
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[Tuple[str, str], Any] = {}  # (layer_name, url) → Future
+
+    def start(self, query: str, available_layers: Dict[str, list]) -> List[str]:
+        """Queue downloads for the best-guess layers; returns their names."""
+        if not PREFETCH_ENABLED:
+            return []
+        candidates = rank_candidates(query, available_layers)
+        if not candidates:
+            return []
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+        for layer in candidates:
+            for url in layer_urls(layer):
+                if os.path.exists(layer_cache_path(url)):
+                    continue
+                future = self._executor.submit(self._load, url)
+                self._futures[(layer['layer_name'], url)] = future
+
+        names = [layer['layer_name'] for layer in candidates]
+        print(f"🔮 Prefetching {len(self._futures)} downloads for: {', '.join(names)}")
+        return names
+
+    def _load(self, url: str):
+        try:
+            self.loader(url)
+        except Exception as e:
+            # The real call will retry and surface the error
+            print(f"⚠️  Prefetch failed for {url[:80]}: {e}")
+
+    def retain(self, layer_names: Iterable[str]):
+        """
+        Keep prefetches for layers the plan needs and cancel the queued rest.
+        Downloads already running or done stay in the shared disk cache
+        (other queries may use them); LRU pruning reclaims the space.
+        """
+        wanted = {n.lower() for n in layer_names}
+        cancelled = 0
+        for (name, url), future in list(self._futures.items()):
+            if name.lower() in wanted:
+                continue
+            if future.cancel():
+                cancelled += 1
+            del self._futures[(name, url)]
+        if cancelled:
+            print(f"🔮 Prefetch: {len(self._futures)} kept, {cancelled} cancelled")
+
+    def close(self):
+        """Cancel anything still queued and release the pool without blocking."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._futures.clear()
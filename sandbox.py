@@ -0,0 +1,303 @@
+"""
+Process Sandbox for CodeAct-generated code
+- Generated code runs in a pool of pre-warmed worker processes (helpers,
+  geopandas and numpy already imported) instead of the serving process
+- Each run has a wall-clock timeout, an RSS limit and can be cancelled; a
+  worker that trips any of them is killed and replaced, other in-flight
+  runs are unaffected
+- Workers that grow large are recycled between runs
+- SANDBOX_MODE=inline runs the code in-process (debugging, offline replay
+  where fixtures are patched into this process only)
+"""
+
+import os
+import time
+import queue
+import atexit
+import builtins
+import importlib
+import threading
+import traceback
+import multiprocessing as mp
+from typing import Dict, Any, Optional, Callable
+
+from tracing import record
+
+SANDBOX_MODE = os.getenv("SANDBOX_MODE", "process")  # "process" | "inline"
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", 2))
+SANDBOX_TIMEOUT_S = float(os.getenv("SANDBOX_TIMEOUT_S", 120))
+SANDBOX_MAX_RSS_MB = float(os.getenv("SANDBOX_MAX_RSS_MB", 2048))
+# Hard address-space cap inside workers (0 = off); GDAL/numpy reserve a lot of
+# virtual memory, so the RSS monitor is the primary limit
+SANDBOX_RLIMIT_AS_MB = float(os.getenv("SANDBOX_RLIMIT_AS_MB", 0))
+
+DEFAULT_NAMESPACE = "new_architecture:sandbox_namespace"
+WARMUP_TIMEOUT_S = 120
+POLL_INTERVAL_S = 0.05
+# Recycle a worker after a run that left it above this fraction of the RSS limit
+RECYCLE_RSS_FRACTION = 0.75
+MAX_RUNS_PER_WORKER = 200
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _resolve(ref: str) -> Callable[[], Dict[str, Any]]:
+    module_name, _, attr = ref.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _execute(code: str, namespace: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    """Run code with the helper namespace plus context; result is read from `result`."""
+    exec_globals = {'__builtins__': builtins}
+    exec_globals.update(namespace)
+    exec_globals.update(context)
+    try:
+        exec(code, exec_globals)
+        result = exec_globals.get('result', {'error': 'No result variable found'})
+        return {'result': result, 'error': None}
+    except BaseException as e:  # includes MemoryError / SystemExit from generated code
+        return {'result': None, 'error': f"{type(e).__name__}: {str(e)}", 'traceback': traceback.format_exc()}
+
+
+def _worker_main(conn, namespace_ref: str, rlimit_as_bytes: int):
+    """Worker loop: warm up once, then execute (code, context) messages until told to stop."""
+    if rlimit_as_bytes:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (rlimit_as_bytes, rlimit_as_bytes))
+
+    try:
+        namespace = _resolve(namespace_ref)()
+    except BaseException as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        code, context = message
+        reply = _execute(code, namespace, context)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Result not picklable: fall back to its text form
+            conn.send({'result': repr(reply.get('result')), 'error': reply.get('error'),
+                       'note': f"result not transferable ({type(e).__name__})"})
+
+
+class _Worker:
+    """One sandbox process and its pipe."""
+
+    def __init__(self, ctx, namespace_ref: str, rlimit_as_bytes: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, namespace_ref, rlimit_as_bytes),
+                                   name="sandbox-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.runs = 0
+
+    def wait_ready(self, timeout_s: float):
+        if self.ready:
+            return
+        if not self.conn.poll(timeout_s):
+            raise TimeoutError(f"sandbox worker not ready after {timeout_s:.0f}s")
+        status, detail = self.conn.recv()
+        if status != "ready":
+            raise RuntimeError(f"sandbox worker failed to start: {detail}")
+        self.ready = True
+
+    def rss_bytes(self) -> Optional[int]:
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as f:
+                return int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def stop(self, kill: bool = False):
+        try:
+            if kill:
+                self.process.kill()
+            else:
+                self.conn.send(None)
+            self.process.join(timeout=1)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join(timeout=1)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pool of pre-warmed sandbox processes.
+
+    Args:
+        namespace: "module:function" returning the helper globals; imported
+            in each worker at start-up so the first run does not pay for it
+        workers: Number of worker processes (= concurrent runs)
+        timeout_s: Default wall-clock limit per run
+        max_rss_mb: Worker RSS above which a run is killed
+        rlimit_as_mb: Optional hard address-space limit set inside workers
+    """
+
+    def __init__(self, namespace: str = DEFAULT_NAMESPACE, workers: int = SANDBOX_WORKERS,
+                 timeout_s: float = SANDBOX_TIMEOUT_S, max_rss_mb: float = SANDBOX_MAX_RSS_MB,
+                 rlimit_as_mb: float = SANDBOX_RLIMIT_AS_MB):
+        self.namespace = namespace
+        self.timeout_s = timeout_s
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024)
+        self.rlimit_as_bytes = int(rlimit_as_mb * 1024 * 1024)
+        # spawn: the serving process is multi-threaded, so fork is unsafe
+        self._ctx = mp.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._all = set()
+        for _ in range(max(1, workers)):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.namespace, self.rlimit_as_bytes)
+        with self._lock:
+            self._all.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker, kill: bool):
+        with self._lock:
+            self._all.discard(worker)
+        worker.stop(kill=kill)
+        if not self._closed:
+            self._idle.put(self._spawn())
+
+    def run(self, code: str, context: Dict[str, Any], timeout_s: Optional[float] = None,
+            cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Execute generated code in a worker.
+
+        Args:
+            code: Python source; must leave its answer in `result`
+            context: Extra globals (must be picklable)
+            timeout_s: Wall-clock limit, including any wait for a free worker;
+                defaults to the pool's
+            cancel: Event that aborts the run (or the wait for a worker) when set
+
+        Returns:
+            {'result': ..., 'error': None} or {'result': None, 'error': str, ...}
+        """
+        if self._closed:
+            raise RuntimeError("SandboxPool is closed")
+        timeout_s = timeout_s or self.timeout_s
+        deadline = time.monotonic() + timeout_s
+        worker = None
+        while worker is None:
+            if cancel is not None and cancel.is_set():
+                return {'result': None, 'error': "Cancelled"}
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                record("sandbox.wait_timeouts")
+                return {'result': None, 'error': f"TimeoutError: no sandbox worker free within {timeout_s:.0f}s"}
+            try:
+                worker = self._idle.get(timeout=min(remaining, POLL_INTERVAL_S * 4))
+            except queue.Empty:
+                continue
+
+        try:
+            worker.wait_ready(WARMUP_TIMEOUT_S)
+            worker.conn.send((code, context))
+        except Exception as e:
+            # Broken worker or unpicklable context; the worker's state is unknown, replace it
+            self._retire(worker, kill=True)
+            return {'result': None, 'error': f"Sandbox unavailable: {type(e).__name__}: {e}"}
+
+        record("sandbox.runs")
+        peak_rss = 0
+        while True:
+            reason = None
+            if worker.conn.poll(POLL_INTERVAL_S):
+                try:
+                    reply = worker.conn.recv()
+                    break
+                except (EOFError, OSError):
+                    reason = f"Sandbox worker died (exit code {worker.process.exitcode})"
+            rss = worker.rss_bytes() or 0
+            peak_rss = max(peak_rss, rss)
+            reason = reason or self._limit_exceeded(worker, rss, deadline, timeout_s, cancel)
+            if reason:
+                record("sandbox.killed")
+                print(f"🛑 Sandbox run aborted: {reason}")
+                self._retire(worker, kill=True)
+                return {'result': None, 'error': reason}
+
+        worker.runs += 1
+        rss = worker.rss_bytes() or 0
+        if rss > self.max_rss_bytes * RECYCLE_RSS_FRACTION or worker.runs >= MAX_RUNS_PER_WORKER:
+            self._retire(worker, kill=False)
+        else:
+            self._idle.put(worker)
+        reply['peak_rss_mb'] = round(max(peak_rss, rss) / 1e6, 1)
+        return reply
+
+    def _limit_exceeded(self, worker: _Worker, rss: int, deadline: float, timeout_s: float,
+                        cancel: Optional[threading.Event]) -> Optional[str]:
+        if not worker.process.is_alive():
+            return f"Sandbox worker died (exit code {worker.process.exitcode})"
+        if cancel is not None and cancel.is_set():
+            return "Cancelled"
+        if time.monotonic() > deadline:
+            return f"TimeoutError: generated code exceeded {timeout_s:.0f}s"
+        if rss > self.max_rss_bytes:
+            return (f"MemoryError: generated code exceeded the {self.max_rss_bytes / 1e6:.0f} MB "
+                    f"memory limit ({rss / 1e6:.0f} MB)")
+        return None
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers = list(self._all)
+            self._all.clear()
+        for worker in workers:
+            worker.stop(kill=False)
+
+
+_pool: Optional[SandboxPool] = None
+_pool_lock = threading.Lock()
+_inline_namespace: Optional[Dict[str, Any]] = None
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Process-wide pool, started on first use (workers warm up in the background)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SandboxPool()
+                atexit.register(_pool.close)
+    return _pool
+
+
+def start_sandbox_pool():
+    """
+    Start the worker processes at application start-up, so their spawn and
+    warm-up imports overlap with the first query's parsing and planning
+    instead of delaying its first run. No-op with SANDBOX_MODE=inline.
+    """
+    if SANDBOX_MODE != "inline":
+        get_sandbox_pool()
+
+
+def execute_sandboxed(code: str, context: Dict[str, Any], timeout_s: Optional[float] = None,
+                      cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """Run generated code according to SANDBOX_MODE; same return shape as SandboxPool.run."""
+    global _inline_namespace
+    if SANDBOX_MODE == "inline":
+        if _inline_namespace is None:
+            _inline_namespace = _resolve(DEFAULT_NAMESPACE)()
+        return _execute(code, _inline_namespace, context)
+    return get_sandbox_pool().run(code, context, timeout_s=timeout_s, cancel=cancel)
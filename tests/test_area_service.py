@@ -0,0 +1,61 @@
+import os
+import sys
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from area_service import AreaService, select_area_crs, utm_epsg_for_lonlat
+
+
+def square_km(lon, lat, km=1.0):
+    """A km × km square (in EPSG:4326) with its south-west corner at lon/lat."""
+    frame = gpd.GeoDataFrame(geometry=[box(0, 0, km * 1000, km * 1000)], crs=f"EPSG:{utm_epsg_for_lonlat(lon, lat)}")
+    origin = gpd.GeoSeries.from_xy([lon], [lat], crs="EPSG:4326").to_crs(frame.crs).iloc[0]
+    return frame.translate(origin.x, origin.y).to_crs("EPSG:4326")
+
+
+def test_utm_zone_for_india():
+    assert utm_epsg_for_lonlat(73.9, 18.5) == 32643
+    assert utm_epsg_for_lonlat(88.3, 22.5) == 32645
+    assert utm_epsg_for_lonlat(-70.0, -33.0) == 32719
+
+
+def test_crs_selection():
+    assert select_area_crs((74.0, 18.0, 75.0, 19.0)) == "EPSG:32643"
+    # Crosses a zone boundary, or too wide for one zone: equal-area projection
+    assert select_area_crs((77.5, 20.0, 78.5, 21.0)).startswith("+proj=laea")
+    assert select_area_crs((68.0, 8.0, 97.0, 37.0)).startswith("+proj=laea")
+
+
+def test_area_of_a_square_km():
+    service = AreaService()
+    assert service.area_ha(square_km(73.9, 18.5)) == pytest.approx(100.0, rel=1e-3)
+    # Squares on both sides of a zone boundary, via the equal-area projection
+    # (the squares themselves are drawn in UTM, which is ~0.2% off at zone edges)
+    wide = gpd.GeoSeries(list(square_km(77.95, 20.5)) + list(square_km(78.05, 20.5)), crs="EPSG:4326")
+    assert service.area_ha(wide) == pytest.approx(200.0, rel=5e-3)
+
+
+def test_projection_cache_respects_version_and_geometry():
+    service = AreaService()
+    layer = square_km(73.9, 18.5)
+    first = service.project(layer, layer_key="url", version="v1")
+    assert service.project(layer, layer_key="url", version="v1") is first
+    assert service.project(layer, layer_key="url", version="v2") is not first
+
+    # Different geometries under the same key and version are not served from the cache
+    other = square_km(74.5, 19.0, km=2.0)
+    assert service.area_ha(other, layer_key="url", version="v2") == pytest.approx(400.0, rel=1e-3)
+
+
+def test_compute_areas_per_layer_and_errors():
+    service = AreaService()
+    layers = {"a": square_km(73.9, 18.5), "b": square_km(88.3, 22.5, km=3.0), "bad": "not a layer"}
+    results = service.compute_areas(layers, per_geometry=True)
+    assert results["a"]["total_area_ha"] == pytest.approx(100.0, rel=1e-3)
+    assert results["b"]["areas_ha"] == [pytest.approx(900.0, rel=1e-3)]
+    assert results["a"]["crs"] == "EPSG:32643"
+    assert "error" in results["bad"]
@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import artifact
+from artifact import ArtifactRegistry, DBAPIBackend
+from blob_store import BlobStore
+
+
+def make_registry(tmp_path, **kwargs):
+    kwargs.setdefault("blob_store", BlobStore(str(tmp_path / "blobs")))
+    return ArtifactRegistry(str(tmp_path / "artifacts.db"), **kwargs)
+
+
+# ------------------------------------------------------
+# Batched writes (user-033)
+# ------------------------------------------------------
+
+def test_registrations_are_batched_and_visible_to_the_writer(tmp_path):
+    writer = make_registry(tmp_path, flush_interval=60)
+    reader = make_registry(tmp_path)
+    artifact_id = writer.register("fetch_mws_data", {"uid": "1"})
+
+    assert writer.get(artifact_id) is not None
+    assert reader.get(artifact_id) is None
+    assert writer.flush() == 1
+    assert reader.get(artifact_id) is not None
+    writer.close()
+    reader.close()
+
+
+def test_batch_size_triggers_a_write(tmp_path):
+    writer = make_registry(tmp_path, batch_size=10, flush_interval=60)
+    reader = make_registry(tmp_path)
+    ids = [writer.register("t", {"i": i}) for i in range(10)]
+    assert _wait_for(lambda: all(reader.get(i) is not None for i in ids))
+    writer.close()
+    reader.close()
+
+
+def test_identical_content_registers_once(tmp_path):
+    registry = make_registry(tmp_path)
+    assert registry.register("t", {"a": 1}) == registry.register("t", {"a": 1})
+    assert registry.get_stats()["total_artifacts"] == 1
+    registry.close()
+
+
+def test_failed_batches_are_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact, "WRITE_RETRY_S", 0.05)
+    path = str(tmp_path / "artifacts.db")
+    failures = {"left": 0}
+
+    def connect():
+        # The writer thread's first connections fail, as if the database were unavailable
+        if threading.current_thread().name == "artifact-writer" and failures["left"] > 0:
+            failures["left"] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return sqlite3.connect(path, check_same_thread=False)
+
+    registry = ArtifactRegistry(path, backend=DBAPIBackend(connect), flush_interval=0.01,
+                                blob_store=BlobStore(str(tmp_path / "blobs")))
+    failures["left"] = 3
+    artifact_id = registry.register("t", {"x": 1})
+    reader = make_registry(tmp_path)
+    assert _wait_for(lambda: reader.get(artifact_id) is not None)
+    assert failures["left"] == 0
+    registry.close()
+    reader.close()
+
+
+def test_lineage(tmp_path):
+    registry = make_registry(tmp_path)
+    root = registry.register("fetch_mws_data", {"raw": 1})
+    child = registry.register("normalize_data", {"norm": 1}, parent_id=root)
+    leaf = registry.register("format_response", {"text": "ok"}, parent_id=child)
+    assert [a["id"] for a in registry.get_lineage(leaf)] == [root, child, leaf]
+    assert registry.find_by_type("normalize_data")
+    registry.close()
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc to count open files")
+def test_short_lived_threads_do_not_leak_connections(tmp_path):
+    registry = make_registry(tmp_path)
+    artifact_id = registry.register("t", {"x": 1})
+    registry.flush()
+
+    def read():
+        assert registry.get(artifact_id) is not None
+
+    def run_threads(n):
+        for _ in range(n):
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join()
+
+    run_threads(5)
+    before = len(os.listdir("/proc/self/fd"))
+    run_threads(50)
+    assert len(os.listdir("/proc/self/fd")) <= before + 2
+    registry.close()
+
+
+# ------------------------------------------------------
+# Retention (user-036)
+# ------------------------------------------------------
+
+def _old_and_new(registry):
+    old_root = registry.register("fetch_mws_data", {"raw": "old"})
+    old_child = registry.register("normalize_data", {"norm": "old"}, parent_id=old_root)
+    lone = registry.register("fetch_mws_data", {"raw": "lone"})
+    registry.flush()
+    time.sleep(0.3)
+    new_leaf = registry.register("format_response", {"text": "new"}, parent_id=old_child)
+    registry.flush()
+    return old_root, old_child, lone, new_leaf
+
+
+def test_gc_does_not_expire_by_age_by_default(tmp_path):
+    registry = make_registry(tmp_path)
+    _old_and_new(registry)
+    result = registry.gc()
+    assert result["deleted"] == 0
+    assert registry.get_stats()["total_artifacts"] == 4
+    registry.close()
+
+
+def test_gc_keeps_ancestors_of_retained_artifacts(tmp_path):
+    registry = make_registry(tmp_path)
+    old_root, old_child, lone, new_leaf = _old_and_new(registry)
+    registry.cache_put("cache-key", "node", lone)
+
+    assert registry.gc(max_age_s=0.2, dry_run=True)["deleted"] == 1
+    assert registry.get(lone) is not None
+
+    result = registry.gc(max_age_s=0.2, batch_size=1)
+    assert (result["expired"], result["protected"], result["deleted"]) == (3, 2, 1)
+    assert registry.get(lone) is None
+    assert [a["id"] for a in registry.get_lineage(new_leaf)] == [old_root, old_child, new_leaf]
+    # The deleted artifact's cache entry went with it
+    assert registry.cache_get("cache-key") is None
+    registry.close()
+
+
+def test_gc_per_type_retention(tmp_path):
+    registry = make_registry(tmp_path)
+    old_root, old_child, lone, new_leaf = _old_and_new(registry)
+    result = registry.gc(retention_by_type={"fetch_mws_data": 0.2})
+    assert result["deleted"] == 1
+    assert registry.get(lone) is None
+    assert registry.get(old_root) is not None
+    registry.close()
+
+
+def test_gc_size_budget_deletes_oldest_first(tmp_path):
+    registry = make_registry(tmp_path)
+    ids = []
+    for i in range(5):
+        ids.append(registry.register("t", {"payload": "x" * 1000, "i": i}))
+        registry.flush()
+        time.sleep(0.01)
+    registry.gc(max_total_bytes=2500)
+    assert [registry.get(i) is not None for i in ids] == [False, False, False, True, True]
+    assert registry.total_bytes() <= 2500
+    registry.close()
+
+
+def test_gc_deletes_unreferenced_blobs(tmp_path):
+    registry = make_registry(tmp_path, blob_threshold=100)
+    big = registry.register("fetch_mws_data", {"rows": list(range(500))})
+    registry.flush()
+    time.sleep(0.3)
+    result = registry.gc(max_age_s=0.2)
+    assert result["deleted"] == 1 and result["deleted_blobs"] == 1
+    assert registry.get_content(big) is None
+    registry.close()
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
@@ -0,0 +1,160 @@
+import importlib.util
+import json
+import os
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch_runner
+from batch_runner import run_batch, ResultWriter
+
+
+class Crash(BaseException):
+    """Stands in for the process dying (not caught like an ordinary request error)."""
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body
+        self.text = "server error"
+
+    def json(self):
+        return self._body
+
+
+class FakeAgent(types.SimpleNamespace):
+    """The langgraph_agent functions the batch path calls, without services."""
+
+    def __init__(self):
+        super().__init__(info_calls=[], data_calls=[], parse_calls=0, fail_uids=set(), crash_at=None,
+                         parsed_metric="cropping intensity")
+
+    def request_mws_info(self, lat, lon):
+        if self.crash_at is not None and len(self.info_calls) == self.crash_at:
+            raise Crash()
+        self.info_calls.append((lat, lon))
+        return Response(200, {"uid": f"U{int(lat)}", "State": "S", "District": "D", "Tehsil": f"T{int(lat)}"})
+
+    def request_mws_data(self, info):
+        self.data_calls.append(info["uid"])
+        if info["uid"] in self.fail_uids:
+            return Response(500)
+        return Response(200, {"ci": {"ci_2020": 1.0, "ci_2021": 1.5, "ci_2022": 2.0}})
+
+    def normalize_data(self, state):
+        return {"metric_block": "ci", "metric_key_prefix": "ci_"}
+
+    def extract_timeseries(self, mws_json, block, prefix):
+        return [{"year": int(k[-4:]), "value": v} for k, v in sorted(mws_json[block].items())], prefix
+
+    def compute_timeseries_stats(self, state):
+        rows = state["timeseries"]
+        return {"stats": {
+            "actual_start_year": str(rows[0]["year"]), "actual_end_year": str(rows[-1]["year"]),
+            "start_val": rows[0]["value"], "end_val": rows[-1]["value"], "percent_change": 100.0,
+            "peak_year": str(rows[-1]["year"]), "peak_value": rows[-1]["value"], "slope": 0.5,
+        }}
+
+    def llm_intent_parser(self, state):
+        self.parse_calls += 1
+        return {"parsed": {"metric_text": self.parsed_metric, "start_year": 2020, "end_year": 2022}}
+
+    def validate(self, state):
+        parsed = state["parsed"]
+        parsed["start_year"], parsed["end_year"] = str(parsed["start_year"]), str(parsed["end_year"])
+        return state
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    fake = FakeAgent()
+    monkeypatch.setattr(batch_runner, "langgraph_agent", fake)
+    return fake
+
+
+@pytest.fixture
+def locations(tmp_path):
+    # Six rows, five distinct points, four watersheds (U1 twice via different points)
+    path = str(tmp_path / "locations.csv")
+    pd.DataFrame({
+        "id": ["a", "b", "c", "d", "e", "f"],
+        "lat": [1.1, 1.1, 1.5, 2.2, 3.3, 4.4],
+        "lon": [77.0, 77.0, 77.0, 77.0, 77.0, 77.0],
+    }).to_csv(path, index=False)
+    return path
+
+
+def read_output(path):
+    return pd.read_csv(path, dtype={"row_id": str})
+
+
+def test_each_point_and_watershed_requested_once(agent, locations, tmp_path):
+    output = str(tmp_path / "out.csv")
+    summary = run_batch(locations, output, metric="cropping intensity", start_year=2020, end_year=2022,
+                        chunk_rows=2)
+    assert summary == {"rows": 6, "skipped": 0, "written": 6, "errors": 0}
+    assert len(agent.info_calls) == 5
+    assert sorted(agent.data_calls) == ["U1", "U2", "U3", "U4"]
+
+    result = read_output(output).set_index("row_id")
+    assert set(result["status"]) == {"ok"}
+    assert result.loc["a", "uid"] == "U1" and result.loc["c", "uid"] == "U1"
+    assert json.loads(result.loc["d", "timeseries"]) == {"2020": 1.0, "2021": 1.5, "2022": 2.0}
+
+
+def test_crash_while_resolving_keeps_finished_chunks(agent, locations, tmp_path):
+    output = str(tmp_path / "out.csv")
+    # Chunks: (a, b) → 1 point, (c, d) → 2 points, (e, f) → crashes on its first point
+    agent.crash_at = 3
+    with pytest.raises(Crash):
+        run_batch(locations, output, metric="cropping intensity", start_year=2020, end_year=2022, chunk_rows=2)
+    assert sorted(read_output(output)["row_id"]) == ["a", "b", "c", "d"]
+
+    # Resume: finished rows are skipped and their points are not requested again
+    agent.crash_at = None
+    resolved_before = list(agent.info_calls)
+    summary = run_batch(locations, output, metric="cropping intensity", start_year=2020, end_year=2022,
+                        chunk_rows=2)
+    assert summary["skipped"] == 4 and summary["written"] == 2
+    assert not set(agent.info_calls[len(resolved_before):]) & set(resolved_before)
+    assert sorted(read_output(output)["row_id"]) == ["a", "b", "c", "d", "e", "f"]
+
+
+def test_retry_errors_reruns_failed_rows(agent, locations, tmp_path):
+    output = str(tmp_path / "out.csv")
+    agent.fail_uids = {"U3"}
+    summary = run_batch(locations, output, metric="cropping intensity", start_year=2020, end_year=2022)
+    assert summary["errors"] == 1
+
+    agent.fail_uids = set()
+    assert run_batch(locations, output, metric="cropping intensity", start_year=2020, end_year=2022)["written"] == 0
+    summary = run_batch(locations, output, metric="cropping intensity", start_year=2020, end_year=2022,
+                        retry_errors=True)
+    assert (summary["written"], summary["errors"]) == (1, 0)
+
+
+def test_resume_reuses_saved_intent(agent, locations, tmp_path):
+    output = str(tmp_path / "out.csv")
+    pd.read_csv(locations).head(2).to_csv(tmp_path / "first.csv", index=False)
+    run_batch(str(tmp_path / "first.csv"), output, query="How did cropping intensity change?")
+    assert json.load(open(output + ".intent.json"))["metric_text"] == "cropping intensity"
+
+    # A different parse on resume must not change the output's metric
+    agent.parsed_metric = "rainfall"
+    run_batch(locations, output, query="How did cropping intensity change?")
+    assert agent.parse_calls == 1
+    assert set(read_output(output)["metric"]) == {"cropping intensity"}
+
+    with pytest.raises(ValueError):
+        run_batch(locations, output, metric="rainfall")
+
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is not None, reason="pyarrow is installed")
+def test_parquet_output_without_pyarrow_fails_up_front(tmp_path):
+    with pytest.raises(ImportError, match="pyarrow"):
+        ResultWriter(str(tmp_path / "out.parquet"))
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact import ArtifactRegistry
+from blob_store import BlobStore
+
+
+def test_put_get_roundtrip_and_dedup(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    data = b"x" * 100_000 + b"tail"
+    digest = store.put(data)
+    assert digest == BlobStore.digest(data)
+    assert store.put(data) == digest
+    assert list(store.iter_digests()) == [digest]
+    assert store.get(digest) == data
+    # Stored compressed
+    assert 0 < store.size_on_disk(digest) < len(data)
+
+
+def test_streaming_read(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    data = os.urandom(300_000)
+    digest = store.put(data)
+    chunks = []
+    with store.open(digest) as stream:
+        while True:
+            chunk = stream.read(50_000)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    assert b"".join(chunks) == data
+
+
+def test_missing_and_delete(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digest = store.put(b"payload")
+    assert store.delete(digest)
+    assert not store.exists(digest)
+    assert not store.delete(digest)
+    with pytest.raises(KeyError):
+        store.get(digest)
+
+
+def test_registry_keeps_large_payloads_next_to_database(tmp_path, monkeypatch):
+    monkeypatch.delenv("ARTIFACT_BLOB_DIR", raising=False)
+    db_dir = tmp_path / "data"
+    db_dir.mkdir()
+    monkeypatch.chdir(db_dir)
+    registry = ArtifactRegistry("artifacts.db", blob_threshold=1024)
+    content = {"rows": list(range(2000))}
+    small = {"rows": [1]}
+    big_id = registry.register("fetch_mws_data", content)
+    small_id = registry.register("fetch_mws_data", small)
+    registry.close()
+    assert os.path.isdir(db_dir / "artifact_blobs")
+
+    # Opened from another working directory, the blobs are still found
+    monkeypatch.chdir(tmp_path)
+    registry = ArtifactRegistry(str(db_dir / "artifacts.db"), blob_threshold=1024)
+    assert registry.get_content(big_id) == content
+    assert registry.get_content(small_id) == small
+    with registry.open_content(big_id) as stream:
+        assert stream.read().startswith(b'{"rows": [0, 1')
+    assert not os.path.exists(tmp_path / "artifact_blobs")
+    registry.close()
@@ -0,0 +1,77 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_templates import CodeTemplateStore, MAX_TEMPLATE_FAILURES
+
+QUERY = "cropping intensity in village {} from 2017 to 2023"
+PLAN = {"steps": ["load {}", "years 2017-2023"]}
+CODE = "\n".join([
+    "gdf = load_handle('{handle}')",
+    "lulc = read_raster('{url}')",
+    "result = summarize(gdf, lulc, 2017, 2023, name='{name}')",
+])
+
+
+def parsed_for(name):
+    return {"location_type": "village", "location_name": name, "start_year": 2017, "end_year": 2023}
+
+
+def layers(handle, url):
+    return {
+        "vector": [{"layer_name": "village_boundaries", "handle": handle}],
+        "raster": [{"layer_name": "lulc", "layer_url": url, "urls": [{"url": url}]}],
+    }
+
+
+def test_template_binds_the_new_query_values(tmp_path):
+    store = CodeTemplateStore(str(tmp_path / "templates.db"))
+    old_handle, new_handle = "dh_" + "a" * 24, "dh_" + "b" * 24
+    code = CODE.format(handle=old_handle, url="https://tiles/shirur.tif", name="Shirur")
+    plan = {"steps": [PLAN["steps"][0].format("Shirur"), PLAN["steps"][1]]}
+    assert store.store(QUERY.format("Shirur"), parsed_for("Shirur"), plan, code,
+                       layers(old_handle, "https://tiles/shirur.tif"))
+
+    hit = store.lookup(QUERY.format("Wagholi"), parsed_for("Wagholi"), layers(new_handle, "https://tiles/wagholi.tif"))
+    assert hit is not None
+    assert hit["code"] == CODE.format(handle=new_handle, url="https://tiles/wagholi.tif", name="Wagholi")
+    assert hit["plan"] == {"steps": ["load Wagholi", "years 2017-2023"]}
+    assert [l["layer_name"] for l in hit["selected_layers"]["vector"]] == ["village_boundaries"]
+
+
+def test_other_intents_and_missing_layers_do_not_match(tmp_path):
+    store = CodeTemplateStore(str(tmp_path / "templates.db"))
+    handle = "dh_" + "a" * 24
+    code = CODE.format(handle=handle, url="https://tiles/shirur.tif", name="Shirur")
+    store.store(QUERY.format("Shirur"), parsed_for("Shirur"), PLAN, code, layers(handle, "https://tiles/shirur.tif"))
+
+    other = "rainfall in village Wagholi from 2017 to 2023"
+    assert store.lookup(other, parsed_for("Wagholi"), layers(handle, "https://tiles/x.tif")) is None
+    raster_only = {"vector": [], "raster": layers(handle, "https://tiles/x.tif")["raster"]}
+    assert store.lookup(QUERY.format("Wagholi"), parsed_for("Wagholi"), raster_only) is None
+
+
+def test_code_with_unparameterized_layer_literals_is_not_stored(tmp_path):
+    store = CodeTemplateStore(str(tmp_path / "templates.db"))
+    handle = "dh_" + "a" * 24
+    # A handle that is not one of the selected layers' handles cannot be rebound
+    code = CODE.format(handle="dh_" + "c" * 24, url="https://tiles/shirur.tif", name="Shirur")
+    assert store.store(QUERY.format("Shirur"), parsed_for("Shirur"), PLAN, code,
+                       layers(handle, "https://tiles/shirur.tif")) is None
+    assert store.lookup(QUERY.format("Shirur"), parsed_for("Shirur"), layers(handle, "https://tiles/shirur.tif")) is None
+
+
+def test_failing_templates_are_retired(tmp_path):
+    store = CodeTemplateStore(str(tmp_path / "templates.db"))
+    handle = "dh_" + "a" * 24
+    code = CODE.format(handle=handle, url="https://tiles/shirur.tif", name="Shirur")
+    key = store.store(QUERY.format("Shirur"), parsed_for("Shirur"), PLAN, code,
+                      layers(handle, "https://tiles/shirur.tif"))
+    available = layers(handle, "https://tiles/wagholi.tif")
+
+    for _ in range(MAX_TEMPLATE_FAILURES - 1):
+        store.record_failure(key)
+    assert store.lookup(QUERY.format("Wagholi"), parsed_for("Wagholi"), available)["template_key"] == key
+    store.record_failure(key)
+    assert store.lookup(QUERY.format("Wagholi"), parsed_for("Wagholi"), available) is None
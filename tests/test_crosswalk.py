@@ -0,0 +1,92 @@
+import os
+import sys
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# new_architecture refuses to import without API keys; nothing here calls the services
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("CORE_STACK_API_KEY", "test")
+
+from crosswalk import VillageCrosswalk, build_crosswalk
+
+
+def _write(tmp_path, name, columns, geometries):
+    path = str(tmp_path / f"{name}.geojson")
+    gpd.GeoDataFrame(columns, geometry=geometries, crs="EPSG:4326").to_file(path, driver="GeoJSON")
+    return path
+
+
+@pytest.fixture(scope="module")
+def crosswalk(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("crosswalk")
+    villages = _write(tmp_path, "villages", {
+        "village_id": ["v1", "v2", "v3"],
+        "village_name": ["Devipura", "Devipura", "Wagholi"],
+        "district": ["Jaipur", "Sikar", "Pune"],
+        "state": ["Rajasthan", "Rajasthan", "Maharashtra"],
+    }, [box(0.1, 0.1, 0.4, 0.4), box(2.1, 0.1, 2.4, 0.4), box(0.9, 0.1, 1.2, 0.4)])
+    tehsils = _write(tmp_path, "tehsils", {
+        "name": ["T1", "T2", "T3"], "district": ["Jaipur", "Pune", "Sikar"], "state": ["R", "M", "R"],
+    }, [box(0, 0, 1, 1), box(1, 0, 2, 1), box(2, 0, 3, 1)])
+    watersheds = _write(tmp_path, "watersheds", {"uid": ["w1", "w2"]}, [box(0, 0, 1.5, 1), box(1.5, 0, 3, 1)])
+    states = _write(tmp_path, "states", {"state_name": ["Rajasthan"]}, [box(0, 0, 3, 1)])
+
+    db_path = str(tmp_path / "crosswalk.db")
+    assert build_crosswalk(villages, tehsils, watersheds, states, db_path) == 3
+    return VillageCrosswalk(db_path)
+
+
+def test_village_spanning_two_tehsils(crosswalk):
+    entry = crosswalk.get("v3")
+    assert entry["village_name"] == "Wagholi"
+    assert sorted(t["tehsil"] for t in entry["tehsil_list"]) == ["T1", "T2"]
+    assert entry["watershed_list"] == ["w1"]
+    assert entry["area_ha"] > 0
+    assert entry["geometry"].equals(box(0.9, 0.1, 1.2, 0.4))
+
+
+def test_find_by_name_and_district(crosswalk):
+    assert {e["village_id"] for e in crosswalk.find("devipura")} == {"v1", "v2"}
+    assert [e["village_id"] for e in crosswalk.find("Devipura", "SIKAR")] == ["v2"]
+    assert crosswalk.find("Nowhere") == []
+    assert crosswalk.get("missing") is None
+
+
+def test_place_centroids(crosswalk):
+    [tehsil] = crosswalk.find_place("tehsil", "t2", district="pune")
+    assert 1 < tehsil["lon"] < 2
+    assert crosswalk.find_place("state", "rajasthan")[0]["state"] == "Rajasthan"
+
+
+def test_build_requires_village_file(tmp_path):
+    with pytest.raises(ValueError):
+        build_crosswalk(None, db_path=str(tmp_path / "crosswalk.db"))
+
+
+def _resolve(monkeypatch, crosswalk, name, district=None):
+    import new_architecture
+
+    monkeypatch.setattr(new_architecture, "get_gazetteer", lambda: None)
+    monkeypatch.setattr(new_architecture, "get_crosswalk", lambda: crosswalk)
+    parsed = {"location_type": "village", "location_name": name, "district": district}
+    return new_architecture.resolve_geometry_v2({"parsed": parsed})
+
+
+def test_resolve_geometry_uses_crosswalk(monkeypatch, crosswalk):
+    state = _resolve(monkeypatch, crosswalk, "Wagholi")
+    assert "error" not in state
+    assert state["resolved_geometry"]["watershed_list"] == ["w1"]
+
+
+def test_resolve_geometry_asks_when_name_is_in_several_districts(monkeypatch, crosswalk):
+    state = _resolve(monkeypatch, crosswalk, "Devipura")
+    assert "resolved_geometry" not in state
+    assert state["error"].startswith("Clarification needed")
+    assert "Jaipur" in state["error"] and "Sikar" in state["error"]
+
+    state = _resolve(monkeypatch, crosswalk, "Devipura", district="Sikar")
+    assert "error" not in state
+    assert state["resolved_geometry"]["watershed_list"] == ["w2"]
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gazetteer import VillageGazetteer, pick_match, clarification, normalize_name, phonetic_key
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    rows = [
+        ("1", "Shirur", "Pune"),
+        ("2", "Shiroor", "Udupi"),
+        ("3", "Wagholi", "Pune"),
+        ("4", "Devipura", "Jaipur"),
+        ("5", "Devipura", "Sikar"),
+        ("6", "Shirpur", "Dhule"),
+        ("7", "Kotur", "Belgaum"),
+        ("8", "Kotur", "Belgaum"),
+    ]
+    frame = gpd.GeoDataFrame(
+        {"village_id": [r[0] for r in rows], "village_name": [r[1] for r in rows],
+         "district": [r[2] for r in rows], "state": ["S"] * len(rows)},
+        geometry=[box(i, 0, i + 1, 1) for i in range(len(rows))], crs="EPSG:4326")
+    return VillageGazetteer(frame)
+
+
+def test_name_keys():
+    assert normalize_name("  Śirūr-Gāon ") == "sirur gaon"
+    assert phonetic_key("Shiroor") == phonetic_key("Shirur")
+    assert phonetic_key("Kottur") == phonetic_key("Kotur")
+
+
+def test_exact_name_ranks_above_transliteration(gazetteer):
+    candidates = gazetteer.search("Shirur")
+    assert [c["village_name"] for c in candidates[:2]] == ["Shirur", "Shiroor"]
+    assert [c["score"] for c in candidates[:2]] == [1.0, 0.95]
+    assert pick_match(candidates)["village_id"] == "1"
+
+
+def test_transliteration_variant_resolves(gazetteer):
+    candidates = gazetteer.search("Shiroor", district="Udupi")
+    assert pick_match(candidates)["village_id"] == "2"
+
+
+def test_fuzzy_match_with_typo(gazetteer):
+    candidates = gazetteer.search("Wagoli")
+    assert candidates[0]["village_name"] == "Wagholi"
+    assert candidates[0]["score"] < 1.0
+
+
+def test_district_filter(gazetteer):
+    assert [c["village_id"] for c in gazetteer.search("Devipura", district="Sikar")] == ["5"]
+    assert gazetteer.search("Wagholi", district="Udupi") == []
+
+
+def test_same_name_in_two_districts_is_ambiguous(gazetteer):
+    candidates = gazetteer.search("Devipura")
+    assert pick_match(candidates) is None
+    message = clarification("Devipura", candidates)
+    assert "exists in districts Jaipur, Sikar" in message
+    assert "no close match" not in message
+
+
+def test_same_name_twice_in_one_district_is_not_ambiguous(gazetteer):
+    assert pick_match(gazetteer.search("Kotur"))["district"] == "Belgaum"
+
+
+def test_weak_match_asks_with_candidates(gazetteer):
+    candidates = gazetteer.search("Shirpoor")
+    assert pick_match(candidates)["village_name"] == "Shirpur"
+    low = [dict(candidates[0], score=0.6)]
+    assert pick_match(low) is None
+    message = clarification("Shirpoor", low, district="Dhule")
+    assert "no close match for village 'Shirpoor' in Dhule" in message
+    assert "Did you mean" in message
+
+
+def test_unknown_name(gazetteer):
+    assert gazetteer.search("Xyzzy") == []
+    assert pick_match([]) is None
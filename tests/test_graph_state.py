@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_state import merge_state, branch_node
+
+
+def test_sequential_nodes_keep_the_state_itself():
+    state = {"query": "q"}
+    assert merge_state(state, state) is state
+    assert merge_state(state, None) is state
+
+
+def test_branch_deltas_merge_and_union_keys_combine():
+    state = {"query": "q", "branch_errors": {"a": "boom"}, "response": "old"}
+    merged = merge_state(state, {"response": "new", "branch_errors": {"b": "bust"}})
+    assert merged["response"] == "new"
+    assert merged["branch_errors"] == {"a": "boom", "b": "bust"}
+    assert state["branch_errors"] == {"a": "boom"}
+
+
+def test_branch_node_returns_only_its_changes():
+    def parse(state):
+        state["parsed"]["metric"] = "rainfall"
+        state["artifact_id"] = "art-1"
+        return state
+
+    def untouched(state):
+        state["parsed_copy"] = state["parsed"]
+        return state
+
+    state = {"query": "q", "parsed": {"metric": None}, "other": {"k": 1}}
+    delta = branch_node("intent", [parse])(state)
+    assert delta == {"parsed": {"metric": "rainfall"}, "branch_artifacts": {"intent": "art-1"}}
+    # The shared state was not mutated in place
+    assert state["parsed"] == {"metric": None}
+    assert "other" not in branch_node("noop", [untouched])(state)
+
+
+def test_parallel_branches_merge_with_isolated_errors():
+    def fail(state):
+        state["error"] = "layer fetch failed"
+        return state
+
+    def answer(state):
+        state["mws_data"] = [1, 2]
+        return state
+
+    state = {"query": "q"}
+    left = branch_node("layers", [fail], isolate_errors=True)(state)
+    right = branch_node("mws", [answer])(state)
+    merged = merge_state(merge_state(state, left), right)
+    assert merged["branch_errors"] == {"layers": "layer fetch failed"}
+    assert "error" not in merged
+    assert merged["mws_data"] == [1, 2]
+
+    # Without isolation the error lands on the shared state
+    assert branch_node("layers", [fail])(state) == {"error": "layer fetch failed"}
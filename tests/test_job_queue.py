@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import job_queue
+from job_queue import JobQueue
+
+
+@pytest.fixture(autouse=True)
+def fast_heartbeats(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_HEARTBEAT_S", 0.1)
+    monkeypatch.setattr(job_queue, "JOB_STALE_S", 0.5)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class Runner:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, query, emit):
+        with self.lock:
+            self.calls.append(query)
+        emit("node", {"node": "parse_intent", "lines": ["parsed"]})
+        emit("token", "partial ")
+        time.sleep(self.delay)
+        return {"response": f"answer to {query}", "error": self.error}
+
+
+def test_job_runs_and_records_progress(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), runner=Runner())
+    job_id = queue.submit("How much rain?")
+    assert wait_for(lambda: queue.get(job_id)["status"] == "done")
+    job = queue.get(job_id)
+    assert job["response"] == "answer to How much rain?"
+    assert job["partial"] == "partial "
+    assert [e["line"] for e in queue.events(job_id)] == ["parsed"]
+    queue.close()
+
+
+def test_identical_queries_share_one_job_across_queues(tmp_path):
+    runner = Runner(delay=0.3)
+    a = JobQueue(str(tmp_path / "jobs.db"), runner=runner)
+    b = JobQueue(str(tmp_path / "jobs.db"), runner=runner)
+    job_ids = [a.submit(f"query {i}") for i in range(4)]
+    assert b.submit("  QUERY   0 ") == job_ids[0]
+    assert wait_for(lambda: all(a.get(j)["status"] == "done" for j in job_ids))
+    assert sorted(runner.calls) == [f"query {i}" for i in range(4)]
+    a.close()
+    b.close()
+
+
+def test_returned_error_is_failed_and_retried(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), runner=Runner(error="API down"))
+    first = queue.submit("q")
+    assert wait_for(lambda: queue.get(first)["status"] == "failed")
+    assert queue.get(first)["error"] == "API down"
+    assert queue.submit("q") != first
+    queue.close()
+
+
+def test_jobs_of_a_stopped_queue_are_taken_over(tmp_path):
+    release = threading.Event()
+
+    def stuck(query, emit):
+        release.wait(10)
+        return {"response": "stale", "error": None}
+
+    a = JobQueue(str(tmp_path / "jobs.db"), runner=stuck)
+    job_id = a.submit("q")
+    assert wait_for(lambda: a.get(job_id)["status"] == "running")
+
+    # A live owner keeps its job
+    b = JobQueue(str(tmp_path / "jobs.db"), runner=Runner())
+    time.sleep(1.0)
+    assert b.get(job_id)["status"] == "running"
+
+    # Once its heartbeats stop, another queue takes the job over and runs it
+    a.close()
+    assert wait_for(lambda: b.get(job_id)["status"] == "done")
+    assert b.get(job_id)["response"] == "answer to q"
+
+    # The old owner finishing late does not overwrite the result
+    release.set()
+    time.sleep(0.2)
+    assert b.get(job_id)["response"] == "answer to q"
+    b.close()
+
+
+def test_finished_jobs_are_pruned(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.db"), runner=Runner())
+    job_id = queue.submit("q")
+    assert wait_for(lambda: queue.get(job_id)["status"] == "done")
+    monkeypatch.setattr(job_queue, "JOB_RESULT_TTL_S", 0.0)
+    assert wait_for(lambda: queue.get(job_id) is None)
+    assert queue.events(job_id) == []
+    queue.close()
@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artifact import ArtifactRegistry
+from blob_store import BlobStore
+from node_cache import cached_node
+
+
+def make_registry(tmp_path):
+    # Long flush interval: nothing reaches the database unless flushed explicitly
+    return ArtifactRegistry(str(tmp_path / "artifacts.db"), flush_interval=60,
+                            blob_store=BlobStore(str(tmp_path / "blobs")))
+
+
+def test_cache_entry_visible_to_other_registry(tmp_path):
+    r1 = make_registry(tmp_path)
+    r2 = make_registry(tmp_path)
+    output_id = r1.register("node_output", {"outputs": {"x": 1}})
+    r1.cache_put("k", "node", output_id)
+
+    assert r2.cache_get("k") == (output_id, {"outputs": {"x": 1}})
+    r1.flush()
+    assert r1.cache_get("k") == (output_id, {"outputs": {"x": 1}})
+    r1.close()
+    r2.close()
+
+
+def test_cache_miss_keeps_mapping(tmp_path):
+    # The artifact id is the content hash; take it from a registry on another database
+    other = ArtifactRegistry(str(tmp_path / "other.db"), blob_store=BlobStore(str(tmp_path / "blobs")))
+    content = {"outputs": {"x": 2}}
+    artifact_id = other.register("node_output", content)
+    other.close()
+
+    r1 = make_registry(tmp_path)
+    r1.cache_put("k", "node", artifact_id)
+    assert r1.cache_get("k") is None
+
+    # Once the artifact exists, the same mapping hits
+    r1.register("node_output", content)
+    r1.flush()
+    assert r1.cache_get("k") == (artifact_id, content)
+    r1.close()
+
+
+def test_cached_node_hit_from_second_process_view(tmp_path):
+    r1 = make_registry(tmp_path)
+    r2 = make_registry(tmp_path)
+    calls = []
+
+    def node(state):
+        calls.append(1)
+        state["y"] = state["x"] * 2
+        return state
+
+    first = cached_node("double", inputs=["x"], outputs=["y"], registry=r1)(node)
+    second = cached_node("double", inputs=["x"], outputs=["y"], registry=r2)(node)
+
+    assert first({"x": 3})["y"] == 6
+    assert second({"x": 3})["y"] == 6
+    assert len(calls) == 1
+    r1.close()
+    r2.close()
@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sandbox import SandboxPool
+
+
+@pytest.fixture
+def pool():
+    # builtins:dict gives workers an empty helper namespace, so they start fast
+    pool = SandboxPool(namespace="builtins:dict", workers=1, timeout_s=30, max_rss_mb=512)
+    yield pool
+    pool.close()
+
+
+def test_run_returns_result(pool):
+    reply = pool.run("result = {'answer': x * 2}", {"x": 21})
+    assert reply["error"] is None
+    assert reply["result"] == {"answer": 42}
+
+
+def test_error_in_code_is_reported(pool):
+    reply = pool.run("raise ValueError('boom')", {})
+    assert reply["result"] is None
+    assert reply["error"] == "ValueError: boom"
+
+
+def test_timeout_kills_run_and_pool_recovers(pool):
+    reply = pool.run("import time\ntime.sleep(30)", {}, timeout_s=1)
+    assert reply["error"].startswith("TimeoutError")
+    assert pool.run("result = 1", {})["result"] == 1
+
+
+def test_memory_limit_kills_run(pool):
+    reply = pool.run("blob = bytearray(1024 * 1024 * 1024)\nresult = len(blob)", {})
+    assert reply["error"].startswith("MemoryError")
+
+
+def test_wait_for_busy_worker_honours_timeout_and_cancel(pool):
+    pool.run("result = 0", {})  # worker warmed up
+    busy = threading.Thread(target=pool.run, args=("import time\ntime.sleep(3)", {}))
+    busy.start()
+    time.sleep(0.3)
+
+    started = time.monotonic()
+    reply = pool.run("result = 1", {}, timeout_s=0.5)
+    assert reply["error"].startswith("TimeoutError")
+    assert time.monotonic() - started < 2
+
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    started = time.monotonic()
+    assert pool.run("result = 1", {}, cancel=cancel)["error"] == "Cancelled"
+    assert time.monotonic() - started < 2
+    busy.join()
@@ -0,0 +1,324 @@
+"""
+Tracing for CoreStack Agent System
+- Spans around every LangGraph node: wall time, CPU time, RSS, HTTP bytes,
+  LLM tokens and cache hits
+- Exported as one JSON object per line, shaped like OpenTelemetry spans
+  (trace_id / span_id / parent_span_id / *_unix_nano / attributes)
+- Off unless TRACING_ENABLED=1; the trace file is rotated to TRACE_FILE.1
+  once it reaches TRACE_FILE_MAX_MB
+- CLI: `python tracing.py summary traces.jsonl` prints p50/p95/p99 per node
+"""
+
+import os
+import sys
+import json
+import time
+import secrets
+import threading
+import functools
+import contextlib
+import contextvars
+from collections import defaultdict
+from typing import Dict, Any, Optional, List
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_FILE_MAX_BYTES = int(float(os.getenv("TRACE_FILE_MAX_MB", 64)) * 1024 * 1024)
+
+SERVICE_NAME = "corestack-agent"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux /proc), None elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Span:
+    """One timed unit of work. Counters accumulate from hooks while the span is current."""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.counters = defaultdict(int)
+        self.status = "OK"
+        self.error = None
+
+    def add(self, counter: str, value: int = 1):
+        """Add to a counter on this span and every enclosing span."""
+        span = self
+        while span is not None:
+            span.counters[counter] += value
+            span = span.parent
+
+    def start(self):
+        self.start_ns = time.time_ns()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.thread_time()
+        self._rss0 = _rss_bytes()
+
+    def finish(self) -> Dict[str, Any]:
+        wall_ms = (time.perf_counter() - self._wall0) * 1000.0
+        cpu_ms = (time.thread_time() - self._cpu0) * 1000.0
+        rss1 = _rss_bytes()
+        attributes = dict(self.attributes)
+        attributes.update({
+            "wall_ms": round(wall_ms, 3),
+            "cpu_ms": round(cpu_ms, 3),
+            "rss_delta_bytes": (rss1 - self._rss0) if rss1 is not None and self._rss0 is not None else None,
+        })
+        attributes.update(self.counters)
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": time.time_ns(),
+            "attributes": attributes,
+            "status": {"code": self.status, "message": self.error},
+            "resource": {"service.name": SERVICE_NAME, "process.pid": os.getpid()}
+        }
+        return record
+
+
+class JsonlExporter:
+    """
+    Appends finished spans to a JSONL file (one span per line).
+    A file that has reached max_bytes is renamed to <path>.1 (replacing the
+    previous one) and a new file is started.
+    """
+
+    def __init__(self, path: str = TRACE_FILE, max_bytes: int = TRACE_FILE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, record: Dict[str, Any]):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+                size = f.tell()
+            if self.max_bytes and size >= self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+
+
+_exporter = JsonlExporter()
+
+
+def set_exporter(exporter):
+    """Replace the span exporter (anything with export(record))."""
+    global _exporter
+    _exporter = exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def record(counter: str, value: int = 1):
+    """Add to a counter on the current span (no-op outside a span)."""
+    span = _current_span.get()
+    if span is not None:
+        span.add(counter, value)
+
+
+def record_cache_hit(cache: str):
+    record("cache_hits")
+    record(f"cache_hits.{cache}")
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Trace a block; nested spans become children of the current one."""
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    _install_hooks()
+    current = Span(name, parent=_current_span.get(), attributes=attributes)
+    token = _current_span.set(current)
+    current.start()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        try:
+            _exporter.export(current.finish())
+        except Exception as e:
+            print(f"⚠️  Trace export failed: {e}")
+
+
+def traced_node(name: str, fn):
+    """Wrap a LangGraph node so each call runs inside a span named node.<name>."""
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        with span(f"node.{name}", node=name) as s:
+            result = fn(state)
+            if s is not None and isinstance(result, dict) and result.get("error"):
+                s.attributes["state_error"] = str(result["error"])[:200]
+            return result
+
+    return wrapper
+
+
+# ======================================================
+# I/O HOOKS
+# ======================================================
+# Installed on first span; libraries that are not imported yet are hooked on
+# a later span, so tracing never forces a heavy import.
+
+_hooks_lock = threading.Lock()
+_hooked = set()
+
+
+def _install_hooks():
+    if len(_hooked) == 2:
+        return
+    with _hooks_lock:
+        if "requests" not in _hooked and "requests" in sys.modules:
+            _hook_requests()
+            _hooked.add("requests")
+        if "langchain" not in _hooked and "langchain_core.language_models.chat_models" in sys.modules:
+            _hook_langchain()
+            _hooked.add("langchain")
+
+
+def _hook_requests():
+    import requests
+
+    original_send = requests.Session.send
+
+    @functools.wraps(original_send)
+    def send(self, request, **kwargs):
+        response = original_send(self, request, **kwargs)
+        try:
+            body = request.body
+            sent = len(body) if isinstance(body, (bytes, str)) else 0
+            if kwargs.get("stream"):
+                received = int(response.headers.get("Content-Length") or 0)
+            else:
+                received = len(response.content or b"")
+            record("http.requests")
+            record("http.bytes_sent", sent)
+            record("http.bytes_received", received)
+        except Exception:
+            pass
+        return response
+
+    requests.Session.send = send
+
+
+def _hook_langchain():
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+    original_invoke = BaseChatModel.invoke
+
+    @functools.wraps(original_invoke)
+    def invoke(self, *args, **kwargs):
+        response = original_invoke(self, *args, **kwargs)
+        usage = getattr(response, "usage_metadata", None) or {}
+        record("llm.calls")
+        record("llm.input_tokens", int(usage.get("input_tokens") or 0))
+        record("llm.output_tokens", int(usage.get("output_tokens") or 0))
+        # Input tokens served from the provider's prompt-prefix cache
+        record("llm.cached_input_tokens", int((usage.get("input_token_details") or {}).get("cache_read") or 0))
+        return response
+
+    BaseChatModel.invoke = invoke
+
+
+# ======================================================
+# SUMMARY CLI
+# ======================================================
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, int(-(-pct * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per span name: count, errors, wall p50/p95/p99, mean CPU, and summed I/O counters."""
+    by_name = defaultdict(list)
+    for s in spans:
+        by_name[s["name"]].append(s)
+
+    summary = {}
+    for name, group in by_name.items():
+        wall = [s["attributes"].get("wall_ms", 0.0) for s in group]
+        cpu = [s["attributes"].get("cpu_ms", 0.0) for s in group]
+        totals = defaultdict(int)
+        for s in group:
+            for key in ("http.requests", "http.bytes_received", "llm.calls", "llm.input_tokens",
+                        "llm.output_tokens", "cache_hits"):
+                totals[key] += s["attributes"].get(key, 0) or 0
+        summary[name] = {
+            "count": len(group),
+            "errors": sum(1 for s in group if s.get("status", {}).get("code") == "ERROR"
+                          or "state_error" in s["attributes"]),
+            "p50_ms": percentile(wall, 50),
+            "p95_ms": percentile(wall, 95),
+            "p99_ms": percentile(wall, 99),
+            "mean_cpu_ms": sum(cpu) / len(cpu),
+            **totals
+        }
+    return summary
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize trace spans")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary_parser = sub.add_parser("summary", help="p50/p95/p99 per node")
+    summary_parser.add_argument("path", nargs="?", default=TRACE_FILE)
+    summary_parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = summarize(load_spans(args.path))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    header = f"{'span':<32}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'cpu ms':>9}" \
+             f"{'http KB':>9}{'tok in':>8}{'tok out':>8}{'hits':>6}"
+    print(header)
+    print("-" * len(header))
+    for name, s in sorted(summary.items(), key=lambda kv: -kv[1]["p50_ms"]):
+        print(f"{name:<32}{s['count']:>6}{s['errors']:>5}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}"
+              f"{s['p99_ms']:>10.1f}{s['mean_cpu_ms']:>9.1f}{s['http.bytes_received'] / 1024:>9.1f}"
+              f"{s['llm.input_tokens']:>8}{s['llm.output_tokens']:>8}{s['cache_hits']:>6}")
+
+
+if __name__ == "__main__":
+    main()